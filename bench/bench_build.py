@@ -0,0 +1,74 @@
+#
+# Widget construction benchmark
+#
+#   Builds a form of captioned entry fields, first placing each widget as it
+#   is added, then inside container.batch() and then from a layout spec with
+#   build_from_spec(), and reports widgets built per second, counting each
+#   caption Label and Entry. Needs a display, except with --headless, which
+#   times only the Python side with EasyTk(headless=True). Replaying a spec
+#   still makes every widget, so it is about as fast as batch(); it saves the
+#   building code's own work, which this form's doesn't have much of.
+#
+#   python bench/bench_build.py [--fields N] [--columns C] [--headless]
+#
+import argparse
+import gc
+import sys
+import time
+import tkinter
+
+from eztk import eztk
+
+
+def build(frame, fields, columns):
+    for ix in range(fields):
+        if ix % columns == 0:
+            row, col = (eztk.NEXT_ROW, 0)
+        else:
+            row, col = (eztk.SAME_ROW, eztk.NEXT_COL)
+        frame.add_entry_field("Field {}".format(ix), row=row, col=col)
+
+
+def run(app, fields, columns, mode, spec):
+    frame = app.add_frame()
+    gc.collect()
+    gc.disable()  # as timeit does, so collections of earlier runs don't count
+    start = time.perf_counter()
+    if mode == "batch":
+        with frame.batch():
+            build(frame, fields, columns)
+    elif mode == "spec":
+        frame.build_from_spec(spec)
+    else:
+        build(frame, fields, columns)
+    app.tkw.update()  # include the layout
+    elapsed = time.perf_counter() - start
+    gc.enable()
+    frame.destroy()
+    return 2 * fields / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fields", type=int, default=2000)
+    parser.add_argument("--columns", type=int, default=4)
+    parser.add_argument("--headless", action="store_true")
+    args = parser.parse_args()
+    try:
+        app = eztk.EasyTk(headless=args.headless)
+    except tkinter.TclError as e:
+        print("bench_build needs a display, or use --headless:", e)
+        return 1
+    frame = app.add_frame()
+    build(frame, args.fields, args.columns)
+    spec = frame.layout_spec()
+    frame.destroy()
+    for mode in ("plain", "batch", "spec"):
+        rate = run(app, args.fields, args.columns, mode, spec)
+        print("{} fields {}: {:.0f} widgets/s".format(args.fields, mode, rate))
+    app.tkw.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#
+# Import time benchmark for eztk
+#
+#   Each run imports eztk in a fresh interpreter and reports the import time
+#   and whether any of the heavy, lazily imported modules were loaded.
+#
+#   python bench/bench_import.py [--runs N] [--max-ms MS]
+#
+#   With --max-ms the exit status is 1 if the median import time is over MS
+#   milliseconds or if a lazily imported module was loaded, so this can be
+#   used as a regression check.
+#
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+LAZY_MODULES = [
+    "cv2",
+    "numpy",
+    "PIL",
+    "tkinter.ttk",
+    "tkinter.filedialog",
+    "tkinter.scrolledtext",
+]
+
+PROBE = """
+import json, sys, time
+t = time.perf_counter()
+from eztk import eztk
+elapsed = time.perf_counter() - t
+print(json.dumps({"ms": elapsed * 1000.0,
+                  "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def run_once():
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], check=True, capture_output=True, text=True
+    )
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    times = []
+    loaded = set()
+    for run in range(args.runs):
+        result = run_once()
+        times.append(result["ms"])
+        loaded.update(result["loaded"])
+    median = statistics.median(times)
+    print(
+        "import eztk: median {:.1f} ms, min {:.1f} ms, max {:.1f} ms ({} runs)".format(
+            median, min(times), max(times), args.runs
+        )
+    )
+    if len(loaded) > 0:
+        print("lazily imported modules loaded at import:", ", ".join(sorted(loaded)))
+    else:
+        print("no lazily imported modules loaded at import")
+    if args.max_ms is not None:
+        if (median > args.max_ms) or (len(loaded) > 0):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+#
+# Benchmark of the image backends that make Tk photo images from numpy buffers
+#
+#   For each image size, times making a PhotoImage from a uint8 RGB buffer
+#   with the "pillow" backend (Image.fromarray() and ImageTk.PhotoImage) and
+#   the "ppm" backend (PPM data handed to tkinter.PhotoImage). Needs a
+#   display.
+#
+#   python bench/bench_photo.py [--repeat N]
+#
+import argparse
+import sys
+import time
+import tkinter
+
+import numpy as np
+
+from eztk import eztk
+
+SIZES = ((320, 240), (640, 480), (1280, 720), (1920, 1080), (3840, 2160))
+
+
+def time_call(fn, im, repeat):
+    fn(im)  # warm up
+    start = time.perf_counter()
+    for ix in range(repeat):
+        fn(im)
+    return (time.perf_counter() - start) * 1000.0 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    eztk._require_image_libs("bench_photo")
+    try:
+        root = tkinter.Tk()
+    except tkinter.TclError as e:
+        print("bench_photo needs a display:", e)
+        return 1
+    tests = [
+        (backend, lambda im, b=backend: eztk._photo_image(im, b, root))
+        for backend in eztk.PHOTO_BACKENDS
+    ]
+    rng = np.random.default_rng(0)
+    for width, height in SIZES:
+        im = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        for backend, fn in tests:
+            ms = time_call(fn, im, args.repeat)
+            print("{}x{} {}: {:.2f} ms".format(width, height, backend, ms))
+    root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+#
+# Frame rate benchmark for update_image() streaming
+#
+#   Shows a sequence of random frames on a canvas, first replacing the
+#   PhotoImage for each frame and then with is_streaming set so frames are
+#   pasted into the existing PhotoImage. Needs a display.
+#
+#   python bench/bench_stream.py [--frames N] [--width W] [--height H]
+#
+import argparse
+import sys
+import time
+import tkinter
+
+import numpy as np
+
+from eztk import eztk
+
+
+def run(app, frames, stream, width, height):
+    canvas = app.add_canvas(width=width, height=height, stream=stream)
+    rng = np.random.default_rng(0)
+    images = [
+        rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for ix in range(8)
+    ]
+    canvas.update_image(source_im=images[0])
+    app.tkw.update()
+    start = time.perf_counter()
+    for ix in range(frames):
+        canvas.update_image(source_im=images[ix % len(images)])
+        app.tkw.update()
+    elapsed = time.perf_counter() - start
+    canvas.destroy()
+    return frames / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+    try:
+        app = eztk.EasyTk()
+    except tkinter.TclError as e:
+        print("bench_stream needs a display:", e)
+        return 1
+    for stream in (False, True):
+        fps = run(app, args.frames, stream, args.width, args.height)
+        print(
+            "{}x{} stream={}: {:.1f} frames/s".format(
+                args.width, args.height, stream, fps
+            )
+        )
+    app.tkw.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
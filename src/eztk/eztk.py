@@ -1,16 +1,35 @@
+import array
+import collections
+import contextlib
+import csv
+import functools
+import hashlib
+import inspect
+import itertools
+import json
+import marshal
+import math
+import os
+import sys
+import threading
+import time
 import tkinter
-import tkinter.ttk
-import tkinter.scrolledtext as ScrolledText
-import tkinter.filedialog as tkFileDialog
 
-try:
-    import cv2
-    import numpy as np
-    from PIL import ImageTk, Image
+# The image libraries and the tkinter submodules for dialogs and scrolled text
+# are imported on first use, not with eztk. Importing OpenCV alone can take
+# hundreds of milliseconds, which applications that never show an image
+# shouldn't pay. bench/bench_import.py measures the import time.
+cv2 = None
+np = None
+Image = None
+ImageTk = None
+_HAS_IMAGE_LIBS = None  # None until _load_image_libs() has tried the imports
+_HAS_PILLOW = None
 
-    _HAS_IMAGE_LIBS = True
-except ImportError:
-    _HAS_IMAGE_LIBS = False
+# How numpy images become Tk photo images, see add_canvas(image_backend=).
+# "pillow" goes through PIL.ImageTk. "ppm" hands binary PPM/PGM data straight
+# to tkinter.PhotoImage, so OpenCV users don't need Pillow at all.
+PHOTO_BACKENDS = ("pillow", "ppm")
 
 FIRST_ROW = 0
 SAME_ROW = -1
@@ -18,6 +37,7 @@ NEXT_ROW = -2
 BOTTOM_ROW = -3
 EXTEND_ROW = -4
 OVERLAY_ROW = -5
+NEXT_FREE = -6  # row or col: first free cell, see OccupancyGrid
 SAME_COL = -1
 NEXT_COL = -2
 RIGHT_COL = -3
@@ -25,14 +45,430 @@ LEFT_COL = -1
 EXTEND_COL = -4
 OVERLAY_COL = -5
 COL_SPAN_ALL = -1
+ZOOM_LIMITS = (1.0 / 64, 64.0)  # smallest and largest zoom of zoom_to()
+
+
+def _load_image_libs():
+    # Pillow is optional: without it images are shown with the "ppm" backend
+    # and update_image(pil_fn=) isn't available.
+    global cv2, np, Image, ImageTk, _HAS_IMAGE_LIBS, _HAS_PILLOW
+    if _HAS_IMAGE_LIBS is None:
+        try:
+            import cv2
+            import numpy as np
+
+            _HAS_IMAGE_LIBS = True
+        except ImportError:
+            _HAS_IMAGE_LIBS = False
+        try:
+            from PIL import ImageTk, Image
+
+            _HAS_PILLOW = True
+        except ImportError:
+            _HAS_PILLOW = False
+    return _HAS_IMAGE_LIBS
 
 
 def _require_image_libs(method_name):
-    if not _HAS_IMAGE_LIBS:
+    if not _load_image_libs():
+        raise ImportError(
+            "eztk.{}() requires opencv-python and numpy. "
+            "Install with: pip install opencv-python numpy".format(method_name)
+        )
+
+
+def _require_pillow(method_name):
+    _require_image_libs(method_name)
+    if not _HAS_PILLOW:
         raise ImportError(
-            "eztk.{}() requires opencv-python, numpy, and Pillow. "
-            "Install with: pip install opencv-python numpy Pillow".format(method_name)
+            "eztk.{}() requires Pillow. "
+            "Install with: pip install Pillow".format(method_name)
+        )
+
+
+def _photo_backend(backend):
+    # Resolve a PHOTO_BACKENDS name. None is Pillow when it is installed.
+    if backend is None:
+        _load_image_libs()
+        if _HAS_PILLOW:
+            return "pillow"
+        return "ppm"
+    if backend not in PHOTO_BACKENDS:
+        raise ValueError("Unknown image backend: " + repr(backend))
+    return backend
+
+
+def _photo_image(im, backend, master=None):
+    # A Tk photo image of im, a uint8 numpy image (RGB or grayscale) or a
+    # Pillow image, made with the given PHOTO_BACKENDS backend.
+    if backend == "ppm":
+        if not hasattr(im, "shape"):
+            im = np.asarray(im.convert("RGB"))
+        return tkinter.PhotoImage(master=master, data=_ppm_data(im), format="PPM")
+    _require_pillow("pillow image backend")
+    if hasattr(im, "shape"):
+        im = Image.fromarray(im)
+    return ImageTk.PhotoImage(im)
+
+
+def _is_photo(tkd):
+    if isinstance(tkd, tkinter.PhotoImage):
+        return True
+    return (ImageTk is not None) and isinstance(tkd, ImageTk.PhotoImage)
+
+
+def _image_size(im):
+    # (width, height) of a numpy or Pillow image
+    if hasattr(im, "shape"):
+        return (im.shape[1], im.shape[0])
+    return im.size
+
+
+def _image_nbytes(im):
+    # Size of the decoded pixels of a numpy buffer or Pillow image
+    if hasattr(im, "nbytes"):
+        return im.nbytes
+    return im.width * im.height * len(im.getbands())
+
+
+def _ppm_data(im):
+    # Binary PPM (RGB) or PGM (grayscale) data for a uint8 numpy image. Tk
+    # photo images read this format directly.
+    height, width = im.shape[:2]
+    if len(im.shape) == 2:
+        magic = b"P5"
+    else:
+        magic = b"P6"
+    header = b"%s %d %d 255\n" % (magic, width, height)
+    return header + np.ascontiguousarray(im).tobytes()
+
+
+@functools.lru_cache(maxsize=16)
+def _window_lut(low, high):
+    # uint16 -> uint8 lookup table showing low as black and high as white
+    scale = 255.0 / max(high - low, 1)
+    lut = np.arange(65536, dtype=np.float32)
+    lut -= low
+    lut *= scale
+    np.clip(lut, 0, 255, out=lut)
+    lut = lut.astype(np.uint8)
+    lut.flags.writeable = False  # shared between widgets
+    return lut
+
+
+def _to_uint8(im, window=None):
+    # Map a high bit depth image to uint8 for display. window is (low, high),
+    # the values shown as black and white, "auto" for the range of this image,
+    # or None for the full range of the dtype (0.0 to 1.0 for floats).
+    # uint16 goes through a cached lookup table, other types are scaled.
+    if im.dtype == np.uint8:
+        return im
+    if window == "auto":
+        low = float(im.min())
+        high = float(im.max())
+    elif window is not None:
+        low, high = window
+    elif im.dtype.kind == "f":
+        low, high = (0.0, 1.0)
+    else:
+        info = np.iinfo(im.dtype)
+        low, high = (info.min, info.max)
+    if im.dtype == np.uint16:
+        return np.take(_window_lut(int(low), int(high)), im)
+    scale = 255.0 / max(high - low, 1e-12)
+    im = np.subtract(im, low, dtype=np.float32)
+    im *= scale
+    np.clip(im, 0, 255, out=im)
+    return im.astype(np.uint8)
+
+
+def _nearest_level(levels, width):
+    # The narrowest of the numpy images in levels at least width wide, or the
+    # widest if none are
+    wide = [im for im in levels if im.shape[1] >= width]
+    if wide:
+        return min(wide, key=lambda im: im.shape[1])
+    if levels:
+        return max(levels, key=lambda im: im.shape[1])
+    return None
+
+
+def _read_pil_image(fn):
+    try:
+        im = Image.open(fn)
+        im.load()  # decode now, so the cache holds pixels rather than a file
+    except IOError:
+        return None
+    return im
+
+
+def _read_opencv_rgb_image(fn):
+    opencv_im = cv2.imread(fn)
+    if opencv_im is None:
+        return None
+    rgb_im = cv2.cvtColor(opencv_im, cv2.COLOR_BGR2RGB)
+    rgb_im.flags.writeable = False  # shared through the cache
+    return rgb_im
+
+
+#
+# ImageCache - least recently used cache of decoded image files
+#
+#   update_image() reads pil_fn and opencv_fn files through the shared
+#   image_cache, so switching back to a recently shown file is a dictionary
+#   lookup rather than a decode. Entries are keyed by path, mtime and size,
+#   so a file that changes on disk is decoded again. The cache is bounded by
+#   the bytes of decoded pixels, not the number of entries.
+#
+class ImageCache:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()  # key -> (image, nbytes)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()  # update_image_async() loads in worker threads
+
+    def get(self, fn, loader):
+        # loader(fn) decodes the file, returning None if it can't.
+        try:
+            stat = os.stat(fn)
+        except OSError:
+            return None
+        key = (fn, stat.st_mtime_ns, stat.st_size, loader)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        im = loader(fn)
+        if im is None:
+            return None
+        nbytes = _image_nbytes(im)
+        if nbytes <= self.max_bytes:
+            with self.lock:
+                if key not in self.entries:
+                    self.entries[key] = (im, nbytes)
+                    self.bytes += nbytes
+                while self.bytes > self.max_bytes:
+                    key, (old_im, old_nbytes) = self.entries.popitem(last=False)
+                    self.bytes -= old_nbytes
+                    self.evictions += 1
+        return im
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+image_cache = ImageCache()
+
+
+#
+# ThumbnailStore - thumbnails kept on disk between sessions
+#
+#   Set eztk.thumbnail_store to a ThumbnailStore and make_thumbnail() (given
+#   the file name), thumbnails of images shown from files and ThumbnailGallery
+#   keep their thumbnails in directory as PNG files. A file is named by a
+#   hash of the source path, mtime and size and the thumbnail size, so a
+#   source that changes gets a new thumbnail. Reading a thumbnail touches its
+#   file, and when the directory grows beyond max_bytes the least recently
+#   used files are deleted. ThumbnailGallery worker processes are given only
+#   the path of a thumbnail's file and read or write it themselves, under a
+#   temporary name renamed when complete. The tk process keeps the counts and
+#   does the pruning with record_lookup() and record_put().
+#
+#   Thumbnails are stored with their channels as they are, so RGB thumbnails
+#   read back as RGB. make_thumbnail() resizes images smaller than min_pixels
+#   directly, since that is quicker than reading or writing a PNG file on the
+#   tk thread. Temporary files left by interrupted writes are deleted by
+#   prune() once they are stale_seconds old.
+#
+class ThumbnailStore:
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        _require_image_libs("ThumbnailStore")
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.min_pixels = 1024 * 1024  # smaller images aren't worth storing
+        self.stale_seconds = 60  # age of an abandoned temporary file
+        self.bytes = None  # size of the stored files, None until measured
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, fn, width, height=None):
+        # The file for the thumbnail of fn, None if fn doesn't exist
+        try:
+            stat = os.stat(fn)
+        except OSError:
+            return None
+        key = repr((os.path.abspath(fn), stat.st_mtime_ns, stat.st_size, width, height))
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".png")
+
+    def get(self, fn, width, height=None):
+        path = self.path(fn, width, height)
+        im = None
+        if path is not None:
+            im = _read_stored_thumbnail(path)
+        self.record_lookup(im is not None)
+        return im
+
+    def put(self, fn, width, im, height=None):
+        path = self.path(fn, width, height)
+        if path is not None:
+            self.record_put(_write_stored_thumbnail(path, im))
+
+    def record_lookup(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def record_put(self, nbytes):
+        # Account for a file of nbytes written to the directory, possibly by
+        # a worker process
+        if nbytes == 0:
+            return
+        if self.bytes is None:
+            self.prune()
+        else:
+            self.bytes += nbytes
+            if self.bytes > self.max_bytes:
+                self.prune()
+
+    def prune(self):
+        # Delete the least recently used thumbnails until the files fit in
+        # max_bytes
+        entries = []
+        total = 0
+        stale_time = time.time() - self.stale_seconds
+        for entry in os.scandir(self.directory):
+            is_tmp = entry.name.endswith(".tmp")
+            if not (is_tmp or entry.name.endswith(".png")):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # deleted by another process
+            if is_tmp:
+                if stat.st_mtime < stale_time:
+                    try:
+                        os.remove(entry.path)  # left by an interrupted write
+                    except OSError:
+                        pass
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self.bytes = total
+
+    def stats(self):
+        return {
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _read_stored_thumbnail(path):
+    # Returns the thumbnail in file path of a ThumbnailStore, None if there
+    # isn't one. The file is touched as the most recently used.
+    if not os.path.exists(path):
+        return None
+    im = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if im is not None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    return im
+
+
+def _write_stored_thumbnail(path, im):
+    # Saves thumbnail im as file path of a ThumbnailStore and returns the
+    # number of bytes written, 0 if it couldn't be encoded
+    ok, data = cv2.imencode(".png", im)
+    if not ok:
+        return 0
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(data.tobytes())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+thumbnail_store = None  # a ThumbnailStore to keep thumbnails between sessions
+
+_image_executor = None
+_gallery_executor = None
+
+
+def _get_image_executor():
+    # Worker threads for update_image_async(), started on first use
+    global _image_executor
+    if _image_executor is None:
+        import concurrent.futures
+
+        _image_executor = concurrent.futures.ThreadPoolExecutor(
+            thread_name_prefix="eztk-image"
+        )
+    return _image_executor
+
+
+def _get_gallery_executor():
+    # Worker processes for ThumbnailGallery, started on first use. Decoding a
+    # folder of full size images is enough work to want every core. They are
+    # spawned, not forked, since forking a process with a Tk interpreter and
+    # the image thread pool running can deadlock.
+    global _gallery_executor
+    if _gallery_executor is None:
+        import concurrent.futures
+        import multiprocessing
+
+        _gallery_executor = concurrent.futures.ProcessPoolExecutor(
+            mp_context=multiprocessing.get_context("spawn")
         )
+    return _gallery_executor
+
+
+def _scrolled_text_module():
+    import tkinter.scrolledtext
+
+    return tkinter.scrolledtext
+
+
+def _is_scrolled_text(tkw):
+    # If tkinter.scrolledtext hasn't been imported, tkw can't be a ScrolledText
+    # and there is no need to import it just to check.
+    if isinstance(tkw, HeadlessScrolledText):
+        return True
+    module = sys.modules.get("tkinter.scrolledtext")
+    return (module is not None) and isinstance(tkw, module.ScrolledText)
 
 
 #
@@ -176,85 +612,1693 @@ class Notebook(tkinter.Frame):
         return self.tab_labels_text.index(tabid)
 
     def tabs(self):
-        return self.tab_labels_text
+        return self.tab_labels_text
+
+    def on_tab_click(self, event):
+        print("Notebook.on_tab_click()", event.widget)
+        """
+        for this in self.tab_labels_widget:
+            print(">>>")
+            for that in dir(this):
+                print("   ", that, ":", getattr(this, that))
+        """
+        self.select(tabid=event.widget)
+
+
+#
+# ScrolledFrame - A child of Frame with scroll bars
+#
+# Adapted from http://code.activestate.com/recipes/580793-tkinter-table-with-scrollbars/
+#
+"""
+    def __init__(self, master, columns, column_weights=None, column_minwidths=None, height=500, minwidth=20, minheight=20, padx=5, pady=5, cell_font=None, cell_foreground="black", cell_background="white", cell_anchor=W, header_font=None, header_background="white", header_foreground="black", header_anchor=CENTER, bordercolor = "#999999", innerborder=True, outerborder=True, stripped_rows=("#EEEEEE", "white"), on_change_data=None, mousewheel_speed = 2, scroll_horizontally=False, scroll_vertically=True):
+"""
+
+
+class ScrolledFrame(tkinter.Frame):
+    def __init__(
+        self,
+        HeadingRow=False,
+        HeadingColumn=False,
+        bordercolor="#999999",
+        outerborder=True,
+        scroll_horizontally=False,
+        scroll_vertically=True,
+    ):
+        super().__init__()
+        outerborder_width = 1 if outerborder else 0
+        self.heading_frame = tkinter.Frame(
+            self,
+            highlightbackground=bordercolor,
+            highlightcolor=bordercolor,
+            highlightthickness=outerborder_width,
+            bd=0,
+        )
+        self.heading_frame.grid(row=0, column=0, sticky=tkinter.E + tkinter.W)
+        if scroll_horizontally:
+            xscrollbar = Scrollbar(self, orient=HORIZONTAL)
+            xscrollbar.grid(row=2, column=0, sticky=E + W)
+        else:
+            xscrollbar = None
+
+        if scroll_vertically:
+            yscrollbar = Scrollbar(self, orient=VERTICAL)
+            yscrollbar.grid(row=1, column=1, sticky=N + S)
+        else:
+            yscrollbar = None
+
+
+#
+# TableData - columnar data source for a VirtualTable
+#
+#   Each column is a sequence of values: a numpy array, an array.array or a
+#   list. Sorting and filtering never move the data. They compute self.index,
+#   the data row shown at each view row, as a permutation / selection array,
+#   so re-sorting a large table is an argsort plus a viewport refresh.
+#   self.index is None when the view is every row in storage order.
+#
+#   Numpy columns are handled with vectorized operations: a filter predicate
+#   is called once with the whole column and must return a boolean mask.
+#   For other columns the predicate is called with each value.
+#
+#   append_rows() is meant for streaming. Numpy columns grow inside buffers
+#   that double in size, and only the new rows are filtered. While sorted,
+#   new rows go to the end of the view until resort() sorts them in.
+#
+class TableData:
+    def __init__(self, columns, names=None, formats=None):
+        self.columns = list(columns)
+        self.names = names  # column names, for application use
+        self.formats = formats  # format string per column, None for str()
+        self.sort_col = None
+        self.sort_reverse = False
+        self.filter_col = None
+        self.filter_predicate = None
+        self.index = None
+        self.buffers = {}  # col: numpy buffer a numpy column is the start of
+        self.unsorted_rows = 0  # rows appended at the end of a sorted view
+
+    def col_count(self):
+        return len(self.columns)
+
+    def row_count(self):
+        if self.index is not None:
+            return len(self.index)
+        if len(self.columns) == 0:
+            return 0
+        return len(self.columns[0])
+
+    def data_row(self, view_row):
+        if self.index is None:
+            return view_row
+        return self.index[view_row]
+
+    def value(self, view_row, col):
+        return self.columns[col][self.data_row(view_row)]
+
+    def cell_text(self, view_row, col):
+        v = self.value(view_row, col)
+        if (self.formats is None) or (self.formats[col] is None):
+            return str(v)
+        return self.formats[col].format(v)
+
+    def append_rows(self, rows):
+        # rows is a list of row sequences. Short rows are padded, with "" in
+        # list columns, NaN in float numpy columns and zero or empty in other
+        # numpy columns. Long rows are truncated to the number of columns.
+        col_count = len(self.columns)
+        if col_count == 0:
+            return
+        start = len(self.columns[0])
+        for col in range(col_count):
+            column = self.columns[col]
+            if hasattr(column, "extend"):
+                fill = ""
+            elif column.dtype.kind in "fc":
+                fill = float("nan")
+            else:
+                fill = column.dtype.type()
+            values = [row[col] if col < len(row) else fill for row in rows]
+            if hasattr(column, "extend"):
+                column.extend(values)
+            else:
+                self.columns[col] = self._grow(col, column, values)
+        if self.index is not None:
+            self._index_rows(start, len(self.columns[0]))
+
+    def _grow(self, col, column, values):
+        import numpy  # present, since column is a numpy array
+
+        size = len(column)
+        buffer = self.buffers.get(col)
+        if (buffer is None) or (column.base is not buffer):
+            buffer = column  # not one of ours, copied when it has to grow
+        if len(buffer) < size + len(values):
+            capacity = max(2 * len(buffer), size + len(values), 1024)
+            grown = numpy.empty(capacity, dtype=column.dtype)
+            grown[:size] = column
+            buffer = grown
+            self.buffers[col] = buffer
+        buffer[size : size + len(values)] = values
+        return buffer[: size + len(values)]
+
+    def _index_rows(self, start, end):
+        # Add storage rows start to end - 1 to the view
+        rows = range(start, end)
+        if self.filter_predicate is not None:
+            column = self.columns[self.filter_col]
+            if hasattr(column, "nonzero"):
+                rows = self.filter_predicate(column[start:end]).nonzero()[0] + start
+            else:
+                predicate = self.filter_predicate
+                rows = [r for r in rows if predicate(column[r])]
+        if not isinstance(self.index, array.array):
+            self.index = array.array("q", self.index)
+        self.index.extend(rows)
+        if self.sort_col is not None:
+            self.unsorted_rows += len(rows)
+
+    def resort(self):
+        # Sort the rows appended since the view was sorted into place
+        if self.unsorted_rows > 0:
+            self._make_index()
+
+    def sort(self, col, reverse=False):
+        # col None returns to storage order
+        self.sort_col = col
+        self.sort_reverse = reverse
+        self._make_index()
+
+    def filter(self, col, predicate):
+        # predicate None removes the filter
+        self.filter_col = col
+        self.filter_predicate = predicate
+        self._make_index()
+
+    def _make_index(self):
+        self.unsorted_rows = 0
+        index = None
+        if self.filter_predicate is not None:
+            column = self.columns[self.filter_col]
+            if hasattr(column, "nonzero"):
+                index = self.filter_predicate(column).nonzero()[0]
+            else:
+                predicate = self.filter_predicate
+                index = array.array(
+                    "q", [r for r in range(len(column)) if predicate(column[r])]
+                )
+        if self.sort_col is not None:
+            column = self.columns[self.sort_col]
+            if hasattr(column, "argsort"):
+                if index is None:
+                    order = _stable_argsort(column, self.sort_reverse)
+                else:
+                    import numpy  # present, since column is a numpy array
+
+                    index = numpy.asarray(index)
+                    order = index[_stable_argsort(column[index], self.sort_reverse)]
+                index = order
+            else:
+                if index is None:
+                    index = range(len(column))
+                index = array.array(
+                    "q",
+                    sorted(index, key=column.__getitem__, reverse=self.sort_reverse),
+                )
+        self.index = index
+
+
+def _stable_argsort(keys, reverse):
+    # argsort that keeps equal keys in storage order, also when reversed,
+    # like sorted(reverse=True). Descending is the ascending order of the
+    # reversed keys, read backwards and mapped back to the original rows.
+    if not reverse:
+        return keys.argsort(kind="stable")
+    order = keys[::-1].argsort(kind="stable")[::-1]
+    return len(keys) - 1 - order
+
+
+#
+# VirtualTable - scrollable table that only creates widgets for visible rows
+#
+#   The canvas scrollregion covers every row of the table, but only the rows
+#   in the visible window plus a few rows of overscan above and below exist
+#   as widgets. Each row is a Frame of Labels placed on the canvas with
+#   create_window(). Data row r is always shown by slot (r % pool_size), so as
+#   the canvas scrolls, the slots that fall out of the window are moved and
+#   relabeled to show the rows coming into view. The number of widgets depends
+#   on the canvas height, not on the number of rows.
+#
+class VirtualTable:
+    def __init__(
+        self,
+        canvas,
+        get_cell,
+        col_count,
+        row_count=0,
+        row_height=20,
+        col_widths=None,
+        overscan=5,
+        visible_height=200,
+        yscroll=None,
+        on_click=None,
+        data=None,
+    ):
+        self.canvas = canvas
+        self.data = data  # TableData, if the table has one
+        if data is not None:
+            get_cell = data.cell_text
+        self.get_cell = get_cell  # get_cell(row, col) returns the text of a cell
+        self.col_count = col_count
+        self.row_count = row_count
+        self.row_height = row_height  # pixels, every row is the same height
+        if col_widths is None:
+            col_widths = [10] * col_count
+        self.col_widths = list(col_widths)  # characters, as for tkinter.Label width
+        self.overscan = overscan
+        self.visible_height = visible_height
+        self.yscroll = yscroll  # usually the set() method of the vertical scrollbar
+        self.on_click = on_click
+        self.row_width = 0  # pixels, measured when the first row is created
+        self.slot_frames = []  # row Frame for each slot
+        self.slot_items = []  # canvas window item for each slot
+        self.slot_labels = []  # list of cell Labels for each slot
+        self.slot_rows = []  # data row shown by each slot, None if hidden
+        self.slot_text = []  # list of rendered cell text for each slot
+        self.label_cells = {}  # Label -> (slot, col) to map click events
+        self.pending_cells = {}  # (slot, col) -> (row, text) waiting for idle
+        self.flush_scheduled = False
+        self.cells_touched = 0  # total cells changed by update_cells()
+
+    def pool_size(self):
+        # Enough slots for a window positioned anywhere over the rows.
+        return int(self.visible_height // self.row_height) + 2 + 2 * self.overscan
+
+    def visible_range(self, top):
+        # Returns (first, last) such that data rows first to last - 1 need widgets
+        # when the canvas is scrolled to pixel offset top.
+        first = int(top // self.row_height) - self.overscan
+        if first < 0:
+            first = 0
+        last = int((top + self.visible_height) // self.row_height) + 1 + self.overscan
+        if last > self.row_count:
+            last = self.row_count
+        return (first, last)
+
+    def cell_of(self, event):
+        # Map a click event on a cell Label to its (data row, col)
+        slot, col = self.label_cells[event.widget]
+        return (self.slot_rows[slot], col)
+
+    def sort_by(self, col, reverse=False):
+        self.data.sort(col, reverse=reverse)
+        self.set_row_count(self.data.row_count())
+
+    def filter_by(self, col, predicate):
+        self.data.filter(col, predicate)
+        self.set_row_count(self.data.row_count())
+
+    def append_rows(self, rows, names=None):
+        # The first rows, or the names, decide the number of columns
+        if self.data is None:
+            col_count = max([len(row) for row in rows], default=0)
+            if names is not None:
+                col_count = max(col_count, len(names))
+            self.data = TableData([[] for col in range(col_count)])
+            self.get_cell = self.data.cell_text
+            if col_count > self.col_count:
+                self._add_columns(col_count)
+        if names is not None:
+            self.data.names = list(names)
+        self.data.append_rows(rows)
+        self.set_row_count(self.data.row_count())
+
+    def resort(self):
+        # Sort rows appended to a sorted table into place, see TableData
+        if (self.data is not None) and (self.data.unsorted_rows > 0):
+            self.data.resort()
+            self.refresh(force=True)
+
+    def update_cells(self, values):
+        # Replace the table contents with values, either a 2-D numpy array or a
+        # sequence of rows. Cells on screen are compared with what was last
+        # rendered and only the ones that changed are configured, batched into
+        # one idle callback. Returns the number of cells changed.
+        # Table columns past those of values are shown blank.
+        if hasattr(values, "shape"):
+            if len(values.shape) != 2:
+                raise ValueError("update_cells() requires a 2-D array")
+            columns = [values[:, col] for col in range(values.shape[1])]
+        else:
+            columns = [list(column) for column in zip(*values)]
+        if self.data is None:
+            self.data = TableData(columns)
+            self.get_cell = self.data.cell_text
+        else:
+            self.data.columns = columns
+            self.data._make_index()
+        row_count = self.data.row_count()
+        if row_count != self.row_count:
+            self.row_count = row_count
+            self.canvas.configure(
+                scrollregion=(0, 0, self.row_width, row_count * self.row_height)
+            )
+            self.refresh()
+        touched = 0
+        for slot in range(len(self.slot_rows)):
+            row = self.slot_rows[slot]
+            if row is None:
+                continue
+            text = self.slot_text[slot]
+            for col in range(self.col_count):
+                cell_text = self._cell_text(row, col)
+                pending = self.pending_cells.get((slot, col))
+                if (pending is not None) and (pending[0] == row):
+                    shown_text = pending[1]
+                else:
+                    shown_text = text[col]
+                if cell_text != shown_text:
+                    self.pending_cells[(slot, col)] = (row, cell_text)
+                    touched += 1
+        if (touched > 0) and not self.flush_scheduled:
+            self.canvas.after_idle(self._flush_cells)
+            self.flush_scheduled = True
+        self.cells_touched += touched
+        return touched
+
+    def _cell_text(self, row, col):
+        if (self.data is not None) and (col >= self.data.col_count()):
+            return ""  # the data has fewer columns than the table
+        return self.get_cell(row, col)
+
+    def _flush_cells(self):
+        for (slot, col), (row, cell_text) in self.pending_cells.items():
+            # a slot that was scrolled to another row since has been re-rendered
+            if self.slot_rows[slot] == row:
+                self.slot_labels[slot][col].configure(text=cell_text)
+                self.slot_text[slot][col] = cell_text
+        self.pending_cells = {}
+        self.flush_scheduled = False
+
+    def set_row_count(self, row_count):
+        self.row_count = row_count
+        if self.row_width == 0:
+            self._make_slot()
+        self.canvas.configure(
+            scrollregion=(0, 0, self.row_width, row_count * self.row_height)
+        )
+        self.refresh(force=True)
+
+    def on_yscroll(self, first, last):
+        # Installed as the canvas yscrollcommand, so it runs whenever the view
+        # moves, whether from the scrollbar, the mouse or a scrollregion change.
+        if self.yscroll is not None:
+            self.yscroll(first, last)
+        self.refresh()
+
+    def refresh(self, force=False):
+        height = self.canvas.winfo_height()
+        if height > 1:
+            self.visible_height = height
+        pool_size = self.pool_size()
+        while len(self.slot_frames) < pool_size:
+            self._make_slot()
+        first, last = self.visible_range(self.canvas.canvasy(0))
+        for slot in range(len(self.slot_rows)):
+            data_row = self.slot_rows[slot]
+            if data_row is None:
+                continue
+            if (
+                (data_row < first)
+                or (data_row >= last)
+                or (data_row % pool_size != slot)
+            ):
+                self.canvas.itemconfigure(self.slot_items[slot], state="hidden")
+                self.slot_rows[slot] = None
+        for data_row in range(first, last):
+            slot = data_row % pool_size
+            if force or (self.slot_rows[slot] != data_row):
+                self._render_row(slot, data_row)
+
+    def _make_slot(self):
+        slot = len(self.slot_frames)
+        row_frame = tkinter.Frame(self.canvas)
+        labels = []
+        for col in range(self.col_count):
+            labels.append(self._make_label(row_frame, slot, col))
+        item = self.canvas.create_window(
+            0, 0, window=row_frame, anchor="nw", height=self.row_height, state="hidden"
+        )
+        self.slot_frames.append(row_frame)
+        self.slot_items.append(item)
+        self.slot_labels.append(labels)
+        self.slot_rows.append(None)
+        self.slot_text.append([None] * self.col_count)
+        if self.row_width == 0:
+            self._measure_row()
+
+    def _make_label(self, row_frame, slot, col):
+        label = tkinter.Label(row_frame, width=self.col_widths[col], anchor=tkinter.W)
+        label.grid(column=col, row=0)
+        if self.on_click is not None:
+            label.bind("<Button-1>", self.on_click)
+        self.label_cells[label] = (slot, col)
+        return label
+
+    def _measure_row(self):
+        self.canvas.update_idletasks()  # calculates reqwidth of the first row
+        self.row_width = self.slot_frames[0].winfo_reqwidth()
+
+    def _add_columns(self, col_count):
+        # Widen the table to col_count columns, adding labels to the slots
+        while len(self.col_widths) < col_count:
+            self.col_widths.append(10)
+        for slot in range(len(self.slot_frames)):
+            for col in range(self.col_count, col_count):
+                label = self._make_label(self.slot_frames[slot], slot, col)
+                self.slot_labels[slot].append(label)
+                self.slot_text[slot].append(None)
+        self.col_count = col_count
+        if len(self.slot_frames) > 0:
+            self._measure_row()
+
+    def _render_row(self, slot, data_row):
+        labels = self.slot_labels[slot]
+        text = self.slot_text[slot]
+        for col in range(self.col_count):
+            cell_text = self._cell_text(data_row, col)
+            if cell_text != text[col]:
+                labels[col].configure(text=cell_text)
+                text[col] = cell_text
+        item = self.slot_items[slot]
+        self.canvas.coords(item, 0, data_row * self.row_height)
+        if self.slot_rows[slot] is None:
+            self.canvas.itemconfigure(item, state="normal")
+        self.slot_rows[slot] = data_row
+
+
+#
+# TableLoader - streams rows into a VirtualTable without blocking mainloop
+#
+#   source is a CSV file path or any iterable of rows. Rows are appended in
+#   chunks of chunk_rows, each chunk run from its own after() callback so tk
+#   processes events and redraws between chunks. The table scrollregion grows
+#   as rows arrive.
+#
+#   on_progress(rows_loaded) is called after each chunk; returning False
+#   from it cancels the load. on_done(rows_loaded) is called at the end of
+#   the source and on_cancel(rows_loaded) when the load is cancelled.
+#
+class TableLoader:
+    def __init__(
+        self,
+        table,
+        source,
+        chunk_rows=1000,
+        header=False,
+        delimiter=",",
+        delay_ms=1,
+        on_progress=None,
+        on_done=None,
+        on_cancel=None,
+    ):
+        self.table = table  # VirtualTable
+        if isinstance(source, str):
+            self.file = open(source, newline="")
+            self.rows = csv.reader(self.file, delimiter=delimiter)
+        else:
+            self.file = None
+            self.rows = iter(source)
+        self.chunk_rows = chunk_rows
+        self.header = header
+        self.delay_ms = delay_ms
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_cancel = on_cancel
+        self.rows_loaded = 0
+        self.is_loading = False
+        self.after_id = None
+
+    def start(self):
+        self.is_loading = True
+        self.after_id = self.table.canvas.after_idle(self._load_chunk)
+
+    def cancel(self):
+        if not self.is_loading:
+            return
+        if self.after_id is not None:
+            self.table.canvas.after_cancel(self.after_id)
+        self._finish()
+        if self.on_cancel is not None:
+            self.on_cancel(self.rows_loaded)
+
+    def _finish(self):
+        self.is_loading = False
+        self.after_id = None
+        self.table.resort()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _load_chunk(self):
+        self.after_id = None
+        try:
+            names = None
+            if self.header:
+                self.header = False
+                names = next(self.rows, None)
+            chunk = list(itertools.islice(self.rows, self.chunk_rows))
+            if (len(chunk) > 0) or (names is not None):
+                self.table.append_rows(chunk, names)  # names even without rows
+        except Exception:
+            self._finish()  # close the file and stop, tk reports the error
+            raise
+        if len(chunk) > 0:
+            self.rows_loaded += len(chunk)
+            if self.on_progress is not None:
+                if self.on_progress(self.rows_loaded) is False:
+                    self.cancel()
+                    return
+        if len(chunk) < self.chunk_rows:
+            self._finish()
+            if self.on_done is not None:
+                self.on_done(self.rows_loaded)
+        else:
+            self.after_id = self.table.canvas.after(self.delay_ms, self._load_chunk)
+
+
+def open_image_source(fn, shape=None, dtype="uint8", offset=0):
+    # Opens a large image for TiledImage without reading it into memory.
+    # A .npy file is memory-mapped with its own header. Any other file is
+    # treated as raw pixels and needs shape, (height, width) or
+    # (height, width, 3) for RGB, and optionally dtype and a header offset.
+    _require_image_libs("open_image_source")
+    if fn.endswith(".npy"):
+        return np.load(fn, mmap_mode="r")
+    return np.memmap(fn, dtype=dtype, mode="r", shape=shape, offset=offset)
+
+
+#
+# TiledImage - image on a canvas shown as tiles near the visible window
+#
+#   The scrollregion covers the whole image, but a PhotoImage exists only for
+#   the tiles that intersect the visible window, plus margin tiles around it
+#   so scrolling doesn't show gaps. Tiles more than keep tiles outside the
+#   window are deleted. The source is any 2-D (grayscale) or 3-D (RGB) numpy
+#   array. With a memory-mapped array from open_image_source(), only the parts
+#   of the file under the tiles that have been shown are read.
+#
+#   uint16 and float sources are mapped to uint8 tile by tile according to
+#   display_window, as by update_image(). "auto" is worked out once, from a
+#   sample of the source, so all the tiles are mapped alike.
+#
+class TiledImage:
+    def __init__(
+        self,
+        canvas,
+        source,
+        tile_size=256,
+        margin=1,
+        keep=2,
+        view_width=400,
+        view_height=200,
+        xscroll=None,
+        yscroll=None,
+        backend=None,
+        display_window=None,
+    ):
+        self.canvas = canvas
+        self.source = source
+        self.image_height, self.image_width = source.shape[:2]
+        self.tile_size = tile_size
+        self.margin = margin  # tiles made ahead of the visible window
+        self.keep = keep  # tiles kept around the visible window before deletion
+        self.view_width = view_width
+        self.view_height = view_height
+        self.xscroll = xscroll  # usually the set() method of the scrollbars
+        self.yscroll = yscroll
+        self.tiles = {}  # (tile_col, tile_row) -> (PhotoImage, canvas item)
+        self.backend = _photo_backend(backend)
+        if (display_window == "auto") and (source.dtype != np.uint8):
+            step = max(self.image_height // 1024, self.image_width // 1024, 1)
+            sample = source[::step, ::step]
+            display_window = (float(sample.min()), float(sample.max()))
+        self.display_window = display_window
+
+    def tile_range(self, left, top, extra):
+        # Returns (col0, row0, col1, row1), the tiles from col0, row0 up to but
+        # not including col1, row1 that cover the window at left, top, with
+        # extra tiles added on every side.
+        size = self.tile_size
+        col0 = max(int(left // size) - extra, 0)
+        row0 = max(int(top // size) - extra, 0)
+        col1 = int((left + self.view_width - 1) // size) + 1 + extra
+        row1 = int((top + self.view_height - 1) // size) + 1 + extra
+        col1 = min(col1, (self.image_width + size - 1) // size)
+        row1 = min(row1, (self.image_height + size - 1) // size)
+        return (col0, row0, col1, row1)
+
+    def on_xscroll(self, first, last):
+        if self.xscroll is not None:
+            self.xscroll(first, last)
+        self.refresh()
+
+    def on_yscroll(self, first, last):
+        if self.yscroll is not None:
+            self.yscroll(first, last)
+        self.refresh()
+
+    def refresh(self):
+        width = self.canvas.winfo_width()
+        if width > 1:
+            self.view_width = width
+            self.view_height = self.canvas.winfo_height()
+        left = self.canvas.canvasx(0)
+        top = self.canvas.canvasy(0)
+        col0, row0, col1, row1 = self.tile_range(left, top, self.keep)
+        for key in list(self.tiles):
+            tile_col, tile_row = key
+            if not ((col0 <= tile_col < col1) and (row0 <= tile_row < row1)):
+                self._delete_tile(key)
+        col0, row0, col1, row1 = self.tile_range(left, top, self.margin)
+        for tile_row in range(row0, row1):
+            for tile_col in range(col0, col1):
+                if (tile_col, tile_row) not in self.tiles:
+                    self._make_tile(tile_col, tile_row)
+
+    def clear(self):
+        for key in list(self.tiles):
+            self._delete_tile(key)
+
+    def _make_photo(self, im):
+        return _photo_image(im, self.backend, self.canvas)
+
+    def _make_tile(self, tile_col, tile_row):
+        size = self.tile_size
+        x = tile_col * size
+        y = tile_row * size
+        im = np.ascontiguousarray(self.source[y : y + size, x : x + size])
+        photo = self._make_photo(_to_uint8(im, self.display_window))
+        item = self.canvas.create_image(x, y, image=photo, anchor="nw")
+        self.tiles[(tile_col, tile_row)] = (photo, item)
+
+    def _delete_tile(self, key):
+        photo, item = self.tiles.pop(key)
+        self.canvas.delete(item)
+
+
+#
+# ImagePyramid - an image reduced by halves, for zooming without re-decoding
+#
+#   levels[0] is the image itself and each following level is half the size
+#   of the previous one, down to about min_size pixels. To show the image at
+#   a zoom factor, view() crops the visible window from the smallest level
+#   that still has at least the needed resolution and scales just that crop.
+#
+class ImagePyramid:
+    def __init__(self, im, min_size=64):
+        self.levels = [im]
+        height, width = im.shape[:2]
+        self.width = width
+        self.height = height
+        self.scales = [1.0]  # size of each level relative to levels[0]
+        while max(height, width) > 2 * min_size:
+            width = (width + 1) // 2
+            height = (height + 1) // 2
+            im = cv2.resize(im, (width, height), interpolation=cv2.INTER_AREA)
+            self.levels.append(im)
+            self.scales.append(float(width) / float(self.width))
+
+    def level_for(self, zoom):
+        # The smallest level with at least zoom resolution
+        level = 0
+        while (level + 1 < len(self.levels)) and (self.scales[level + 1] >= zoom):
+            level += 1
+        return level
+
+    def view(self, zoom, left, top, width, height):
+        # The image shown at zoom, so it is zoom * self.width pixels wide,
+        # seen through a window width x height at left, top.
+        # Returns (im, x, y), the part of the window that the image covers and
+        # where it goes, or (None, 0, 0) if the window is outside the image.
+        level = self.level_for(zoom)
+        im = self.levels[level]
+        scale = zoom / self.scales[level]  # window pixels per level pixel
+        level_height, level_width = im.shape[:2]
+        x0 = max(int(left / scale), 0)
+        y0 = max(int(top / scale), 0)
+        x1 = min(int(math.ceil((left + width) / scale)), level_width)
+        y1 = min(int(math.ceil((top + height) / scale)), level_height)
+        if (x1 <= x0) or (y1 <= y0):
+            return (None, 0, 0)
+        im = im[y0:y1, x0:x1]
+        view_width = max(int(round((x1 - x0) * scale)), 1)
+        view_height = max(int(round((y1 - y0) * scale)), 1)
+        if (view_width, view_height) != (x1 - x0, y1 - y0):
+            if scale < 1.0:
+                interpolation = cv2.INTER_AREA
+            else:
+                interpolation = cv2.INTER_LINEAR
+            im = cv2.resize(im, (view_width, view_height), interpolation=interpolation)
+        return (im, int(round(x0 * scale)), int(round(y0 * scale)))
+
+
+#
+# CanvasOverlay - annotations drawn as canvas items above a canvas image
+#
+#   Application code draws each frame of annotations between begin() and
+#   end(). Canvas items are kept in a pool for each kind and reused by
+#   changing their coords and options, rather than deleted and created, and
+#   items not used in a frame are hidden by end(). Only coords and options
+#   that differ from the item's previous use are sent to tk. An item drawn
+#   with other option names than last time is made again, so options left
+#   out don't stay from the previous use. The image raster
+#   is never touched. Coordinates are image pixels, mapped through the
+#   widget's pil_resize_ratio (or zoom) when drawn, so after a zoom change
+#   the annotations should be drawn again.
+#
+class CanvasOverlay:
+    defaults = {
+        "rectangle": {"outline": "red", "width": 1, "fill": ""},
+        "line": {"fill": "red", "width": 1},
+        "text": {"fill": "red", "anchor": "nw", "text": ""},
+    }
+
+    def __init__(self, frame, tag="overlay"):
+        self.frame = frame  # TkWidgetDef of the canvas
+        self.canvas = frame.tkw
+        self.tag = tag
+        self.pools = {"rectangle": [], "line": [], "text": []}  # kind -> items
+        self.used = {"rectangle": 0, "line": 0, "text": 0}  # items this frame
+        self.item_coords = {}  # item -> coords last set
+        self.item_options = {}  # item -> options last set
+        self.hidden = set()
+
+    def begin(self):
+        for kind in self.used:
+            self.used[kind] = 0
+
+    def end(self):
+        for kind, pool in self.pools.items():
+            for item in pool[self.used[kind] :]:
+                if item not in self.hidden:
+                    self.canvas.itemconfigure(item, state="hidden")
+                    self.hidden.add(item)
+        self.canvas.tag_raise(self.tag)
+
+    def clear(self):
+        self.begin()
+        self.end()
+
+    def rectangle(self, x0, y0, x1, y1, **options):
+        return self._draw("rectangle", (x0, y0, x1, y1), options)
+
+    def polyline(self, points, **options):
+        # points is a sequence of (x, y)
+        coords = []
+        for x, y in points:
+            coords.append(x)
+            coords.append(y)
+        return self._draw("line", coords, options)
+
+    def text(self, x, y, text, **options):
+        options["text"] = text
+        return self._draw("text", (x, y), options)
+
+    def _draw(self, kind, coords, options):
+        ratio = self.frame.pil_resize_ratio
+        if ratio is not None:
+            coords = [v * ratio for v in coords]
+        else:
+            coords = list(coords)
+        item_options = dict(self.defaults[kind])
+        item_options.update(options)
+        pool = self.pools[kind]
+        ix = self.used[kind]
+        self.used[kind] = ix + 1
+        if ix < len(pool) and (
+            self.item_options[pool[ix]].keys() != item_options.keys()
+        ):
+            item = pool[ix]
+            self.canvas.delete(item)
+            del self.item_coords[item]
+            del self.item_options[item]
+            self.hidden.discard(item)
+            pool[ix] = self._create(kind, coords, item_options)
+            return pool[ix]
+        if ix == len(pool):
+            pool.append(self._create(kind, coords, item_options))
+            return pool[ix]
+        item = pool[ix]
+        if coords != self.item_coords[item]:
+            self.canvas.coords(item, *coords)
+            self.item_coords[item] = coords
+        last_options = self.item_options[item]
+        changed = {}
+        for key, value in item_options.items():
+            if last_options.get(key) != value:
+                changed[key] = value
+        if item in self.hidden:
+            changed["state"] = "normal"
+            self.hidden.discard(item)
+        if len(changed) > 0:
+            self.canvas.itemconfigure(item, **changed)
+            self.item_options[item] = item_options
+        return item
+
+    def _create(self, kind, coords, item_options):
+        create = getattr(self.canvas, "create_" + kind)
+        item = create(*coords, tags=(self.tag,), **item_options)
+        self.item_coords[item] = coords
+        self.item_options[item] = item_options
+        return item
+
+
+#
+# ThumbnailGallery - scrolling grid of thumbnails of many image files
+#
+#   Like VirtualTable, the canvas only has widgets for the rows in view: a
+#   pool of row Frames, each with a Label per column laid out with grid, that
+#   are moved and refilled as the canvas scrolls. Thumbnails are made in
+#   worker processes, polled for with after(), and shown as they complete, so
+#   neither decoding nor resizing blocks the tk thread. Only the thumbnails of
+#   rows near the view are kept and work for rows scrolled away is cancelled,
+#   so memory depends on the size of the view, not the number of files.
+#
+#   on_click is bound to the thumbnails and index_of(event) gives the index
+#   into paths of the one that was clicked.
+#
+def _gallery_thumbnail(fn, size, store_path=None):
+    # Runs in a worker process. Returns (im, hit, nbytes): im is the RGB
+    # thumbnail of image file fn that fits in size x size, or None if it can't
+    # be read. store_path is the file of the thumbnail in thumbnail_store, hit
+    # is whether im was read from it (None without a store) and nbytes the
+    # size of the file written when it wasn't.
+    _require_image_libs("ThumbnailGallery")
+    if store_path is not None:
+        im = _read_stored_thumbnail(store_path)
+        if im is not None:
+            return (im, True, 0)
+    hit = None if store_path is None else False
+    im = cv2.imread(fn)
+    if im is None:
+        return (None, hit, 0)
+    height, width = im.shape[:2]
+    scale = min(float(size) / width, float(size) / height)
+    if scale < 1.0:
+        im = cv2.resize(
+            im,
+            (max(int(width * scale), 1), max(int(height * scale), 1)),
+            interpolation=cv2.INTER_AREA,
+        )
+    im = cv2.cvtColor(im, cv2.COLOR_BGR2RGB)
+    nbytes = 0
+    if store_path is not None:
+        nbytes = _write_stored_thumbnail(store_path, im)
+    return (im, hit, nbytes)
+
+
+class ThumbnailGallery:
+    def __init__(
+        self,
+        canvas,
+        paths,
+        thumb_size=128,
+        columns=4,
+        overscan=1,
+        visible_height=400,
+        yscroll=None,
+        on_click=None,
+        poll_ms=20,
+        backend=None,
+    ):
+        self.canvas = canvas
+        self.paths = list(paths)
+        self.thumb_size = thumb_size  # pixels, the larger side of a thumbnail
+        self.columns = columns
+        self.row_height = thumb_size + 24  # room for the file name
+        self.overscan = overscan
+        self.visible_height = visible_height
+        self.yscroll = yscroll  # usually the set() method of the vertical scrollbar
+        self.on_click = on_click
+        self.poll_ms = poll_ms
+        self.backend = _photo_backend(backend)
+        self.row_width = 0  # pixels, measured when the first row is created
+        self.placeholder = None  # blank PhotoImage for thumbnails not made yet
+        self.slot_frames = []  # row Frame for each slot
+        self.slot_items = []  # canvas window item for each slot
+        self.slot_labels = []  # list of thumbnail Labels for each slot
+        self.slot_rows = []  # gallery row shown by each slot, None if hidden
+        self.label_cells = {}  # Label -> (slot, col) to map click events
+        self.thumbnails = {}  # index -> PhotoImage (None if unreadable)
+        self.futures = {}  # index -> Future of a thumbnail being made
+        self.poll_id = None
+
+    def row_count(self):
+        return (len(self.paths) + self.columns - 1) // self.columns
+
+    def pool_size(self):
+        return int(self.visible_height // self.row_height) + 2 + 2 * self.overscan
+
+    def visible_range(self, top):
+        # Returns (first, last) such that gallery rows first to last - 1 need
+        # widgets when the canvas is scrolled to pixel offset top.
+        first = max(int(top // self.row_height) - self.overscan, 0)
+        last = int((top + self.visible_height) // self.row_height) + 1 + self.overscan
+        return (first, min(last, self.row_count()))
+
+    def index_of(self, event):
+        # Map a click event on a thumbnail Label to its index in paths
+        slot, col = self.label_cells[event.widget]
+        return self.slot_rows[slot] * self.columns + col
+
+    def set_paths(self, paths):
+        self.close()
+        self.paths = list(paths)
+        self.thumbnails = {}
+        if self.row_width == 0:
+            self._make_slot()
+        self.canvas.configure(
+            scrollregion=(0, 0, self.row_width, self.row_count() * self.row_height)
+        )
+        self.refresh(force=True)
+
+    def close(self):
+        # Cancel thumbnails still to be made
+        for future in self.futures.values():
+            future.cancel()
+        self.futures = {}
+        if self.poll_id is not None:
+            self.canvas.after_cancel(self.poll_id)
+            self.poll_id = None
+
+    def on_yscroll(self, first, last):
+        if self.yscroll is not None:
+            self.yscroll(first, last)
+        self.refresh()
+
+    def refresh(self, force=False):
+        height = self.canvas.winfo_height()
+        if height > 1:
+            self.visible_height = height
+        pool_size = self.pool_size()
+        while len(self.slot_frames) < pool_size:
+            self._make_slot()
+        first, last = self.visible_range(self.canvas.canvasy(0))
+        for slot in range(len(self.slot_rows)):
+            row = self.slot_rows[slot]
+            if row is None:
+                continue
+            if (row < first) or (row >= last) or (row % pool_size != slot):
+                self.canvas.itemconfigure(self.slot_items[slot], state="hidden")
+                self.slot_rows[slot] = None
+        for row in range(first, last):
+            slot = row % pool_size
+            if force or (self.slot_rows[slot] != row):
+                self._render_row(slot, row)
+        self._request_thumbnails(
+            first * self.columns, min(last * self.columns, len(self.paths))
+        )
+
+    def _request_thumbnails(self, start, stop):
+        # Keep only the thumbnails from start up to stop and start making the
+        # ones missing
+        for index in list(self.thumbnails):
+            if not (start <= index < stop):
+                del self.thumbnails[index]
+        for index in list(self.futures):
+            if not (start <= index < stop):
+                self.futures.pop(index).cancel()
+        for index in range(start, stop):
+            if (index not in self.thumbnails) and (index not in self.futures):
+                fn = self.paths[index]
+                store_path = None
+                if thumbnail_store is not None:
+                    store_path = thumbnail_store.path(
+                        fn, self.thumb_size, self.thumb_size
+                    )
+                self.futures[index] = _get_gallery_executor().submit(
+                    _gallery_thumbnail, fn, self.thumb_size, store_path
+                )
+        if (len(self.futures) > 0) and (self.poll_id is None):
+            self.poll_id = self.canvas.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        self.poll_id = None
+        for index, future in list(self.futures.items()):
+            if not future.done():
+                continue
+            del self.futures[index]
+            try:
+                im, hit, nbytes = future.result()
+            except Exception:
+                im, hit, nbytes = (None, None, 0)
+            if (hit is not None) and (thumbnail_store is not None):
+                thumbnail_store.record_lookup(hit)
+                thumbnail_store.record_put(nbytes)
+            if im is None:
+                self.thumbnails[index] = None
+            else:
+                self.thumbnails[index] = _photo_image(im, self.backend, self.canvas)
+            row, col = divmod(index, self.columns)
+            slot = row % self.pool_size()  # as in refresh()
+            if self.slot_rows[slot] == row:
+                self.slot_labels[slot][col].configure(image=self._photo(index))
+        if len(self.futures) > 0:
+            self.poll_id = self.canvas.after(self.poll_ms, self._poll)
+
+    def _photo(self, index):
+        photo = self.thumbnails.get(index)
+        if photo is None:
+            return self.placeholder
+        return photo
+
+    def _make_slot(self):
+        slot = len(self.slot_frames)
+        if self.placeholder is None:
+            self.placeholder = tkinter.PhotoImage(
+                master=self.canvas, width=self.thumb_size, height=self.thumb_size
+            )
+        row_frame = tkinter.Frame(self.canvas)
+        labels = []
+        for col in range(self.columns):
+            label = tkinter.Label(
+                row_frame,
+                image=self.placeholder,
+                compound=tkinter.TOP,
+                width=self.thumb_size,
+            )
+            label.grid(column=col, row=0, padx=2)
+            if self.on_click is not None:
+                label.bind("<Button-1>", self.on_click)
+            self.label_cells[label] = (slot, col)
+            labels.append(label)
+        item = self.canvas.create_window(
+            0, 0, window=row_frame, anchor="nw", height=self.row_height, state="hidden"
+        )
+        self.slot_frames.append(row_frame)
+        self.slot_items.append(item)
+        self.slot_labels.append(labels)
+        self.slot_rows.append(None)
+        if self.row_width == 0:
+            self.canvas.update_idletasks()  # calculates reqwidth of the first row
+            self.row_width = row_frame.winfo_reqwidth()
+
+    def _render_row(self, slot, row):
+        for col, label in enumerate(self.slot_labels[slot]):
+            index = row * self.columns + col
+            if index < len(self.paths):
+                label.configure(
+                    image=self._photo(index),
+                    text=os.path.basename(self.paths[index]),
+                )
+            else:
+                label.configure(image="", text="")
+        item = self.slot_items[slot]
+        self.canvas.coords(item, 0, row * self.row_height)
+        if self.slot_rows[slot] is None:
+            self.canvas.itemconfigure(item, state="normal")
+        self.slot_rows[slot] = row
+
+
+#
+# Occupancy of container cells
+#
+#   Every container keeps an OccupancyGrid of the cells its widgets cover,
+#   updated by _remember_position() and destroy(). With row or col NEXT_FREE
+#   a widget goes to the first free cell in reading order, within the
+#   columns in use so far. The container's fill counts per row and lowest
+#   possibly free row and column make that amortized O(1) for large grids.
+#   Both take the widget's column and row span, passed to _position(). With
+#   container.check_overlap set, a widget placed over another raises
+#   ValueError before it is made. Overlay placements are meant to share cells
+#   and don't count.
+#
+class OccupancyGrid:
+    def __init__(self):
+        self.cells = {}  # (row, col): TkWidgetDef covering it
+        self.row_fill = {}  # row: number of cells in use
+        self.free_cols = {}  # row: no free cell left of this column
+        self.free_row = 0  # no free cell above this row
+        self.width = 0  # columns next_free() looked at last time
+
+    def occupant(self, row, col):
+        return self.cells.get((row, col))
+
+    def overlapping(self, row, col, rowspan=1, colspan=1):
+        # The first widget covering any of these cells, None if they are free
+        for r in range(row, row + rowspan):
+            for c in range(col, col + colspan):
+                widget = self.cells.get((r, c))
+                if widget is not None:
+                    return widget
+        return None
+
+    def occupy(self, widget, row, col, rowspan=1, colspan=1):
+        # Cells already in use keep their widget, as for overlays
+        for r in range(row, row + rowspan):
+            for c in range(col, col + colspan):
+                if (r, c) not in self.cells:
+                    self.cells[(r, c)] = widget
+                    self.row_fill[r] = self.row_fill.get(r, 0) + 1
+
+    def release(self, widget):
+        if widget.row is None:
+            return  # not placed in the grid, like notebook tabs
+        for r in range(widget.row, widget.row + widget.row_span):
+            for c in range(widget.col, widget.col + widget.col_span):
+                if self.cells.get((r, c)) is widget:
+                    del self.cells[(r, c)]
+                    self.row_fill[r] -= 1
+                    if c < self.free_cols.get(r, 0):
+                        self.free_cols[r] = c
+                    if r < self.free_row:
+                        self.free_row = r
+
+    def next_free(self, width, colspan=1, rowspan=1):
+        # (row, col) of the first colspan x rowspan free cells in rows width
+        # columns wide. A span wider than that gets rows of its own.
+        if width != self.width:
+            self.width = width
+            self.free_row = 0  # wider rows may have room again
+        row = self.free_row
+        while self.row_fill.get(row, 0) >= width:
+            row += 1
+        self.free_row = row
+        col = self.free_cols.get(row, 0)
+        while (row, col) in self.cells:
+            col += 1
+        self.free_cols[row] = col
+        limit = max(width, colspan)
+        while (col + colspan > limit) or (
+            self.overlapping(row, col, rowspan, colspan) is not None
+        ):
+            if col + colspan < limit:
+                col += 1
+            else:
+                row += 1
+                col = self.free_cols.get(row, 0)
+        return (row, col)
+
+
+#
+# Layout cache
+#
+#   The add_*() methods for static widgets are marked with @_layout_method,
+#   which records the call on the TkWidgetDef it returns. layout_spec() turns
+#   a built tree into a JSON compatible spec, with rows and columns resolved,
+#   and build_from_spec() replays it with explicit positions inside batch().
+#   build_layout() keeps the spec in a file, keyed by layout_fingerprint() of
+#   the building code, so large static forms are built from it when nothing
+#   changed. Every widget is still created when replaying; what is saved is
+#   the building code itself, with whatever it computes, and the working out
+#   of positions. Overlay placements and each container's check_overlap are
+#   recorded too. Callables such as button commands are stored by
+#   __qualname__ and looked up in the commands dict given to
+#   build_from_spec(), so different callables with the same __qualname__,
+#   like two lambdas, can't be recorded.
+#
+LAYOUT_SPEC_VERSION = 2
+_LAYOUT_METHODS = {}  # name: function of the recorded add_*() methods
+
+
+def _layout_method(method):
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kw):
+        frame = method(self, *args, **kw)
+        frame.layout_call = (name, args, kw)
+        return frame
+
+    _LAYOUT_METHODS[name] = method
+    return wrapper
+
+
+def _check_layout_node(node, commands, is_top=True):
+    # Raises ValueError for a layout spec build_from_spec() can't replay
+    if is_top and (node.get("version") != LAYOUT_SPEC_VERSION):
+        raise ValueError("eztk: unsupported layout spec version")
+    for child_node in node["children"]:
+        name = child_node["kind"]
+        if name not in _LAYOUT_METHODS:
+            raise ValueError("eztk: unknown widget kind {!r}".format(name))
+        for qualname in child_node.get("commands", {}).values():
+            if qualname not in commands:
+                raise ValueError("eztk: no command for {!r}".format(qualname))
+        if "children" in child_node:
+            _check_layout_node(child_node, commands, False)
+
+
+def layout_fingerprint(*builders):
+    # Changes when the code of a builder function or of the recorded add_*()
+    # methods changes. Functions the builders call aren't included, pass them
+    # too if they add widgets.
+    h = hashlib.sha1(str(LAYOUT_SPEC_VERSION).encode())
+    for name in sorted(_LAYOUT_METHODS):
+        h.update(marshal.dumps(_LAYOUT_METHODS[name].__code__))
+    for builder in builders:
+        h.update(marshal.dumps(builder.__code__))
+    return h.hexdigest()
+
+
+#
+# Widget classes
+#
+#   TkWidgetDef makes its widgets through self.tkm, TkWidgets for a real tk
+#   window or HeadlessWidgets for EasyTk(headless=True). The headless
+#   stand-ins record grid placement, options, bindings and values without a
+#   Tcl interpreter or a display, so application code can build and lay out
+#   a tree of widgets for tests, layout checks or precomputation. after()
+#   callbacks run from update(). Images, tables and galleries need tk.
+#
+class TkWidgets:
+    Button = tkinter.Button
+    Canvas = tkinter.Canvas
+    Checkbutton = tkinter.Checkbutton
+    Entry = tkinter.Entry
+    Frame = tkinter.Frame
+    IntVar = tkinter.IntVar
+    Label = tkinter.Label
+    LabelFrame = tkinter.LabelFrame
+    Listbox = tkinter.Listbox
+    Notebook = Notebook
+    OptionMenu = tkinter.OptionMenu
+    Scale = tkinter.Scale
+    Scrollbar = tkinter.Scrollbar
+    StringVar = tkinter.StringVar
+    Tk = tkinter.Tk
+    Toplevel = tkinter.Toplevel
+
+    @staticmethod
+    def ScrolledText(*args, **kw):
+        return _scrolled_text_module().ScrolledText(*args, **kw)
+
+
+class HeadlessWidget:
+    def __init__(self, master=None, **options):
+        self.master = master
+        self.options = options
+        self.children = []
+        self.grid_options = None  # options of the last grid() call
+        self.bindings = {}
+        if master is not None:
+            master.children.append(self)
+
+    def _root(self):
+        widget = self
+        while widget.master is not None:
+            widget = widget.master
+        return widget
+
+    def grid(self, **options):
+        self.grid_options = options
+
+    def grid_info(self):
+        return dict(self.grid_options or {})
+
+    def grid_slaves(self, row=None, column=None):
+        res = []
+        for child in self.children:
+            info = child.grid_options
+            if info is None:
+                continue
+            if (row is None or info.get("row") == row) and (
+                column is None or info.get("column") == column
+            ):
+                res.append(child)
+        return res
+
+    def grid_propagate(self, flag=None):
+        if flag is None:
+            return True
+
+    def grid_rowconfigure(self, index, **options):
+        pass
+
+    def grid_columnconfigure(self, index, **options):
+        pass
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    config = configure
+
+    def cget(self, key):
+        return self.options.get(key, "")
+
+    def __getitem__(self, key):
+        return self.cget(key)
+
+    def bind(self, sequence, func, add=None):
+        self.bindings[sequence] = func
+
+    def focus(self):
+        pass
+
+    def lower(self):
+        pass
+
+    def destroy(self):
+        if self.master is not None and self in self.master.children:
+            self.master.children.remove(self)
+
+    def after(self, ms, func, *args):
+        root = self._root()
+        root.after_count += 1
+        after_id = "after#{}".format(root.after_count)
+        root.pending.append((after_id, func, args))
+        return after_id
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def after_cancel(self, after_id):
+        root = self._root()
+        root.pending = [p for p in root.pending if p[0] != after_id]
+
+    def update(self):
+        # Run the after() callbacks pending now
+        root = self._root()
+        pending = root.pending
+        root.pending = []
+        for after_id, func, args in pending:
+            func(*args)
+
+    update_idletasks = update
+
+    def winfo_reqwidth(self):
+        return 1
+
+    def winfo_reqheight(self):
+        return 1
+
+    winfo_width = winfo_reqwidth
+    winfo_height = winfo_reqheight
+
+
+class HeadlessTk(HeadlessWidget):
+    default_root = None  # the latest HeadlessTk, master of Toplevels without one
+
+    def __init__(self):
+        HeadlessWidget.__init__(self)
+        self.pending = []  # (after_id, func, args) from after()
+        self.after_count = 0
+        HeadlessTk.default_root = self
+
+    def title(self, text=None):
+        if text is not None:
+            self.options["title"] = text
+        return self.options.get("title", "")
+
+    def mainloop(self):
+        root = self._root()
+        while len(root.pending) > 0:
+            self.update()
+
+
+class HeadlessToplevel(HeadlessTk):
+    # Like tkinter's, a Toplevel made without a master belongs to the default
+    # root, so its after() callbacks run from the root's update() and
+    # mainloop().
+    def __init__(self, master=None, **options):
+        if master is None:
+            master = HeadlessTk.default_root
+        HeadlessWidget.__init__(self, master, **options)
+        self.pending = []  # used only without any HeadlessTk
+        self.after_count = 0
+
+
+class HeadlessVar:
+    default = ""
+
+    def __init__(self, master=None, value=None):
+        if value is None:
+            value = self.default
+        self.value = value
+        self.traces = []
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+        for callback in self.traces:
+            callback("", "", "write")
+
+    def trace_add(self, mode, callback):
+        self.traces.append(callback)
+
+
+class HeadlessStringVar(HeadlessVar):
+    pass
+
+
+class HeadlessIntVar(HeadlessVar):
+    default = 0
+
+
+class HeadlessFrame(HeadlessWidget):
+    pass
+
+
+class HeadlessLabelFrame(HeadlessWidget):
+    pass
+
+
+class HeadlessLabel(HeadlessWidget):
+    pass
+
+
+class HeadlessButton(HeadlessWidget):
+    pass
+
+
+class HeadlessEntry(HeadlessWidget):
+    pass
+
+
+class HeadlessCheckbutton(HeadlessWidget):
+    pass
+
+
+class HeadlessScale(HeadlessWidget):
+    def get(self):
+        return self.options.get("value", self.options.get("from_", 0))
+
+    def set(self, value):
+        self.options["value"] = value
+
+
+class HeadlessScrollbar(HeadlessWidget):
+    def set(self, first, last):
+        self.options["position"] = (first, last)
+
+
+class HeadlessCanvas(HeadlessWidget):
+    def xview(self, *args):
+        pass
+
+    def yview(self, *args):
+        pass
+
+    def canvasx(self, x):
+        return x
+
+    def canvasy(self, y):
+        return y
+
+
+class HeadlessListbox(HeadlessWidget):
+    def __init__(self, master=None, **options):
+        HeadlessWidget.__init__(self, master, **options)
+        self.items = []
+        self.selection = []
+
+    def insert(self, index, *items):
+        if index == tkinter.END:
+            self.items.extend(items)
+        else:
+            self.items[index:index] = items
+
+    def get(self, first, last=None):
+        if isinstance(first, tuple):
+            first = first[0]
+        return self.items[first]
+
+    def curselection(self):
+        return tuple(self.selection)
+
+    def selection_set(self, first):
+        if first not in self.selection:
+            self.selection.append(first)
+
+    def select_clear(self, first, last=None):
+        self.selection = []
+
+    def see(self, index):
+        pass
+
+    def xview(self, *args):
+        pass
+
+    def yview(self, *args):
+        pass
+
+
+class HeadlessMenu:
+    def __init__(self, labels):
+        self.labels = labels
+
+    def delete(self, first, last=None):
+        del self.labels[:]
+
+    def add_command(self, label, command=None):
+        self.labels.append(label)
+
+
+class HeadlessOptionMenu(HeadlessWidget):
+    def __init__(self, master, variable, value, *values):
+        HeadlessWidget.__init__(self, master)
+        self.variable = variable
+        self.values = [value] + list(values)
+        self.options["menu"] = HeadlessMenu(self.values)
+
+
+class HeadlessScrolledText(HeadlessWidget):
+    def __init__(self, master=None, **options):
+        HeadlessWidget.__init__(self, master, **options)
+        self.text = ""
+
+    def get(self, first, last=None):
+        return self.text + "\n"  # tk adds a newline at the end
+
+    def insert(self, index, text):
+        self.text = text + self.text
+
+    def delete(self, first, last=None):
+        self.text = ""
+
+
+class HeadlessNotebook(HeadlessWidget):
+    def __init__(self, master=None, **options):
+        HeadlessWidget.__init__(self, master, **options)
+        self.tab_frames = []
+        self.tab_texts = []
+
+    def add(self, frame, text=None):
+        self.insert(len(self.tab_frames), frame, text=text)
+
+    def index(self, tabid):
+        # tabid is a position, "end" or a tab's frame, as in ttk
+        if tabid == tkinter.END:
+            return len(self.tab_frames)
+        if isinstance(tabid, int):
+            return tabid
+        return self.tab_frames.index(tabid)
+
+    def insert(self, where, frame, text=None):
+        where = self.index(where)
+        if frame in self.tab_frames:
+            # ttk moves a tab that is already in the notebook
+            ix = self.tab_frames.index(frame)
+            if text is None:
+                text = self.tab_texts[ix]
+            self.forget(ix)
+            where = min(where, len(self.tab_frames))
+        self.tab_frames.insert(where, frame)
+        self.tab_texts.insert(where, text)
+
+    def forget(self, tabid):
+        ix = self.index(tabid)
+        del self.tab_frames[ix]
+        del self.tab_texts[ix]
+
+    def tabs(self):
+        return list(self.tab_frames)
 
-    def on_tab_click(self, event):
-        print("Notebook.on_tab_click()", event.widget)
-        """
-        for this in self.tab_labels_widget:
-            print(">>>")
-            for that in dir(this):
-                print("   ", that, ":", getattr(this, that))
-        """
-        self.select(tabid=event.widget)
+    def enable_traversal(self):
+        pass
 
 
-#
-# ScrolledFrame - A child of Frame with scroll bars
-#
-# Adapted from http://code.activestate.com/recipes/580793-tkinter-table-with-scrollbars/
-#
-"""
-    def __init__(self, master, columns, column_weights=None, column_minwidths=None, height=500, minwidth=20, minheight=20, padx=5, pady=5, cell_font=None, cell_foreground="black", cell_background="white", cell_anchor=W, header_font=None, header_background="white", header_foreground="black", header_anchor=CENTER, bordercolor = "#999999", innerborder=True, outerborder=True, stripped_rows=("#EEEEEE", "white"), on_change_data=None, mousewheel_speed = 2, scroll_horizontally=False, scroll_vertically=True):
-"""
+class HeadlessWidgets:
+    Button = HeadlessButton
+    Canvas = HeadlessCanvas
+    Checkbutton = HeadlessCheckbutton
+    Entry = HeadlessEntry
+    Frame = HeadlessFrame
+    IntVar = HeadlessIntVar
+    Label = HeadlessLabel
+    LabelFrame = HeadlessLabelFrame
+    Listbox = HeadlessListbox
+    Notebook = HeadlessNotebook
+    OptionMenu = HeadlessOptionMenu
+    Scale = HeadlessScale
+    Scrollbar = HeadlessScrollbar
+    ScrolledText = HeadlessScrolledText
+    StringVar = HeadlessStringVar
+    Tk = HeadlessTk
+    Toplevel = HeadlessToplevel
 
 
-class ScrolledFrame(tkinter.Frame):
-    def __init__(
-        self,
-        HeadingRow=False,
-        HeadingColumn=False,
-        bordercolor="#999999",
-        outerborder=True,
-        scroll_horizontally=False,
-        scroll_vertically=True,
-    ):
-        super().__init__()
-        outerborder_width = 1 if outerborder else 0
-        self.heading_frame = tkinter.Frame(
-            self,
-            highlightbackground=bordercolor,
-            highlightcolor=bordercolor,
-            highlightthickness=outerborder_width,
-            bd=0,
-        )
-        self.heading_frame.grid(row=0, column=0, sticky=tkinter.E + tkinter.W)
-        if scroll_horizontally:
-            xscrollbar = Scrollbar(self, orient=HORIZONTAL)
-            xscrollbar.grid(row=2, column=0, sticky=E + W)
-        else:
-            xscrollbar = None
+_TCL_ESCAPES = {ord(c): "\\" + c for c in ' \t"$;[]{}\\'}
+_TCL_ESCAPES.update({ord("\n"): "\\n", ord("\r"): "\\r"})
 
-        if scroll_vertically:
-            yscrollbar = Scrollbar(self, orient=VERTICAL)
-            yscrollbar.grid(row=1, column=1, sticky=N + S)
-        else:
-            yscrollbar = None
+
+def _tcl_word(value):
+    # value quoted as one word of a Tcl script, tuples and lists as Tcl lists
+    if isinstance(value, (tuple, list)):
+        value = " ".join(_tcl_word(item) for item in value)
+    value = str(value)
+    if value == "":
+        return "{}"
+    return value.translate(_TCL_ESCAPES)
 
 
 class TkWidgetDef:
     __slots__ = (
         "bottom_row",
+        "build_id",
         "canvas_height",
+        "canvas_overlay",
         "canvas_width",
+        "check_overlap",
         "children",
+        "coalesce_id",
+        "coalesce_render",
         "col",
         "col_span",
         "debug_this",
+        "display_window",
         "file_opt",
+        "frames_dropped",
+        "gallery",
+        "grid_batch",
         "hbar",
+        "image_backend",
+        "image_fn",
+        "image_poll_id",
+        "image_request_id",
+        "is_coalescing",
         "is_container",
         "is_initializing",
+        "is_progressive",
+        "is_streaming",
+        "is_zoomable",
         "last_used_col",
         "last_used_colspan",
         "last_used_row",
         "last_used_rowspan",
+        "layout_call",
         "list_items",
+        "occupancy",
         "opencv_im",
         "parent",
         "parm_id",
         "pil_im",
         "pil_resize_ratio",
+        "pyramid",
+        "refine_id",
         "rgb_im",
         "right_col",
         "row",
@@ -265,11 +2309,17 @@ class TkWidgetDef:
         "thumbnail",
         "thumbnail_of",
         "thumbnail_width",
+        "thumbnails",
+        "thumbnails_id",
+        "tiled_image",
         "tkd",
+        "tkm",
         "tkw",
         "tkw_label",
         "vbar",
         "wname",
+        "zoom",
+        "zoom_view",
     )
 
     def __init__(
@@ -286,12 +2336,28 @@ class TkWidgetDef:
         self.is_initializing = True
         self.wname = wname  # reference name for this widget
         self.tkw = tkw  # tk widget
+        if isinstance(tkw, HeadlessWidget):
+            self.tkm = HeadlessWidgets  # the classes to make child widgets with
+        else:
+            self.tkm = TkWidgets
         self.tkw_label = tkw_label  # tk widget of associated label
         self.tkd = data  # the tk data (usually StringVar) for this widget
         self.scroll_container = None  # tk frame widget holding tkw plus scrollbars
         self.hbar = None
         self.vbar = None
         self.rgb_im = None
+        self.image_request_id = 0  # identifies the latest update_image request
+        self.image_poll_id = None  # after() id polling update_image_async() work
+        self.image_fn = None  # file the image shown was read from, if any
+        self.image_backend = None  # one of PHOTO_BACKENDS, None for the default
+        self.display_window = None  # how update_image() maps images to 8 bits
+        self.is_streaming = False  # update_image() pastes same size frames in place
+        self.is_progressive = False  # update_image() shows a preview, then refines
+        self.refine_id = None  # after_idle() id of a pending refinement
+        self.is_coalescing = False  # update_image() renders once per idle
+        self.coalesce_id = None  # after_idle() id of a pending coalesced render
+        self.coalesce_render = None  # (method, args) the coalesced render runs
+        self.frames_dropped = 0  # coalesced updates replaced before rendering
         self.row = None  # row where positioned
         self.col = None  # col where positioned (left side)
         self.right_col = 0  # furthest right colum used
@@ -305,11 +2371,24 @@ class TkWidgetDef:
         )  # not necesarilly highest used. for sequential positioning
         self.last_used_colspan = 1
         self.row_span = 0  # height of this TkWidgetDef object (# of rows)
+        if is_container:
+            self.occupancy = OccupancyGrid()  # cells used by the children
+        else:
+            self.occupancy = None
+        self.check_overlap = False  # raise ValueError for overlapping widgets
         self.col_span = 0  # width of this TkWidgetDef object (# of columns)
         self.table = None  # table for scrollable table widget.
+        self.gallery = None  # ThumbnailGallery of add_gallery()
+        self.grid_batch = None  # queued grid() calls inside batch()
+        self.build_id = None  # after_idle() id of the next build_in_slices() slice
+        self.layout_call = None  # (method name, args, kw) of the add_*() call
         self.thumbnail = None  # update this thumbnail if image is changed
         self.thumbnail_of = None  # this is a thumbnail of that image
         self.thumbnail_width = 0  # width of thumbnail
+        self.thumbnails = []  # (widget, width) of every thumbnail of this image
+        self.thumbnails_id = None  # after_idle() id of a pending thumbnails update
+        self.tiled_image = None  # TiledImage shown on this canvas
+        self.canvas_overlay = None  # CanvasOverlay, made by overlay()
         self.parent = None
         self.children = []
         self.canvas_width = 400
@@ -318,6 +2397,10 @@ class TkWidgetDef:
             parm_id  # associated application field, not directly used for TK stuff
         )
         self.pil_resize_ratio = None
+        self.is_zoomable = False  # canvas shows an ImagePyramid at self.zoom
+        self.pyramid = None
+        self.zoom = 1.0
+        self.zoom_view = None  # (zoom, left, top, width, height) last rendered
         self.debug_this = debug
         self.file_opt = {}
         self.file_opt["defaultextension"] = ".txt"
@@ -339,16 +2422,23 @@ class TkWidgetDef:
 
     def do_file_name_dialog(self, directory=None, file_types=None):
         self.file_dialog_parms(directory=directory, file_types=file_types)
-        return tkFileDialog.askopenfilename(**self.file_opt)
+        import tkinter.filedialog
+
+        return tkinter.filedialog.askopenfilename(**self.file_opt)
 
     def do_file_save_as_name_dialog(self, file_name=None, directory=None, file_types=None):
         self.file_dialog_parms(file_name=file_name, directory=directory, file_types=file_types)
-        return tkFileDialog.asksaveasfilename(**self.file_opt)
+        import tkinter.filedialog
+
+        return tkinter.filedialog.asksaveasfilename(**self.file_opt)
 
     def do_file_open_dialog(self, mode="r", directory=None, file_types=None):
         self.file_dialog_parms(directory=directory, file_types=file_types)
-        return tkFileDialog.askopenfile(mode=mode, **self.file_opt)
+        import tkinter.filedialog
+
+        return tkinter.filedialog.askopenfile(mode=mode, **self.file_opt)
 
+    @_layout_method
     def add_button(
         self, caption, command, width=None, padx=None, row=NEXT_ROW, col=SAME_COL
     ):
@@ -363,8 +2453,8 @@ class TkWidgetDef:
             options["width"] = width
         if padx is not None:
             options["padx"] = padx
-        frame = TkWidgetDef(refname, tkinter.Button(self.tkw, **options))
-        frame.tkw.grid(row=row, column=col)
+        frame = TkWidgetDef(refname, self.tkm.Button(self.tkw, **options))
+        self._grid(frame.tkw, row=row, column=col)
         self._remember_position(frame, row, col)
         self.append_child(frame)
         return frame
@@ -372,6 +2462,62 @@ class TkWidgetDef:
     def append_child(self, frame):
         self.children.append(frame)
         frame.parent = self
+        if frame.is_container and (self.grid_batch is not None):
+            frame.grid_batch = self.grid_batch  # containers made in a batch join it
+        if frame.is_container:
+            frame.check_overlap = self.check_overlap
+
+    @contextlib.contextmanager
+    def batch(self):
+        # with container.batch(): builds many widgets quickly. Positions are
+        # worked out as usual, but the grid() calls of the add_*() methods are
+        # queued, including those in containers added inside the block, and
+        # sent to tk as one script when the block exits. Geometry propagation
+        # of the container is suspended until then.
+        if self.grid_batch is not None:
+            yield self  # already in a batch
+            return
+        self.grid_batch = []
+        propagate = self.tkw.grid_propagate()
+        self.tkw.grid_propagate(False)
+        try:
+            yield self
+        finally:
+            batch = self.grid_batch
+            self._end_batch(batch)
+            self._flush_grid(batch)
+            self.tkw.grid_propagate(propagate)
+
+    def _end_batch(self, batch):
+        if self.grid_batch is batch:
+            self.grid_batch = None
+            for child in self.children:
+                child._end_batch(batch)
+
+    def _grid(self, tkw, **options):
+        # tkw.grid(**options), or queue it inside batch()
+        if self.grid_batch is None:
+            tkw.grid(**options)
+        else:
+            self.grid_batch.append((tkw, options))
+
+    def _flush_grid(self, batch):
+        if self.tkm is HeadlessWidgets:
+            for tkw, options in batch:
+                tkw.grid(**options)
+            return
+        # Widgets destroyed inside the block are skipped rather than stopping
+        # the script
+        lines = []
+        for tkw, options in batch:
+            path = _tcl_word(str(tkw))
+            words = ["grid", "configure", path]
+            for key, value in options.items():
+                words.append("-" + key)
+                words.append(_tcl_word(value))
+            lines.append("if {[winfo exists " + path + "]} {" + " ".join(words) + "}")
+        if len(lines) > 0:
+            self.tkw.tk.eval("\n".join(lines))
 
     def add_canvas(
         self,
@@ -387,9 +2533,26 @@ class TkWidgetDef:
         col=SAME_COL,
         colspan=1,
         rowspan=1,
+        stream=False,
+        zoomable=False,
+        image_backend=None,
+        display_window=None,
+        progressive=False,
+        coalesce=False,
     ):
+        # stream=True is for video-like sources, see update_image()
+        # progressive=True shows each image quickly, then at high quality when
+        # tk is idle, and coalesce=True renders only the latest of several
+        # updates made before tk is idle, see update_image().
+        # zoomable=True keeps an ImagePyramid of each image for zoom_to().
+        # Control + mouse wheel zooms and dragging with the middle button pans.
+        # image_backend is one of PHOTO_BACKENDS. The default is "pillow" if
+        # Pillow is installed, otherwise "ppm".
+        # display_window is how uint16 and float images are shown: (low, high)
+        # values for black and white, "auto" for the range of each image, or
+        # None for the full range of the type (0.0 to 1.0 for floats).
         frame = self._add_scrolled_widget(
-            tkinter.Canvas,
+            self.tkm.Canvas,
             {"width": width, "height": height},
             on_click=on_click,
             row=row,
@@ -400,20 +2563,30 @@ class TkWidgetDef:
         frame.scrollable_image = None
         frame.canvas_width = width
         frame.canvas_height = height
+        frame.is_streaming = stream
+        frame.is_zoomable = zoomable
+        frame.image_backend = image_backend
+        frame.display_window = display_window
+        frame.is_progressive = progressive
+        frame.is_coalescing = coalesce
+        if zoomable:
+            frame.tkw.bind("<Control-MouseWheel>", frame._on_zoom_wheel)
+            frame.tkw.bind("<Control-Button-4>", frame._on_zoom_wheel)
+            frame.tkw.bind("<Control-Button-5>", frame._on_zoom_wheel)
+            frame.tkw.bind("<ButtonPress-2>", frame._on_pan_start)
+            frame.tkw.bind("<B2-Motion>", frame._on_pan_drag)
+            frame.tkw.config(
+                xscrollcommand=frame._on_zoom_xscroll,
+                yscrollcommand=frame._on_zoom_yscroll,
+            )
 
-        if (pil_fn is not None) or (opencv_fn is not None) or (rgb_im is not None):
-            if thumbnailof is None:
-                frame.update_image(pil_fn=pil_fn, rgb_im=rgb_im, opencv_fn=opencv_fn)
-            else:
-                # after this, the thumbnail will be automatically updated whenever the base image is updated
-                frame.update_image(
-                    rgb_im=self.make_thumbnail(thumbnailof.rgb_im, thumbnailwidth)
-                )
-                thumbnailof.thumbnail = frame
-                thumbnailof.thumbnail_width = thumbnailwidth
-                self.thumbnail_of = thumbnailof
+        if thumbnailof is not None:
+            thumbnailof._link_thumbnail(frame, thumbnailwidth)
+        elif (pil_fn is not None) or (opencv_fn is not None) or (rgb_im is not None):
+            frame.update_image(pil_fn=pil_fn, rgb_im=rgb_im, opencv_fn=opencv_fn)
         return frame
 
+    @_layout_method
     def add_dropdown(
         self,
         caption=None,
@@ -435,7 +2608,7 @@ class TkWidgetDef:
         #
         if self.debug_this:
             print("add_dropdown", row, col, caption)
-        row, col = self._position(row=row, col=col)
+        row, col = self._position(row=row, col=col, colspan=1 if caption is None else 2)
         if caption is None:
             refname = "QWE"
             tk_caption = None
@@ -443,23 +2616,24 @@ class TkWidgetDef:
             remember_colspan = 1
         else:
             refname = caption.lower().replace(" ", "_")
-            tk_caption = tkinter.Label(self.tkw, text=caption)
-            tk_caption.grid(column=col, row=row, sticky=tkinter.W)
+            tk_caption = self.tkm.Label(self.tkw, text=caption)
+            self._grid(tk_caption, column=col, row=row, sticky=tkinter.W)
             entry_col = col + 1
             remember_colspan = 2
 
-        tk_data = tkinter.StringVar()
+        tk_data = self.tkm.StringVar()
         tk_data.set(selection)
         if command is not None:
             tk_data.trace_add("write", command)
         args = [self.tkw, tk_data] + s_items
-        tk_entry = tkinter.OptionMenu(*args)
-        tk_entry.grid(column=entry_col, row=row, sticky=(tkinter.W, tkinter.E))
+        tk_entry = self.tkm.OptionMenu(*args)
+        self._grid(tk_entry, column=entry_col, row=row, sticky=(tkinter.W, tkinter.E))
         frame = TkWidgetDef(refname, tk_entry, tkw_label=tk_caption, data=tk_data)
         self._remember_position(frame, row, col, colspan=remember_colspan)
         self.append_child(frame)
         return frame
 
+    @_layout_method
     def add_entry_field(
         self,
         caption=None,
@@ -471,21 +2645,21 @@ class TkWidgetDef:
     ):
         if self.debug_this:
             print("add_entry_field", row, col, caption)
-        row, col = self._position(row=row, col=col)
+        row, col = self._position(row=row, col=col, colspan=1 if caption is None else 2)
 
-        tk_data = tkinter.StringVar()
+        tk_data = self.tkm.StringVar()
         tk_data.set(value)
         if caption is None:
             col_span = 1
             tk_caption = None
             refname = "EntryBox"
         else:
-            tk_caption = tkinter.Label(self.tkw, text=caption)
-            tk_caption.grid(column=col, row=row, sticky=tkinter.W)
+            tk_caption = self.tkm.Label(self.tkw, text=caption)
+            self._grid(tk_caption, column=col, row=row, sticky=tkinter.W)
             col_span = 2
             refname = caption.lower().replace(" ", "_")
-        tk_entry = tkinter.Entry(self.tkw, width=width, textvariable=tk_data)
-        tk_entry.grid(column=col + 1, row=row, sticky=(tkinter.W, tkinter.E))
+        tk_entry = self.tkm.Entry(self.tkw, width=width, textvariable=tk_data)
+        self._grid(tk_entry, column=col + 1, row=row, sticky=(tkinter.W, tkinter.E))
         if on_double_click is not None:
             tk_entry.bind("<Double-Button-1>", on_double_click)
         frame = TkWidgetDef(refname, tk_entry, tkw_label=tk_caption, data=tk_data)
@@ -493,12 +2667,13 @@ class TkWidgetDef:
         self.append_child(frame)
         return frame
 
+    @_layout_method
     def add_checkbox(self, caption=None, value=False, row=NEXT_ROW, col=SAME_COL):
         if self.debug_this:
             print("add_checkbox", row, col, caption)
         row, col = self._position(row=row, col=col)
 
-        tk_data = tkinter.IntVar()
+        tk_data = self.tkm.IntVar()
         if value:
             tk_data.set(1)
         else:
@@ -507,26 +2682,28 @@ class TkWidgetDef:
             refname = "Checkbox"
         else:
             refname = caption.lower().replace(" ", "_")
-        tk_entry = tkinter.Checkbutton(self.tkw, text=caption, variable=tk_data)
-        tk_entry.grid(column=col, row=row, sticky=(tkinter.W, tkinter.E))
+        tk_entry = self.tkm.Checkbutton(self.tkw, text=caption, variable=tk_data)
+        self._grid(tk_entry, column=col, row=row, sticky=(tkinter.W, tkinter.E))
         frame = TkWidgetDef(refname, tk_entry, data=tk_data)
         self._remember_position(frame, row, col, colspan=1)
         self.append_child(frame)
         return frame
 
+    @_layout_method
     def add_frame(self, row=NEXT_ROW, col=SAME_COL, colspan=1):
         if self.debug_this:
             print("add_frame", row, col, colspan)
-        row, col = self._position(row=row, col=col)
+        row, col = self._position(row=row, col=col, colspan=colspan)
         refname = "X"
-        frame = TkWidgetDef(refname, tkinter.Frame(self.tkw), is_container=True)
+        frame = TkWidgetDef(refname, self.tkm.Frame(self.tkw), is_container=True)
         if colspan == COL_SPAN_ALL:
             colspan = self.right_col - col + 1
-        frame.tkw.grid(column=col, columnspan=colspan, row=row, sticky=tkinter.W)
+        self._grid(frame.tkw, column=col, columnspan=colspan, row=row, sticky=tkinter.W)
         self._remember_position(frame, row, col, colspan=colspan)
         self.append_child(frame)
         return frame
 
+    @_layout_method
     def add_label(self, text="", width=10, row=NEXT_ROW, col=SAME_COL):
         # An alternate method would be to create a TK StringVar and when creating the label
         # use the textvariable property instead of text. Visually this shouldn't be any different.
@@ -534,20 +2711,21 @@ class TkWidgetDef:
         # be automagically updated if something changed the variable.
         refname = "X"
         row, col = self._position(row=row, col=col)
-        tk_caption = tkinter.Label(self.tkw, text=text)
-        tk_caption.grid(column=col, row=row, sticky=tkinter.W)
+        tk_caption = self.tkm.Label(self.tkw, text=text)
+        self._grid(tk_caption, column=col, row=row, sticky=tkinter.W)
         frame = TkWidgetDef(refname, tk_caption)
         self._remember_position(frame, row, col)
         self.append_child(frame)
         return frame
 
+    @_layout_method
     def add_label_frame(self, caption, row=NEXT_ROW, col=SAME_COL, colspan=1):
-        row, col = self._position(row=row, col=col)
+        row, col = self._position(row=row, col=col, colspan=colspan)
         refname = caption.lower().replace(" ", "_")
         frame = TkWidgetDef(
-            refname, tkinter.LabelFrame(self.tkw, text=caption), is_container=True
+            refname, self.tkm.LabelFrame(self.tkw, text=caption), is_container=True
         )
-        frame.tkw.grid(column=col, columnspan=colspan, row=row, sticky=tkinter.W)
+        self._grid(frame.tkw, column=col, columnspan=colspan, row=row, sticky=tkinter.W)
         self._remember_position(frame, row, col, colspan=colspan)
         self.append_child(frame)
         return frame
@@ -562,35 +2740,56 @@ class TkWidgetDef:
         row=NEXT_ROW,
         col=SAME_COL,
         colspan=1,
+        stream=False,
+        image_backend=None,
+        display_window=None,
+        progressive=False,
+        coalesce=False,
     ):
-        row, col = self._position(row=row, col=col)
-        frame = TkWidgetDef("", tkinter.Label(self.tkw))
+        # image_backend, display_window, progressive and coalesce are as for
+        # add_canvas()
+        row, col = self._position(row=row, col=col, colspan=colspan)
+        frame = TkWidgetDef("", self.tkm.Label(self.tkw))
+        frame.is_streaming = stream
+        frame.image_backend = image_backend
+        frame.display_window = display_window
+        frame.is_progressive = progressive
+        frame.is_coalescing = coalesce
         if thumbnailof is None:
             frame.update_image(pil_fn=pil_fn, source_im=opencv_im, opencv_fn=opencv_fn)
         else:
-            # after this, the thumbnail will be automatically updated whenever the base image is updated
-            frame.update_image(
-                rgb_im=self.make_thumbnail(thumbnailof.rgb_im, thumbnailwidth)
-            )
-            thumbnailof.thumbnail = frame
-            thumbnailof.thumbnail_width = thumbnailwidth
+            thumbnailof._link_thumbnail(frame, thumbnailwidth)
 
-        frame.tkw.grid(column=col, columnspan=colspan, row=row, sticky=tkinter.W)
+        self._grid(frame.tkw, column=col, columnspan=colspan, row=row, sticky=tkinter.W)
         self._remember_position(frame, row, col, colspan=colspan)
         self.append_child(frame)
         return frame
 
     def destroy(self):
+        self.image_request_id += 1  # drop update_image_async() work in progress
+        for after_id in (
+            self.refine_id,
+            self.coalesce_id,
+            self.build_id,
+            self.thumbnails_id,
+            self.image_poll_id,
+        ):
+            if after_id is not None:
+                self.tkw.after_cancel(after_id)
+        if self.gallery is not None:
+            self.gallery.close()
         # Clear both sides of thumbnail links to avoid refencing stale references
-        if self.thumbnail is not None:
-            self.thumbnail.thumbnail_of = None
-            self.thumbnail = None
+        for thumbnail, width in self.thumbnails:
+            thumbnail.thumbnail_of = None
+        self.thumbnails = []
+        self.thumbnail = None
         if self.thumbnail_of is not None:
-            self.thumbnail_of.thumbnail = None
-            self.thumbnail = None
-        for this_child in self.children:
+            self.thumbnail_of._unlink_thumbnail(self)
+            self.thumbnail_of = None
+        for this_child in list(self.children):  # each removes itself
             this_child.destroy()
         if self.parent is not None:
+            self.parent.occupancy.release(self)
             try:
                 self.parent.children.remove(self)
             except:
@@ -604,8 +2803,8 @@ class TkWidgetDef:
         if self.tkw_label is not None:
             self.tkw_label.destroy()
         if self.tkd is not None:
-            if _HAS_IMAGE_LIBS and isinstance(self.tkd, ImageTk.PhotoImage):
-                self.tkd = None
+            if _is_photo(self.tkd) or not hasattr(self.tkd, "destroy"):
+                self.tkd = None  # tk variables go with their last reference
             else:
                 self.tkd.destroy()
         if self.hbar is not None:
@@ -614,11 +2813,12 @@ class TkWidgetDef:
             self.vbar.destroy()
         self.tkw.destroy()
 
+    @_layout_method
     def add_label_info(self, caption, value="", width=10, row=NEXT_ROW, col=SAME_COL):
         # This is much like add_entry_field() but the field is another lable so it is
         # display only.
-        row, col = self._position(row=row, col=col)
-        tk_data = tkinter.StringVar()
+        row, col = self._position(row=row, col=col, colspan=1 if caption is None else 2)
+        tk_data = self.tkm.StringVar()
         tk_data.set(value)
         if caption is None:
             col_span = 1
@@ -626,16 +2826,17 @@ class TkWidgetDef:
             refname = "LabelInfo"
         else:
             refname = caption.lower().replace(" ", "_")
-            tk_caption = tkinter.Label(self.tkw, text=caption)
-            tk_caption.grid(column=col, row=row, sticky=tkinter.W)
+            tk_caption = self.tkm.Label(self.tkw, text=caption)
+            self._grid(tk_caption, column=col, row=row, sticky=tkinter.W)
             col_span = 2
-        tk_info = tkinter.Label(self.tkw, textvariable=tk_data)
-        tk_info.grid(column=col + 1, row=row, sticky=(tkinter.W, tkinter.E))
+        tk_info = self.tkm.Label(self.tkw, textvariable=tk_data)
+        self._grid(tk_info, column=col + 1, row=row, sticky=(tkinter.W, tkinter.E))
         frame = TkWidgetDef(refname, tk_info, tkw_label=tk_caption, data=tk_data)
         self._remember_position(frame, row, col, colspan=col_span)
         self.append_child(frame)
         return frame
 
+    @_layout_method
     def add_listbox(
         self,
         caption,
@@ -648,7 +2849,7 @@ class TkWidgetDef:
         xscroll=False,
     ):
         frame = self._add_scrolled_widget(
-            tkinter.Listbox,
+            self.tkm.Listbox,
             {"exportselection": 0, "height": rowspan},
             caption=caption,
             row=row,
@@ -672,27 +2873,29 @@ class TkWidgetDef:
         frame.list_items = s_items
         return frame
 
+    @_layout_method
     def add_scrolled_entry_field(
         self, caption, width=10, height=5, value="", row=NEXT_ROW, col=SAME_COL
     ):
         if self.debug_this:
             print("add_scrolled_entry_field", row, col, caption)
-        row, col = self._position(row=row, col=col)
+        row, col = self._position(row=row, col=col, colspan=2, rowspan=height)
         refname = caption.lower().replace(" ", "_")
 
-        tk_data = tkinter.StringVar()
+        tk_data = self.tkm.StringVar()
         tk_data.set(value)
-        tk_caption = tkinter.Label(self.tkw, text=caption)
-        tk_caption.grid(column=col, row=row, sticky=tkinter.W)
-        tk_entry = ScrolledText.ScrolledText(
+        tk_caption = self.tkm.Label(self.tkw, text=caption)
+        self._grid(tk_caption, column=col, row=row, sticky=tkinter.W)
+        tk_entry = self.tkm.ScrolledText(
             master=self.tkw, width=width, height=height, wrap=tkinter.WORD
         )
-        tk_entry.grid(column=col + 1, row=row, sticky=(tkinter.W, tkinter.E))
+        self._grid(tk_entry, column=col + 1, row=row, sticky=(tkinter.W, tkinter.E))
         frame = TkWidgetDef(refname, tk_entry, tkw_label=tk_caption, data=tk_data)
         self._remember_position(frame, row, col, colspan=2, rowspan=height)
         self.append_child(frame)
         return frame
 
+    @_layout_method
     def add_slider_field(
         self,
         caption=None,
@@ -707,24 +2910,24 @@ class TkWidgetDef:
         if self.debug_this:
             print("add_slider_field", row, col, caption)
         # print('Slider', row, col, self.last_used_row, self.last_used_col)
-        row, col = self._position(row=row, col=col)
+        row, col = self._position(row=row, col=col, colspan=2)
         # print('Slider', row, col, self.last_used_row, self.last_used_col)
         if caption is None:
             refname = "Slider"
             tk_caption = None
         else:
             refname = caption.lower().replace(" ", "_")
-            tk_caption = tkinter.Label(self.tkw, text=caption)
-            tk_caption.grid(column=col, row=row, sticky=tkinter.W)
+            tk_caption = self.tkm.Label(self.tkw, text=caption)
+            self._grid(tk_caption, column=col, row=row, sticky=tkinter.W)
         # if specified, label appears above the slider
         # the default showvalue=1 displays the value above the slider, moving with tthe cursor
-        tk_entry = tkinter.Scale(
+        tk_entry = self.tkm.Scale(
             self.tkw, length=width, from_=min_value, to=max_value, orient=orient
         )
         tk_entry.config(showvalue=0)
         if value is not None:
             tk_entry.set(value)
-        tk_entry.grid(column=col + 1, row=row, sticky=(tkinter.W, tkinter.E))
+        self._grid(tk_entry, column=col + 1, row=row, sticky=(tkinter.W, tkinter.E))
         frame = TkWidgetDef(refname, tk_entry, tkw_label=tk_caption)
         self._remember_position(frame, row, col, colspan=2)
         self.append_child(frame)
@@ -732,7 +2935,7 @@ class TkWidgetDef:
 
     def make_popup_window(self, title):
         refname = title
-        top = tkinter.Toplevel()
+        top = self.tkm.Toplevel()
         top.title(title)
         frame = TkWidgetDef(refname, top, is_container=True)
         return frame
@@ -741,9 +2944,47 @@ class TkWidgetDef:
     # Scrollable Table
     #
     def add_cell(self, text="", row=0, col=0):
-        cell = tkinter.Label(self.table, text=text)
+        # Reuse the Label already at this position rather than stacking another on it.
+        cells = self.table.grid_slaves(row=row, column=col)
+        if len(cells) > 0:
+            cells[0].configure(text=text)
+            return
+        cell = self.tkm.Label(self.table, text=text)
         cell.grid(column=col, row=row)
 
+    def load_table(
+        self,
+        source,
+        chunk_rows=1000,
+        header=False,
+        delimiter=",",
+        on_progress=None,
+        on_done=None,
+        on_cancel=None,
+    ):
+        # Stream rows into a virtual table, see TableLoader.
+        # Returns the TableLoader, whose cancel() stops the load.
+        if not isinstance(self.table, VirtualTable):
+            raise TypeError("load_table() requires a table made with virtual=True")
+        loader = TableLoader(
+            self.table,
+            source,
+            chunk_rows=chunk_rows,
+            header=header,
+            delimiter=delimiter,
+            on_progress=on_progress,
+            on_done=on_done,
+            on_cancel=on_cancel,
+        )
+        loader.start()
+        return loader
+
+    def update_cells(self, values):
+        # Bulk update of a virtual table, see VirtualTable.update_cells()
+        if not isinstance(self.table, VirtualTable):
+            raise TypeError("update_cells() requires a table made with virtual=True")
+        return self.table.update_cells(values)
+
     def add_table(
         self,
         on_click=None,
@@ -754,21 +2995,63 @@ class TkWidgetDef:
         col=SAME_COL,
         colspan=1,
         rowspan=1,
+        virtual=False,
+        data=None,
+        get_cell=None,
+        col_count=5,
+        row_count=0,
+        row_height=20,
+        col_widths=None,
+        overscan=5,
     ):
         # width and height are the size of the visible portion of the canvas
-        row, col = self._position(row=row, col=col)
+        #
+        # With virtual=True, frame.table is a VirtualTable. Cell text comes from
+        # get_cell(row, col) and only the visible rows have widgets, so row_count
+        # can be very large. on_click is bound to the cells and
+        # frame.table.cell_of(event) gives the (row, col) that was clicked.
+        #
+        # data is a TableData (or a list of columns) that supplies the cells
+        # instead of get_cell and implies virtual=True. The table is sorted
+        # and filtered with frame.table.sort_by() and frame.table.filter_by().
+        if data is not None:
+            if not isinstance(data, TableData):
+                data = TableData(data)
+            virtual = True
+            col_count = data.col_count()
+            row_count = data.row_count()
         refname = "T"
         frame = self._add_scrolled_widget(
-            tkinter.Canvas,
+            self.tkm.Canvas,
             {"width": width, "height": height},
-            row=0,
-            col=0,
-            rowspan=1,
+            on_click=on_click,
+            row=row,
+            col=col,
+            rowspan=rowspan,
             xscroll=xscroll,
+            colspan=colspan,
         )
+        frame.wname = refname
+        frame.is_container = False
         # frame.tkw is a canvas with scroll bars
         # frame.scroll_container is a container for the canvas plus its scroll bars
-        frame.table = tkinter.Frame(frame.tkw)
+        if virtual:
+            frame.table = VirtualTable(
+                frame.tkw,
+                get_cell,
+                col_count,
+                row_height=row_height,
+                col_widths=col_widths,
+                overscan=overscan,
+                visible_height=height,
+                yscroll=frame.vbar.set,
+                on_click=on_click,
+                data=data,
+            )
+            frame.tkw.config(yscrollcommand=frame.table.on_yscroll)
+            frame.table.set_row_count(row_count)
+            return frame
+        frame.table = self.tkm.Frame(frame.tkw)
         frame.tkw.create_window(0, 0, window=frame.table, anchor="nw")
         for r in range(50):
             for c in range(5):
@@ -782,23 +3065,59 @@ class TkWidgetDef:
                 frame.table.winfo_reqheight(),
             )
         )  # size of logical drawing area
-        if colspan == COL_SPAN_ALL:
-            colspan = self.right_col - col + 1
-        frame.tkw.grid(column=col, columnspan=colspan, row=row, sticky=tkinter.W)
-        self._remember_position(frame, row, col, colspan=colspan)
-        self.append_child(frame)
-        self.is_container = False
+        return frame
+
+    def add_gallery(
+        self,
+        paths,
+        thumb_size=128,
+        columns=4,
+        on_click=None,
+        height=400,
+        row=NEXT_ROW,
+        col=SAME_COL,
+        rowspan=1,
+        overscan=1,
+        image_backend=None,
+    ):
+        # A scrolling grid of thumbnails of the image files in paths, see
+        # ThumbnailGallery. Thousands of files are fine: only the rows in view
+        # have widgets and thumbnails. on_click is bound to the thumbnails and
+        # frame.gallery.index_of(event) gives the index into paths clicked.
+        _require_image_libs("add_gallery")
+        frame = self._add_scrolled_widget(
+            self.tkm.Canvas,
+            {"width": columns * (thumb_size + 8), "height": height},
+            row=row,
+            col=col,
+            rowspan=rowspan,
+        )
+        frame.is_container = False
+        frame.gallery = ThumbnailGallery(
+            frame.tkw,
+            paths,
+            thumb_size=thumb_size,
+            columns=columns,
+            overscan=overscan,
+            visible_height=height,
+            yscroll=frame.vbar.set,
+            on_click=on_click,
+            backend=image_backend,
+        )
+        frame.tkw.config(yscrollcommand=frame.gallery.on_yscroll)
+        frame.gallery.set_paths(paths)
         return frame
 
     #
     # Tabed Notebook Widget
     #
+    @_layout_method
     def add_notebook(self, on_tab_selected=None, row=NEXT_ROW, col=SAME_COL, colspan=1):
-        row, col = self._position(row=row, col=col)
+        row, col = self._position(row=row, col=col, colspan=colspan)
         # nb_class = tkinter.ttk.Notebook
-        nb_class = Notebook
+        nb_class = self.tkm.Notebook
         frame = TkWidgetDef("", nb_class(self.tkw), is_container=True)
-        frame.tkw.grid(column=col, columnspan=colspan, row=row, sticky=tkinter.W)
+        self._grid(frame.tkw, column=col, columnspan=colspan, row=row, sticky=tkinter.W)
         frame.tkw.enable_traversal()
         if on_tab_selected is not None:
             frame.tkw.bind("<<NotebookTabChanged>>", on_tab_selected)
@@ -811,10 +3130,11 @@ class TkWidgetDef:
         self.tkw.forget(ix)
         self.children.pop(ix)
 
+    @_layout_method
     def add_tab(self, caption, where=None, on_click=None):
         # Add a tab to notebook
         refname = caption.lower().replace(" ", "_")
-        frame = TkWidgetDef(refname, tkinter.Frame(self.tkw), is_container=True)
+        frame = TkWidgetDef(refname, self.tkm.Frame(self.tkw), is_container=True)
         frame.tkw.grid(sticky=tkinter.NSEW)
         if where is None:
             self.tkw.add(frame.tkw, text=caption)
@@ -861,9 +3181,24 @@ class TkWidgetDef:
     def focus(self):
         self.tkw.focus()
 
-    def make_thumbnail(self, im, width):
+    def make_thumbnail(self, im, width, fn=None):
         _require_image_libs("make_thumbnail")
         # im is an OpenCv / numpy buffer. It can be either RGB or BGR. The color format is not changed.
+        # fn is the image file im is from. With eztk.thumbnail_store set, the
+        # thumbnail is looked up there first and saved there once made, and im
+        # should be RGB. im can be None, the file is then read if needed.
+        store = None
+        if fn is not None:
+            store = thumbnail_store
+        if (store is not None) and (im is not None):
+            if im.shape[0] * im.shape[1] < store.min_pixels:
+                store = None  # resizing im is quicker than the file
+        if store is not None:
+            t = store.get(fn, width)
+            if t is not None:
+                return t
+        if (im is None) and (fn is not None):
+            im = image_cache.get(fn, _read_opencv_rgb_image)
         if im is None:
             return None
         if len(im.shape) > 2:
@@ -874,10 +3209,12 @@ class TkWidgetDef:
         tw = width
         th = int((tw / iw) * ih)
         t = cv2.resize(im, (tw, th), interpolation=cv2.INTER_LINEAR)
+        if store is not None:
+            store.put(fn, width, t)
         return t
 
     def replace_choices(self, choices):
-        if isinstance(self.tkw, tkinter.OptionMenu):
+        if isinstance(self.tkw, self.tkm.OptionMenu):
             # adpated from https://stackoverflow.com/questions/17580218/changing-the-options-of-a-optionmenu-when-clicking-a-button
             current_selection = self.tkd.get()
             self.tkw["menu"].delete(0, "end")
@@ -897,13 +3234,13 @@ class TkWidgetDef:
         )
         if self.tkd is None:
             debug += "None"
-        elif isinstance(self.tkd, tkinter.StringVar):
+        elif isinstance(self.tkd, self.tkm.StringVar):
             debug += "StringVar '{0}".format(self.tkd.get())
         else:
             debug += "{0} '{1}'".format(self.tkd.__class__.__name__, repr(self.tkd))
         # print(debug)
 
-        if isinstance(self.tkw, ScrolledText.ScrolledText):
+        if _is_scrolled_text(self.tkw):
             was_disabled = self.tkw.cget("state") == "disabled"
             if was_disabled:
                 self.tkw.config(state="normal")
@@ -911,26 +3248,26 @@ class TkWidgetDef:
             self.tkw.insert("1.0", new_value)
             if was_disabled:
                 self.tkw.config(state="disabled")
-        elif isinstance(self.tkw, tkinter.Label) and (self.tkw_label is None):
+        elif isinstance(self.tkw, self.tkm.Label) and (self.tkw_label is None):
             # if self.tkw_label is not None, this is from add_label_info(): update self.tk_data
             self.tkw.config(text=new_value)
-        elif isinstance(self.tkw, tkinter.Listbox):
+        elif isinstance(self.tkw, self.tkm.Listbox):
             # clear current selection first, else multi-selection occurs
             cur_selection = self.tkw.curselection()
             self.tkw.select_clear(cur_selection)
             ix = self.list_items.index(new_value)
             self.tkw.selection_set(ix)
             self.tkw.see(ix)
-        elif isinstance(self.tkw, tkinter.Scale):
+        elif isinstance(self.tkw, self.tkm.Scale):
             self.tkw.set(new_value)
-        elif isinstance(self.tkw, tkinter.Checkbutton):
+        elif isinstance(self.tkw, self.tkm.Checkbutton):
             if new_value:
                 self.tkd.set(1)
             else:
                 self.tkd.set(0)
         else:
             # For many/most widgets, the value is in the self.tkd StringVar
-            if isinstance(self.tkd, tkinter.StringVar):
+            if isinstance(self.tkd, self.tkm.StringVar):
                 self.tkd.set(new_value)
         if caption is not None:
             self.tkw_label.config(text=caption)
@@ -945,21 +3282,285 @@ class TkWidgetDef:
         # We can have up to 3 stages of image buffers. We keep references to all
         # for debugging and becaues of some strange garbage collection issues with
         # TK images.
-        # self.tkd is ImageTk.PhotoImage() which actually gets placed on widget
-        # self.pil_im is a Pillow Image() which TK directly uses
+        # self.tkd is the PhotoImage which actually gets placed on widget
+        # self.pil_im is the display size image the PhotoImage is made from,
+        #   a Pillow Image() or, with the "ppm" image_backend, a numpy buffer
         # self.source_im is either an OpenCV buffer for JPEG (or other) files
+        # self.rgb_im is the RGB image. It may already be reduced to
+        #   canvas_width, except for zoomable canvases. Thumbnails are made
+        #   from it, so one wider than canvas_width is scaled up from the
+        #   reduced image rather than made from the source.
+        #   Grayscale images stay single channel throughout, and uint16 and
+        #   float images are mapped to uint8 according to display_window.
+        #
+        # With self.is_streaming set, a frame the same size as the previous
+        # one is pasted into the existing PhotoImage instead of replacing it.
+        # This is much cheaper for video-like sources.
         #
+        # With self.is_progressive set, an image that needs resizing is first
+        # shown resized with nearest neighbour, which is fast, and again with
+        # Lanczos when tk is idle. Another update before then cancels the
+        # refinement, so stepping through images stays quick.
+        #
+        # With self.is_coalescing set, the image is only recorded and rendered
+        # when tk is next idle, and True is returned. Further updates before
+        # then replace it and are counted in self.frames_dropped. The source
+        # buffers must not be modified until rendered. Updates of the
+        # thumbnail are deferred the same way.
+        #
+        self.image_request_id += 1  # an update_image_async() in progress is stale
+        self.image_fn = pil_fn or opencv_fn
+        if self.is_coalescing:
+            return self._coalesce(
+                self._render_image, (pil_fn, source_im, opencv_fn, rgb_im)
+            )
+        return self._render_image(pil_fn, source_im, opencv_fn, rgb_im)
+
+    def _coalesce(self, render, args):
+        # Run render(*args) when tk is next idle. A later call before then
+        # replaces it.
+        if self.coalesce_id is None:
+            self.coalesce_id = self.tkw.after_idle(self._render_coalesced)
+        else:
+            self.frames_dropped += 1
+        self.coalesce_render = (render, args)
+        return True
+
+    def _render_coalesced(self):
+        render, args = self.coalesce_render
+        self.coalesce_id = None
+        self.coalesce_render = None
+        render(*args)
+
+    def _render_image(self, pil_fn, source_im, opencv_fn, rgb_im):
+        if self.refine_id is not None:
+            self.tkw.after_cancel(self.refine_id)
+            self.refine_id = None
+        if not self.is_progressive:
+            return self._show_image(
+                *self._prepare_image(pil_fn, source_im, opencv_fn, rgb_im)
+            )
+        args = (pil_fn, source_im, opencv_fn, rgb_im)
+        rgb_im, pil_im, resize_ratio, pyramid = self._prepare_image(
+            *args, quality="preview"
+        )
+        result = self._show_image(rgb_im, pil_im, resize_ratio, pyramid)
+        if result and (resize_ratio is not None) and (pyramid is None):
+            self.refine_id = self.tkw.after_idle(
+                self._refine_image, self.image_request_id, args
+            )
+        return result
+
+    def _refine_image(self, request_id, args):
+        self.refine_id = None
+        if request_id != self.image_request_id:
+            return
+        self._show_image(*self._prepare_image(*args, quality="refine"))
+
+    def update_image_async(
+        self,
+        pil_fn=None,
+        source_im=None,
+        opencv_fn=None,
+        rgb_im=None,
+        on_done=None,
+        poll_ms=10,
+    ):
+        # Like update_image(), but loading, color conversion and resizing run in
+        # a worker thread. OpenCV and Pillow release the GIL for these, so the
+        # UI stays responsive. Only the PhotoImage creation and the widget
+        # update run on the tk thread, from an after() callback.
+        # If update_image() or update_image_async() is called again for this
+        # widget before the work completes, the stale result is dropped.
+        # on_done(result) receives what update_image() would have returned,
+        # False if the work raised an exception.
+        _require_image_libs("update_image_async")
+        self.image_request_id += 1
+        self.image_fn = pil_fn or opencv_fn
+        future = _get_image_executor().submit(
+            self._prepare_image, pil_fn, source_im, opencv_fn, rgb_im
+        )
+        if self.image_poll_id is not None:
+            self.tkw.after_cancel(self.image_poll_id)
+        self.image_poll_id = self.tkw.after(
+            poll_ms,
+            self._poll_image_future,
+            future,
+            self.image_request_id,
+            on_done,
+            poll_ms,
+        )
+        return future
+
+    def update_image_regions(self, rects, source_im=None, rgb_im=None):
+        # Partial update of the image shown by update_image(), for frames where
+        # only small areas change. source_im (OpenCV BGR or grayscale) or rgb_im
+        # is the new frame, the same size as the one being shown, and rects is
+        # a list of (x, y, width, height) rectangles in it that changed. Only
+        # those regions are scaled, converted and written into the PhotoImage,
+        # so the cost is proportional to the changed area.
+        # self.rgb_im and thumbnails are not updated. If the frame can't be
+        # updated in place (nothing shown yet, a different size, a zoomable or
+        # tiled canvas, a coalesced frame still to be rendered) the whole frame
+        # is shown with update_image().
+        _require_image_libs("update_image_regions")
+        if rgb_im is not None:
+            im = rgb_im
+        else:
+            im = source_im
+        height, width = im.shape[:2]
+        if self.pil_resize_ratio is None:
+            display_size = (width, height)
+        else:
+            display_size = (self.canvas_width, int(self.pil_resize_ratio * height))
+        if (
+            (self.pyramid is not None)
+            or (self.tiled_image is not None)
+            or (self.display_window == "auto")  # needs the whole frame
+            or (self.coalesce_id is not None)  # would be overwritten when idle
+            or (self._photo_size() != display_size)
+        ):
+            return self.update_image(source_im=source_im, rgb_im=rgb_im)
+        self.image_request_id += 1
+        self.image_fn = None  # no longer the image in the file
+        photo_name = str(self.tkd)
+        for sx0, sy0, sx1, sy1, dx0, dy0, dx1, dy1 in self._display_rects(
+            rects, width, height
+        ):
+            region = im[sy0:sy1, sx0:sx1]
+            if (dx1 - dx0, dy1 - dy0) != (sx1 - sx0, sy1 - sy0):
+                region = cv2.resize(
+                    region, (dx1 - dx0, dy1 - dy0), interpolation=cv2.INTER_AREA
+                )
+            region = _to_uint8(region, self.display_window)
+            if (rgb_im is None) and (len(region.shape) > 2):
+                region = cv2.cvtColor(region, cv2.COLOR_BGR2RGB)
+            self.tkw.tk.call(photo_name, "put", _ppm_data(region), "-to", dx0, dy0)
+        return True
+
+    def _display_rects(self, rects, width, height):
+        # Map (x, y, width, height) rectangles in a width x height image to
+        # (sx0, sy0, sx1, sy1, dx0, dy0, dx1, dy1): the source pixels to read
+        # and the display pixels they cover, allowing for pil_resize_ratio.
+        ratio = self.pil_resize_ratio
+        if ratio is None:
+            ratio = 1.0
+            display_width = width
+            display_height = height
+        else:
+            # the same sizes as _shrink_to_canvas()
+            display_width = self.canvas_width
+            display_height = int(ratio * height)
+        res = []
+        for x, y, w, h in rects:
+            dx0 = max(int(math.floor(x * ratio)), 0)
+            dy0 = max(int(math.floor(y * ratio)), 0)
+            dx1 = min(int(math.ceil((x + w) * ratio)), display_width)
+            dy1 = min(int(math.ceil((y + h) * ratio)), display_height)
+            if (dx1 <= dx0) or (dy1 <= dy0):
+                continue
+            sx0 = int(math.floor(dx0 / ratio))
+            sy0 = int(math.floor(dy0 / ratio))
+            sx1 = min(int(math.ceil(dx1 / ratio)), width)
+            sy1 = min(int(math.ceil(dy1 / ratio)), height)
+            res.append((sx0, sy0, sx1, sy1, dx0, dy0, dx1, dy1))
+        return res
+
+    def update_image_tiled(self, source, tile_size=256):
+        # Show a huge image on a Canvas from add_canvas() at full resolution
+        # as tiles, see TiledImage. source is a numpy array, usually from
+        # open_image_source(), in RGB or grayscale.
+        _require_image_libs("update_image_tiled")
+        if not isinstance(self.tkw, self.tkm.Canvas):
+            raise TypeError("Unsupported image widget: " + self.tkw.__class__.__name__)
+        self.image_request_id += 1
+        self.image_fn = None
+        if self.scrollable_image is not None:
+            self.tkw.delete(self.scrollable_image)
+            self.scrollable_image = None
+        self.tkd = None
         self.pil_im = None
         self.rgb_im = None
+        self.pil_resize_ratio = None
+        self.pyramid = None
+        self._end_tiled_image()
+        self.tiled_image = TiledImage(
+            self.tkw,
+            source,
+            tile_size=tile_size,
+            view_width=self.canvas_width,
+            view_height=self.canvas_height,
+            xscroll=self.hbar.set,
+            yscroll=self.vbar.set,
+            backend=self.image_backend,
+            display_window=self.display_window,
+        )
+        self.tkw.config(
+            xscrollcommand=self.tiled_image.on_xscroll,
+            yscrollcommand=self.tiled_image.on_yscroll,
+            scrollregion=(0, 0, source.shape[1], source.shape[0]),
+        )
+        self.tiled_image.refresh()
+        return True
+
+    def _end_tiled_image(self):
+        if self.tiled_image is not None:
+            self.tiled_image.clear()
+            self.tiled_image = None
+            if self.is_zoomable:
+                self.tkw.config(
+                    xscrollcommand=self._on_zoom_xscroll,
+                    yscrollcommand=self._on_zoom_yscroll,
+                )
+            else:
+                self.tkw.config(
+                    xscrollcommand=self.hbar.set, yscrollcommand=self.vbar.set
+                )
+
+    def _poll_image_future(self, future, request_id, on_done, poll_ms):
+        # tkinter calls must be made from the tk thread, so rather than have the
+        # worker call back, the tk thread polls for the result.
+        self.image_poll_id = None
+        if request_id != self.image_request_id:
+            return
+        if not future.done():
+            self.image_poll_id = self.tkw.after(
+                poll_ms, self._poll_image_future, future, request_id, on_done, poll_ms
+            )
+            return
+        try:
+            prepared = future.result()
+        except Exception as e:
+            # not raised from the after() callback, where tk would report it
+            print("update_image_async(): unable to prepare image:", e)
+            result = False
+        else:
+            result = self._show_image(*prepared)
+        if on_done is not None:
+            on_done(result)
+
+    def _prepare_image(self, pil_fn, source_im, opencv_fn, rgb_im, quality=None):
+        # Everything update_image() does that doesn't touch tk, so it can run
+        # in a worker thread.
+        # Returns (rgb_im, pil_im, pil_resize_ratio, pyramid). For a zoomable
+        # canvas pil_im is None and the pyramid is built instead.
+        # quality is None, "preview" or "refine", see update_image().
+        backend = _photo_backend(self.image_backend)
+        interpolation = None
+        if quality == "preview":
+            interpolation = cv2.INTER_NEAREST
+        elif quality == "refine":
+            interpolation = cv2.INTER_LANCZOS4
+        pil_im = None
+        resize_ratio = None
         if pil_fn is not None:
-            try:
-                self.pil_im = Image.open(pil_fn)
-            except IOError:
-                self.pil_im = None
-            self.rgb_im = None
+            _require_pillow("update_image")
+            pil_im = image_cache.get(pil_fn, _read_pil_image)
+            rgb_im = None
+            if (self.is_zoomable or (backend == "ppm")) and (pil_im is not None):
+                rgb_im = np.asarray(pil_im.convert("RGB"))
         elif rgb_im is not None:
-            self.rgb_im = rgb_im
-            self.pil_im = Image.fromarray(self.rgb_im)
+            rgb_im = _to_uint8(rgb_im, self.display_window)  # already RGB
         elif source_im is not None:
             if self.debug_this:
                 print(
@@ -968,48 +3569,298 @@ class TkWidgetDef:
                     source_im.shape,
                 )
             # this is an OpenCv image
+            if not self.is_zoomable:
+                # Nothing else needs the full size RGB image, so shrink first
+                # and convert the color of the smaller buffer. Thumbnails are
+                # made from the smaller images too.
+                source_im, resize_ratio = self._shrink_to_canvas(
+                    source_im, interpolation
+                )
+            source_im = _to_uint8(source_im, self.display_window)
             if len(source_im.shape) > 2:
-                self.rgb_im = cv2.cvtColor(source_im, cv2.COLOR_BGR2RGB)
+                rgb_im = cv2.cvtColor(source_im, cv2.COLOR_BGR2RGB)
             else:
-                self.rgb_im = cv2.cvtColor(source_im, cv2.COLOR_GRAY2RGB)
-            self.pil_im = Image.fromarray(self.rgb_im)
+                rgb_im = source_im  # grayscale is shown as it is
         elif opencv_fn is not None:
-            opencv_im = cv2.imread(opencv_fn)
-            self.rgb_im = cv2.cvtColor(opencv_im, cv2.COLOR_BGR2RGB)
-            self.pil_im = Image.fromarray(self.rgb_im)
+            rgb_im = image_cache.get(opencv_fn, _read_opencv_rgb_image)
+        if self.is_zoomable and (rgb_im is not None):
+            return (rgb_im, None, None, ImagePyramid(rgb_im))
+        if rgb_im is not None:
+            display_im = rgb_im
+            if resize_ratio is None:
+                display_im, resize_ratio = self._shrink_to_canvas(rgb_im, interpolation)
+            if backend == "ppm":
+                pil_im = display_im
+            else:
+                pil_im = Image.fromarray(display_im)
         #
-        if self.pil_im is None:
+        if pil_im is None:
             print(
                 "update_image() unable to create PILLOW image object",
                 pil_fn,
                 opencv_fn,
                 source_im.__class__.__name__,
             )
-            # should blank thumbnail here
-            return False
-        imWidth = self.pil_im.width
-        self.pil_resize_ratio = None
+            return (None, None, None, None)
+        imWidth = _image_size(pil_im)[0]
         if self.canvas_width < imWidth:
-            self.pil_resize_ratio = float(self.canvas_width) / float(imWidth)
-            imHeight = self.pil_im.height
-            height = int(self.pil_resize_ratio * imHeight)
-            self.pil_im = self.pil_im.resize((self.canvas_width, height))
+            resize_ratio = float(self.canvas_width) / float(imWidth)
+            imHeight = pil_im.height
+            height = int(resize_ratio * imHeight)
+            resample = {"preview": Image.NEAREST, "refine": Image.LANCZOS}.get(quality)
+            pil_im = pil_im.resize((self.canvas_width, height), resample=resample)
             # print("RESIZE", self.canvas_width, height)
-        self.tkd = ImageTk.PhotoImage(self.pil_im)
+        return (rgb_im, pil_im, resize_ratio, None)
+
+    def _shrink_to_canvas(self, im, interpolation=None):
+        # Returns (im, pil_resize_ratio) with im reduced to canvas_width if it
+        # is wider. The default INTER_AREA averages the source pixels, which is
+        # the appropriate filter for reducing.
+        ih, iw = im.shape[:2]
+        if self.canvas_width >= iw:
+            return (im, None)
+        resize_ratio = float(self.canvas_width) / float(iw)
+        height = int(resize_ratio * ih)
+        if interpolation is None:
+            interpolation = cv2.INTER_AREA
+        elif (interpolation == cv2.INTER_LANCZOS4) and (resize_ratio < 0.5):
+            # OpenCV's Lanczos only looks at 8x8 source pixels, so reductions
+            # beyond 2x alias. Average down to twice the size first.
+            im = cv2.resize(
+                im, (self.canvas_width * 2, height * 2), interpolation=cv2.INTER_AREA
+            )
+        im = cv2.resize(im, (self.canvas_width, height), interpolation=interpolation)
+        return (im, resize_ratio)
+
+    def _show_image(self, rgb_im, pil_im, resize_ratio, pyramid=None):
+        # The tk half of update_image()
+        self.rgb_im = rgb_im
+        self.pil_im = pil_im
+        self.pyramid = pyramid
+        if pyramid is not None:
+            self._end_tiled_image()
+            self.zoom_view = None
+            self._set_zoom(min(1.0, float(self.canvas_width) / float(pyramid.width)))
+            self.tkw.xview_moveto(0.0)
+            self.tkw.yview_moveto(0.0)
+            self._render_zoom_view()
+        elif self.pil_im is None:
+            # should blank thumbnail here
+            return False
+        else:
+            self.pil_resize_ratio = resize_ratio
+            if not self._show_photo():
+                return False
+        if not self.thumbnails:
+            return True
+        if self.is_coalescing:
+            # once when tk is next idle, cancelled if this widget is destroyed
+            if self.thumbnails_id is None:
+                self.thumbnails_id = self.tkw.after_idle(self._update_thumbnails)
+            return True
+        return self._update_thumbnails()
+
+    def _link_thumbnail(self, frame, width):
+        # after this, the thumbnail will be automatically updated whenever the
+        # base image is updated
+        frame.thumbnail_of = self
+        self.thumbnails.append((frame, width))
+        if self.thumbnail is None:
+            self.thumbnail = frame
+            self.thumbnail_width = width
+        if (self.image_fn is None) and (len(self._thumbnail_levels()) == 0):
+            return True  # no image yet, the first update_image() makes it
+        return frame.update_image(rgb_im=self._thumbnail_image(width))
+
+    def _unlink_thumbnail(self, frame):
+        self.thumbnails = [t for t in self.thumbnails if t[0] is not frame]
+        if self.thumbnails:
+            self.thumbnail, self.thumbnail_width = self.thumbnails[0]
+        else:
+            self.thumbnail = None
+            self.thumbnail_width = 0
+
+    def _thumbnail_levels(self):
+        # The numpy images at hand that thumbnails can be made from: the RGB
+        # image, the display image and the levels of a zoom pyramid.
+        levels = []
+        if self.rgb_im is not None:
+            levels.append(self.rgb_im)
+        if hasattr(self.pil_im, "shape"):
+            levels.append(self.pil_im)
+        elif (self.pil_im is not None) and (self.pil_im.mode in ("RGB", "L")):
+            levels.append(np.asarray(self.pil_im))
+        if self.pyramid is not None:
+            levels.extend(self.pyramid.levels[1:])
+        return levels
+
+    def _thumbnail_image(self, width):
+        im = _nearest_level(self._thumbnail_levels(), width)
+        return self.make_thumbnail(im, width, fn=self.image_fn)
+
+    def _update_thumbnails(self):
+        # All thumbnails in one pass, largest first. Each is made from the
+        # smallest image at hand at least as wide, which may be a larger
+        # thumbnail, so the cost depends on the thumbnail size rather than
+        # the size of the source.
+        self.thumbnails_id = None
+        levels = self._thumbnail_levels()
+        result = True
+        for thumbnail, width in sorted(self.thumbnails, key=lambda t: -t[1]):
+            im = self.make_thumbnail(
+                _nearest_level(levels, width), width, fn=self.image_fn
+            )
+            if im is not None:
+                levels.append(im)
+            if not thumbnail.update_image(rgb_im=im):
+                result = False
+        return result
+
+    def _show_photo(self):
+        if self.is_streaming and (self._photo_size() == _image_size(self.pil_im)):
+            # A frame the same size as the last: update the pixels of the
+            # PhotoImage already on the widget. The widget configuration,
+            # scrollregion and scrollbars don't change.
+            if hasattr(self.pil_im, "shape"):
+                self.tkw.tk.call(str(self.tkd), "put", _ppm_data(self.pil_im))
+            else:
+                self.tkd.paste(self.pil_im)
+            return True
+        return self._place_photo()
+
+    def overlay(self):
+        # The CanvasOverlay for annotating the image on this canvas
+        if not isinstance(self.tkw, self.tkm.Canvas):
+            raise TypeError(
+                "Unsupported overlay widget: " + self.tkw.__class__.__name__
+            )
+        if self.canvas_overlay is None:
+            self.canvas_overlay = CanvasOverlay(self)
+        return self.canvas_overlay
+
+    #
+    # Zoom and pan of canvases made with add_canvas(zoomable=True)
+    #
+    def image_xy(self, event):
+        # Map the position of a mouse event on an image widget to coordinates
+        # in the full size image, allowing for resizing, zoom and scrolling.
+        if isinstance(self.tkw, self.tkm.Canvas):
+            x = self.tkw.canvasx(event.x)
+            y = self.tkw.canvasy(event.y)
+        else:
+            x = event.x
+            y = event.y
+        if self.pil_resize_ratio is None:
+            return (x, y)
+        return (x / self.pil_resize_ratio, y / self.pil_resize_ratio)
+
+    def zoom_to(self, zoom, x=None, y=None):
+        # Show the image at zoom (window pixels per image pixel), keeping the
+        # image point at window position x, y in place. The default is the
+        # center of the window. zoom is limited to ZOOM_LIMITS.
+        if self.pyramid is None:
+            return
+        zoom = min(max(zoom, ZOOM_LIMITS[0]), ZOOM_LIMITS[1])
+        if x is None:
+            x = self.canvas_width // 2
+        if y is None:
+            y = self.canvas_height // 2
+        image_x = self.tkw.canvasx(x) / self.zoom
+        image_y = self.tkw.canvasy(y) / self.zoom
+        width, height = self._set_zoom(zoom)
+        self.tkw.xview_moveto((image_x * zoom - x) / width)
+        self.tkw.yview_moveto((image_y * zoom - y) / height)
+        self._render_zoom_view()
+
+    def _set_zoom(self, zoom):
+        self.zoom = zoom
+        self.pil_resize_ratio = zoom
+        width = self.pyramid.width * zoom
+        height = self.pyramid.height * zoom
+        self.tkw.config(scrollregion=(0, 0, width, height))
+        return (width, height)
+
+    def pan(self, dx, dy):
+        # Scroll the view by dx, dy window pixels
+        self.tkw.scan_mark(0, 0)
+        self.tkw.scan_dragto(-dx, -dy, gain=1)
+
+    def _on_zoom_wheel(self, event):
+        if (event.num == 5) or (event.delta < 0):
+            factor = 1.0 / 1.25
+        else:
+            factor = 1.25
+        self.zoom_to(self.zoom * factor, event.x, event.y)
+
+    def _on_pan_start(self, event):
+        self.tkw.scan_mark(event.x, event.y)
+
+    def _on_pan_drag(self, event):
+        self.tkw.scan_dragto(event.x, event.y, gain=1)
+
+    def _on_zoom_xscroll(self, first, last):
+        self.hbar.set(first, last)
+        self._render_zoom_view()
+
+    def _on_zoom_yscroll(self, first, last):
+        self.vbar.set(first, last)
+        self._render_zoom_view()
+
+    def _render_zoom_view(self):
+        # Show the visible window of the pyramid at self.zoom. This runs for
+        # every scroll, so it must not change the scrollregion. A view that
+        # is already shown isn't rendered again, as when tk reports the
+        # scrollregion change of a zoom after it was rendered.
+        if self.pyramid is None:
+            return
+        width = self.tkw.winfo_width()
+        height = self.tkw.winfo_height()
+        if width <= 1:
+            width = self.canvas_width
+            height = self.canvas_height
+        left = self.tkw.canvasx(0)
+        top = self.tkw.canvasy(0)
+        view = (self.zoom, left, top, width, height)
+        if view == self.zoom_view:
+            return
+        self.zoom_view = view
+        im, x, y = self.pyramid.view(self.zoom, left, top, width, height)
+        if im is None:
+            return
+        self.tkd = _photo_image(im, _photo_backend(self.image_backend), self.tkw)
+        if self.scrollable_image is None:
+            self.scrollable_image = self.tkw.create_image(
+                x, y, image=self.tkd, anchor="nw"
+            )
+        else:
+            self.tkw.itemconfig(self.scrollable_image, image=self.tkd)
+            self.tkw.coords(self.scrollable_image, x, y)
+
+    def _photo_size(self):
+        if _is_photo(self.tkd):
+            return (self.tkd.width(), self.tkd.height())
+        return None
+
+    def _place_photo(self):
+        # Make a new PhotoImage from self.pil_im and show it on the widget
+        self.tkd = _photo_image(
+            self.pil_im, _photo_backend(self.image_backend), self.tkw
+        )
         if self.tkd is None:
             print("update_image() unable to create TK image object")
             # should blank thumbnail here
             return False
-        if isinstance(self.tkw, tkinter.Label):
+        if isinstance(self.tkw, self.tkm.Label):
             self.tkw.configure(image=self.tkd)
-        elif isinstance(self.tkw, tkinter.Canvas):
+        elif isinstance(self.tkw, self.tkm.Canvas):
+            self._end_tiled_image()
             if self.scrollable_image is None:
                 self.scrollable_image = self.tkw.create_image(
                     0, 0, image=self.tkd, anchor="nw"
                 )
             else:
                 self.tkw.itemconfig(self.scrollable_image, image=self.tkd)
-            width, height = self.pil_im.size
+            width, height = _image_size(self.pil_im)
             self.tkw.config(scrollregion=(0, 0, width, height))
             pctWidth = float(self.canvas_width) / float(width)
             if pctWidth > 1.0:
@@ -1028,38 +3879,32 @@ class TkWidgetDef:
                     height,
                     pctWidth,
                     pctHeight,
-                    opencv_fn,
                 )
         else:
             raise TypeError("Unsupported image widget: " + self.tkw.__class__.__name__)
-        if self.thumbnail:
-            return self.thumbnail.update_image(
-                rgb_im=self.make_thumbnail(self.rgb_im, self.thumbnail_width)
-            )
-        else:
-            return True
+        return True
 
     def value(self):
-        if isinstance(self.tkw, ScrolledText.ScrolledText):
+        if _is_scrolled_text(self.tkw):
             return self.tkw.get("1.0", tkinter.END)
-        if isinstance(self.tkw, tkinter.Listbox):
+        if isinstance(self.tkw, self.tkm.Listbox):
             # ix is a tuple like (2,). I assume the 2nd element would be the end of
             # the range. Or maybe it a list of items for multi-selection.
             # This works for now.
             ix = self.tkw.curselection()
             return self.tkw.get(ix)
-        if isinstance(self.tkw, tkinter.Scale):
+        if isinstance(self.tkw, self.tkm.Scale):
             return self.tkw.get()
-        if isinstance(self.tkw, tkinter.Checkbutton):
+        if isinstance(self.tkw, self.tkm.Checkbutton):
             v = self.tkd.get()
             if v:
                 return True
             else:
                 return False
         # For many/most widgets, the value is in the self.tkd StringVar
-        if isinstance(self.tkd, tkinter.StringVar):
+        if isinstance(self.tkd, self.tkm.StringVar):
             v = self.tkd.get()
-            if isinstance(self.tkw, tkinter.OptionMenu) and (v == "None"):
+            if isinstance(self.tkw, self.tkm.OptionMenu) and (v == "None"):
                 # I'm not sure if its me or tkinter that turned no selection to a string
                 v = None
             # print("value() tkd '{0}'".format(v))
@@ -1079,64 +3924,306 @@ class TkWidgetDef:
         col=SAME_COL,
         rowspan=5,
         xscroll=False,
+        colspan=1,
     ):
         # Getting scrolled widgets right is verbose and fussy. I found this technique using a seperate frame and
         # explicit borderwidth and weight on StackOverflow somewhere.
         # The goal is for this tmethod to create any widget that needs scroll bars.
+        # colspan is the number of columns of the scrolled widget, right of the caption.
         #
-        row, col = self._position(row=row, col=col)
+        span = colspan if colspan == COL_SPAN_ALL else colspan + 1  # and caption
+        row, col = self._position(row=row, col=col, colspan=span, rowspan=rowspan)
+        if colspan == COL_SPAN_ALL:
+            colspan = max(self.right_col - col, 1)
 
         if caption is None:
             tk_caption = None
             refname = "ZXC"
         else:
             refname = caption.lower().replace(" ", "_")
-            tk_caption = tkinter.Label(self.tkw, text=caption)
-            tk_caption.grid(column=col, row=row, sticky=tkinter.W)
+            tk_caption = self.tkm.Label(self.tkw, text=caption)
+            self._grid(tk_caption, column=col, row=row, sticky=tkinter.W)
 
-        container = tkinter.Frame(master=self.tkw, borderwidth=2, relief=tkinter.SUNKEN)
+        container = self.tkm.Frame(
+            master=self.tkw, borderwidth=2, relief=tkinter.SUNKEN
+        )
         tkw = tk_widget_class(master=container, borderwidth=0, **tk_widget_parms)
         frame = TkWidgetDef(refname, tkw, tkw_label=tk_caption)
         frame.scroll_container = container  # may be needed to avoid garbage collection
 
         if xscroll:
-            frame.hbar = tkinter.Scrollbar(
+            frame.hbar = self.tkm.Scrollbar(
                 master=frame.scroll_container, orient=tkinter.HORIZONTAL
             )
-            frame.hbar.grid(row=1, column=0, sticky=tkinter.E + tkinter.W)
+            self._grid(frame.hbar, row=1, column=0, sticky=tkinter.E + tkinter.W)
         else:
             frame.hbar = None
-        frame.vbar = tkinter.Scrollbar(
+        frame.vbar = self.tkm.Scrollbar(
             master=frame.scroll_container, orient=tkinter.VERTICAL
         )
-        frame.vbar.grid(row=0, column=1, sticky=tkinter.N + tkinter.S)
+        self._grid(frame.vbar, row=0, column=1, sticky=tkinter.N + tkinter.S)
         frame.tkw.config(yscrollcommand=frame.vbar.set)
         frame.vbar.config(command=frame.tkw.yview)
         if xscroll:
             frame.tkw.config(xscrollcommand=frame.hbar.set)
             frame.hbar.config(command=frame.tkw.xview)
-        frame.tkw.grid(
-            row=0, column=0, sticky=tkinter.N + tkinter.S + tkinter.E + tkinter.W
+        self._grid(
+            frame.tkw,
+            row=0,
+            column=0,
+            sticky=tkinter.N + tkinter.S + tkinter.E + tkinter.W,
         )
         frame.scroll_container.grid_rowconfigure(0, weight=1)
         frame.scroll_container.grid_columnconfigure(0, weight=1)
-        frame.scroll_container.grid(row=row, column=col + 1)
+        self._grid(frame.scroll_container, row=row, column=col + 1, columnspan=colspan)
         if on_click is not None:
             frame.tkw.bind("<Button-1>", on_click)
-        self._remember_position(frame, row, col, rowspan=rowspan, colspan=2)
+        self._remember_position(frame, row, col, rowspan=rowspan, colspan=colspan + 1)
         self.append_child(frame)
         return frame
 
-    def _position(self, row=NEXT_ROW, col=-SAME_COL):
+    def find(self, parm_id):
+        # The first widget in this tree with parm_id, None if there isn't one.
+        # Widgets built by build_from_spec() are found this way.
+        for child in self.children:
+            if child.parm_id == parm_id:
+                return child
+            if child.is_container:
+                found = child.find(parm_id)
+                if found is not None:
+                    return found
+        return None
+
+    def layout_spec(self, fingerprint=None):
+        # The children of this container as a spec for build_from_spec()
+        commands = {}  # __qualname__: callable, to catch two with one name
+        return {
+            "version": LAYOUT_SPEC_VERSION,
+            "fingerprint": fingerprint,
+            "extent": self._layout_extent(),
+            "check_overlap": self.check_overlap,
+            "children": [child._layout_node(commands) for child in self.children],
+        }
+
+    def _layout_extent(self):
+        return [
+            self.last_used_row,
+            self.last_used_rowspan,
+            self.last_used_col,
+            self.last_used_colspan,
+            self.bottom_row,
+            self.right_col,
+        ]
+
+    def _layout_node(self, commands):
+        if self.layout_call is None:
+            raise ValueError(
+                "eztk: widget {!r} can't be recorded in a layout spec".format(
+                    self.wname
+                )
+            )
+        name, args, kw = self.layout_call
+        signature = inspect.signature(_LAYOUT_METHODS[name])
+        arguments = signature.bind(self.parent, *args, **kw).arguments
+        del arguments["self"]
+        node = {"kind": name}
+        if "row" in signature.parameters:
+            if (arguments.get("row") == OVERLAY_ROW) or (
+                arguments.get("col") == OVERLAY_COL
+            ):
+                node["overlay"] = True  # shares its cells, see check_overlap
+            arguments["row"] = self.row  # resolved, not worked out again on replay
+            arguments["col"] = self.col
+        if "colspan" in signature.parameters:
+            arguments["colspan"] = self.col_span  # COL_SPAN_ALL resolved
+        node_commands = {}
+        for key, value in list(arguments.items()):
+            if callable(value):
+                qualname = getattr(value, "__qualname__", None)
+                if qualname is None:
+                    raise ValueError(
+                        "eztk: {} of {} has no __qualname__ to record".format(key, name)
+                    )
+                if commands.setdefault(qualname, value) != value:
+                    raise ValueError(
+                        "eztk: different commands named {!r} can't be recorded".format(
+                            qualname
+                        )
+                    )
+                node_commands[key] = qualname
+                del arguments[key]
+        try:
+            json.dumps(arguments)
+        except TypeError:
+            raise ValueError(
+                "eztk: arguments of {} can't be recorded in a layout spec".format(name)
+            )
+        node["args"] = dict(arguments)
+        if len(node_commands) > 0:
+            node["commands"] = node_commands
+        if self.parm_id is not None:
+            node["parm_id"] = self.parm_id
+        if self.is_container:
+            node["extent"] = self._layout_extent()
+            node["check_overlap"] = self.check_overlap
+            node["children"] = [child._layout_node(commands) for child in self.children]
+        return node
+
+    def build_from_spec(self, spec, commands=None):
+        # Adds the widgets of a layout_spec() to this container. commands maps
+        # the __qualname__ of recorded callables to the callables to use.
+        commands = commands or {}
+        _check_layout_node(spec, commands)  # before building anything
+        with self.batch():
+            for step in self._build_steps(spec, commands, False):
+                pass
+
+    def spec_steps(self, spec, commands=None):
+        # An iterator that builds the widgets of a layout_spec() one per step,
+        # for build_in_slices(). Each container's children are made top row
+        # first, so what is visible at the top of the window comes first.
+        commands = commands or {}
+        _check_layout_node(spec, commands)
+        return self._build_steps(spec, commands, True)
+
+    def _build_steps(self, node, commands, top_first):
+        self.check_overlap = node.get("check_overlap", self.check_overlap)
+        child_nodes = node["children"]
+        if top_first:
+            child_nodes = sorted(
+                child_nodes,
+                key=lambda n: (n["args"].get("row", 0), n["args"].get("col", 0)),
+            )
+        for child_node in child_nodes:
+            name = child_node["kind"]
+            kw = child_node["args"]
+            if "commands" in child_node:
+                kw = dict(kw)
+                for key, qualname in child_node["commands"].items():
+                    kw[key] = commands[qualname]
+            if child_node.get("overlay"):
+                # placed over other widgets on purpose, as with OVERLAY_ROW
+                check_overlap = self.check_overlap
+                self.check_overlap = False
+                try:
+                    child = _LAYOUT_METHODS[name](self, **kw)
+                finally:
+                    self.check_overlap = check_overlap
+                child.check_overlap = check_overlap
+                kw = dict(kw, row=OVERLAY_ROW, col=OVERLAY_COL)
+            else:
+                child = _LAYOUT_METHODS[name](self, **kw)
+            child.layout_call = (name, (), kw)
+            child.parm_id = child_node.get("parm_id")
+            yield child
+            if "children" in child_node:
+                yield from child._build_steps(child_node, commands, top_first)
+        (
+            self.last_used_row,
+            self.last_used_rowspan,
+            self.last_used_col,
+            self.last_used_colspan,
+            self.bottom_row,
+            self.right_col,
+        ) = node["extent"]
+
+    def build_in_slices(self, steps, slice_ms=8, on_done=None):
+        # Builds a large form without blocking the first paint. steps is an
+        # iterator, usually a generator that adds widgets to this container
+        # and yields between groups of add_*() calls, or spec_steps(). It is
+        # advanced from after_idle() for about slice_ms milliseconds at a
+        # time, each slice inside batch(), so the window appears at once and
+        # fills in while events are still handled. Add the top of the form
+        # first. on_done(self) is called at the end. destroy() stops it.
+        self.build_id = self.tkw.after_idle(
+            self._build_slice, iter(steps), slice_ms, on_done
+        )
+
+    def _build_slice(self, steps, slice_ms, on_done):
+        self.build_id = None
+        deadline = time.perf_counter() + slice_ms / 1000.0
+        is_done = True
+        with self.batch():
+            for step in steps:
+                if time.perf_counter() >= deadline:
+                    is_done = False
+                    break
+        if is_done:
+            if on_done is not None:
+                on_done(self)
+        else:
+            self.build_id = self.tkw.after_idle(
+                self._build_slice, steps, slice_ms, on_done
+            )
+
+    def build_layout(self, builder, cache_fn, commands=None):
+        # builder(self) adds widgets to this empty container. Its layout is
+        # saved in cache_fn and later built from there while the fingerprint
+        # of the building code matches. Returns True if built from the cache.
+        fingerprint = layout_fingerprint(builder)
+        try:
+            with open(cache_fn) as f:
+                spec = json.load(f)
+        except (OSError, ValueError):
+            spec = None
+        if (
+            isinstance(spec, dict)
+            and (spec.get("version") == LAYOUT_SPEC_VERSION)
+            and (spec.get("fingerprint") == fingerprint)
+        ):
+            self.build_from_spec(spec, commands)
+            return True
+        builder(self)
+        try:
+            spec = self.layout_spec(fingerprint)
+        except ValueError:
+            return False  # built by builder, but it can't be cached
+        data = json.dumps(spec, separators=(",", ":"))
+        tmp_fn = "{}.{}.tmp".format(cache_fn, os.getpid())
+        with open(tmp_fn, "w") as f:
+            f.write(data)
+        os.replace(tmp_fn, cache_fn)
+        return False
+
+    def _position(self, row=NEXT_ROW, col=-SAME_COL, colspan=1, rowspan=1):
         # This makes convenient substitutions for special, negative values.
         # Positive or zero values are unchanged since they are specified positions.
         # SAME_ROW/COL and NEXT_ROW/COL are relative to last component placed, which may
         # not be sequential. The others are relative to the extents of component.
         # This is called in the context of a container for the component thas is about to be created.
+        # colspan and rowspan are the cells the component will cover, for
+        # NEXT_FREE and the check_overlap check.
+        is_overlay = False
+        if (row < 0) or (col < 0):
+            row, col, is_overlay = self._relative_position(row, col, colspan, rowspan)
+        if self.check_overlap and not is_overlay:
+            if colspan == COL_SPAN_ALL:
+                colspan = max(self.right_col - col + 1, 1)
+            other = self.occupancy.overlapping(row, col, rowspan, colspan)
+            if other is not None:
+                raise ValueError(
+                    "eztk: widget at row {} col {} overlaps {!r}".format(
+                        row, col, other.wname
+                    )
+                )
+        return (row, col)
+
+    def _relative_position(self, row, col, colspan, rowspan):
+        # _position() for special row or col values. Returns (row, col,
+        # is_overlay).
+        if (row == NEXT_FREE) or (col == NEXT_FREE):
+            # first free cell, NEXT_FREE in either one applies to both
+            width = self.right_col + 1
+            if colspan == COL_SPAN_ALL:
+                colspan = width
+            row, col = self.occupancy.next_free(width, colspan, rowspan)
+            return (row, col, False)
+        is_overlay = False
         if (row == OVERLAY_ROW) or (col == OVERLAY_COL):
             # an overlay is an overlay. This is a convenience so you don't have to specify both row and col
             row = OVERLAY_ROW
             col = OVERLAY_COL
+            is_overlay = True
         if row == SAME_ROW:
             # same row as the previous item, fixup initial value for first row.
             if self.last_used_row < FIRST_ROW:
@@ -1175,7 +4262,7 @@ class TkWidgetDef:
         elif col == OVERLAY_COL:
             # row & col in same place, to swap widgets with lift / lower
             col = self.last_used_col
-        return (row, col)
+        return (row, col, is_overlay)
 
     def _remember_position(self, new_TkWidgetDef, row, col, colspan=1, rowspan=1):
         # Update the new widgets position info.
@@ -1189,6 +4276,7 @@ class TkWidgetDef:
         new_TkWidgetDef.row_span = rowspan
         # Update container positioning to reflect this new widget
         assert self.is_container
+        self.occupancy.occupy(new_TkWidgetDef, row, col, rowspan, colspan)
         new_widget_right_col = col + colspan - 1
         new_widget_bottom_row = row + rowspan - 1
         self.last_used_row = row
@@ -1226,5 +4314,10 @@ class TkWidgetDef:
 class EasyTk(TkWidgetDef):
     __slots__ = ()
 
-    def __init__(self, debug=False):
-        super().__init__("root", tkinter.Tk(), is_container=True, debug=debug)
+    def __init__(self, debug=False, headless=False):
+        # With headless=True no tk window is made, see HeadlessWidgets
+        if headless:
+            tkm = HeadlessWidgets
+        else:
+            tkm = TkWidgets
+        super().__init__("root", tkm.Tk(), is_container=True, debug=debug)
@@ -1,3 +1,9 @@
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+
 import numpy as np
 import pytest
 
@@ -20,6 +26,8 @@ def make_container(**overrides):
     c.last_used_rowspan = 1
     c.last_used_colspan = 1
     c.debug_this = None
+    c.occupancy = eztk.OccupancyGrid()
+    c.check_overlap = False
     for key, value in overrides.items():
         setattr(c, key, value)
     return c
@@ -328,6 +336,92 @@ class TestSequentialLayout:
         assert col2 == 2  # 0 + 2 = 2
 
 
+# ---------------------------------------------------------------------------
+# OccupancyGrid / NEXT_FREE tests
+# ---------------------------------------------------------------------------
+
+
+def place(c, row, col, colspan=1, rowspan=1):
+    row, col = c._position(row=row, col=col, colspan=colspan, rowspan=rowspan)
+    w = make_widget()
+    w.wname = "w{}_{}".format(row, col)
+    c._remember_position(w, row, col, colspan=colspan, rowspan=rowspan)
+    return w
+
+
+class TestOccupancy:
+    def test_cells_recorded(self):
+        c = make_container()
+        w = place(c, 1, 2, colspan=2, rowspan=2)
+        assert c.occupancy.occupant(2, 3) is w
+        assert c.occupancy.occupant(0, 0) is None
+        assert c.occupancy.overlapping(0, 0, rowspan=2, colspan=3) is w
+
+    def test_next_free_fills_holes(self):
+        c = make_container()
+        for col in range(3):
+            place(c, 0, col)
+        place(c, 1, 0)
+        place(c, 1, 2)
+        assert c._position(row=eztk.NEXT_FREE, col=eztk.SAME_COL) == (1, 1)
+        place(c, eztk.NEXT_FREE, eztk.NEXT_FREE)
+        assert c._position(row=eztk.SAME_ROW, col=eztk.NEXT_FREE) == (2, 0)
+
+    def test_release_frees_cells(self):
+        c = make_container()
+        first = place(c, 0, 0)
+        place(c, 0, 1)
+        assert c._position(row=eztk.NEXT_FREE, col=eztk.NEXT_FREE) == (1, 0)
+        c.occupancy.release(first)
+        assert c.occupancy.occupant(0, 0) is None
+        assert c._position(row=eztk.NEXT_FREE, col=eztk.NEXT_FREE) == (0, 0)
+
+    def test_next_free_fits_span(self):
+        c = make_container()
+        for col in (0, 2, 3):
+            place(c, 0, col)
+        place(c, 1, 0)
+        assert c._position(row=eztk.NEXT_FREE, col=eztk.NEXT_FREE) == (0, 1)
+        wide = place(c, eztk.NEXT_FREE, eztk.NEXT_FREE, colspan=2)
+        assert (wide.row, wide.col) == (1, 1)
+        tall = place(c, eztk.NEXT_FREE, eztk.NEXT_FREE, colspan=2, rowspan=2)
+        assert (tall.row, tall.col) == (2, 0)
+        # wider than the columns in use, so it gets a row of its own
+        assert c._position(row=eztk.NEXT_FREE, col=0, colspan=9) == (4, 0)
+
+    def test_overlap_check(self):
+        c = make_container(check_overlap=True)
+        place(c, 0, 0, colspan=2)
+        with pytest.raises(ValueError):
+            place(c, 0, 1)
+        overlay = place(c, eztk.OVERLAY_ROW, eztk.OVERLAY_COL)
+        assert (overlay.row, overlay.col) == (0, 0)
+        assert c.occupancy.occupant(0, 0) is not overlay
+        assert c._position(row=1, col=eztk.LEFT_COL, colspan=2) == (1, 0)
+        with pytest.raises(ValueError):
+            c._position(row=eztk.SAME_ROW, col=1, colspan=eztk.COL_SPAN_ALL)
+
+    def test_overlap_checked_before_widget_made(self):
+        app = eztk.EasyTk(headless=True)
+        app.check_overlap = True
+        app.add_button("a", None, row=0, col=1)
+        with pytest.raises(ValueError):
+            app.add_entry_field("b", row=0, col=0)  # its entry is at col 1
+        assert [child.wname for child in app.children] == ["a"]
+        assert len(app.tkw.children) == 1
+
+    def test_headless_destroy(self):
+        app = eztk.EasyTk(headless=True)
+        app.check_overlap = True
+        frame = app.add_frame()
+        assert frame.check_overlap
+        buttons = [frame.add_button(str(ix), None, col=ix, row=0) for ix in range(3)]
+        buttons[1].destroy()
+        refill = frame.add_button("x", None, row=eztk.NEXT_FREE)
+        assert (refill.row, refill.col) == (0, 1)
+        assert frame.occupancy.occupant(0, 1) is refill
+
+
 # ---------------------------------------------------------------------------
 # Notebook.tab_ix() tests
 # ---------------------------------------------------------------------------
@@ -428,3 +522,2018 @@ class TestMakeThumbnail:
         im = np.zeros((300, 300, 3), dtype=np.uint8)
         result = w.make_thumbnail(im, 150)
         assert result.shape == (150, 150, 3)
+
+
+# ---------------------------------------------------------------------------
+# VirtualTable tests
+# ---------------------------------------------------------------------------
+
+
+class FakeCanvas:
+    """Just enough of tkinter.Canvas for VirtualTable.refresh()."""
+
+    def __init__(self, top=0, height=100, left=0, width=1):
+        self.top = top
+        self.height = height
+        self.left = left
+        self.width = width
+        self.items = {}
+        self.item_coords = {}
+        self.item_state = {}
+        self.idle_callbacks = []
+        self.options = {}
+
+    def canvasx(self, x):
+        return self.left + x
+
+    def canvasy(self, y):
+        return self.top + y
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def create_image(self, x, y, **options):
+        item = len(self.items) + 1000
+        while item in self.items:
+            item += 1
+        self.items[item] = (x, y, options)
+        return item
+
+    def delete(self, item):
+        del self.items[item]
+
+    def coords(self, item, x, y):
+        self.item_coords[item] = (x, y)
+
+    def itemconfigure(self, item, state):
+        self.item_state[item] = state
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    def after_idle(self, callback, *args):
+        self.idle_callbacks.append(lambda: callback(*args))
+        return "idle#{}".format(len(self.idle_callbacks))
+
+    def after(self, ms, callback, *args):
+        return self.after_idle(callback, *args)
+
+    def after_cancel(self, after_id):
+        self.idle_callbacks = []
+
+    def run_idle(self):
+        callbacks = self.idle_callbacks
+        self.idle_callbacks = []
+        for callback in callbacks:
+            callback()
+
+
+class FakeLabel:
+    def __init__(self):
+        self.text = None
+        self.configure_count = 0
+
+    def configure(self, text):
+        self.text = text
+        self.configure_count += 1
+
+
+def make_virtual_table(row_count=1000, row_height=20, overscan=2, col_count=2):
+    """Create a VirtualTable with slots already built on a FakeCanvas."""
+    vt = object.__new__(eztk.VirtualTable)
+    vt.canvas = FakeCanvas()
+    vt.get_cell = lambda r, c: "{}:{}".format(r, c)
+    vt.col_count = col_count
+    vt.col_widths = [10] * col_count
+    vt.row_count = row_count
+    vt.row_height = row_height
+    vt.overscan = overscan
+    vt.visible_height = vt.canvas.height
+    vt.data = None
+    vt.row_width = 100
+    vt.pending_cells = {}
+    vt.flush_scheduled = False
+    vt.cells_touched = 0
+    vt.slot_frames = []
+    vt.slot_items = []
+    vt.slot_labels = []
+    vt.slot_rows = []
+    vt.slot_text = []
+    for slot in range(vt.pool_size()):
+        vt.slot_frames.append(None)
+        vt.slot_items.append(slot)
+        vt.slot_labels.append([FakeLabel() for _ in range(col_count)])
+        vt.slot_rows.append(None)
+        vt.slot_text.append([None] * col_count)
+    return vt
+
+
+class TestVirtualTableRange:
+    def test_top_of_table(self):
+        vt = make_virtual_table()
+        # 100px / 20px = rows 0-4 visible, one partial row, plus overscan 2
+        assert vt.visible_range(0) == (0, 8)
+
+    def test_scrolled_includes_overscan_above(self):
+        vt = make_virtual_table()
+        assert vt.visible_range(200) == (8, 18)
+
+    def test_clipped_to_row_count(self):
+        vt = make_virtual_table(row_count=12)
+        assert vt.visible_range(200) == (8, 12)
+
+    def test_pool_covers_any_range(self):
+        vt = make_virtual_table()
+        for top in range(0, 400, 7):
+            first, last = vt.visible_range(top)
+            assert last - first <= vt.pool_size()
+
+
+class TestVirtualTableRefresh:
+    def test_renders_visible_rows(self):
+        vt = make_virtual_table()
+        vt.refresh()
+        assert sorted(r for r in vt.slot_rows if r is not None) == list(range(8))
+        slot = 3 % vt.pool_size()
+        assert vt.slot_labels[slot][1].text == "3:1"
+        assert vt.canvas.item_coords[slot] == (0, 60)
+
+    def test_scrolling_recycles_slots(self):
+        vt = make_virtual_table()
+        vt.refresh()
+        vt.canvas.top = 10000
+        vt.refresh()
+        shown = sorted(r for r in vt.slot_rows if r is not None)
+        assert shown == list(range(498, 508))
+        assert len(vt.slot_labels) == vt.pool_size()
+
+    def test_small_scroll_only_renders_new_rows(self):
+        vt = make_virtual_table()
+        vt.refresh()
+        before = sum(l.configure_count for ls in vt.slot_labels for l in ls)
+        vt.canvas.top = 20  # one row down
+        vt.refresh()
+        after = sum(l.configure_count for ls in vt.slot_labels for l in ls)
+        assert after - before == vt.col_count
+
+
+# ---------------------------------------------------------------------------
+# TableData tests
+# ---------------------------------------------------------------------------
+
+
+class TestTableData:
+    def test_storage_order_has_no_index(self):
+        td = eztk.TableData([[3, 1, 2], ["c", "a", "b"]])
+        assert td.index is None
+        assert td.row_count() == 3
+        assert td.cell_text(0, 1) == "c"
+
+    def test_sort_list_column(self):
+        td = eztk.TableData([[3, 1, 2], ["c", "a", "b"]])
+        td.sort(0)
+        assert [td.value(r, 1) for r in range(3)] == ["a", "b", "c"]
+        td.sort(0, reverse=True)
+        assert [td.value(r, 1) for r in range(3)] == ["c", "b", "a"]
+
+    def test_sort_numpy_column(self):
+        td = eztk.TableData([np.array([3.0, 1.0, 2.0]), np.array([30, 10, 20])])
+        td.sort(0)
+        assert list(td.index) == [1, 2, 0]
+        assert td.value(0, 1) == 10
+
+    def test_reverse_sort_keeps_ties_in_order(self):
+        keys = [1, 2, 1, 2]
+        for column in (keys, np.array(keys)):
+            td = eztk.TableData([column])
+            td.sort(0, reverse=True)
+            assert list(td.index) == [1, 3, 0, 2]
+            td.filter(0, lambda v: v > 0)
+            assert list(td.index) == [1, 3, 0, 2]
+
+    def test_filter_numpy_column_uses_mask(self):
+        col = np.arange(10)
+        td = eztk.TableData([col])
+        td.filter(0, lambda c: c % 3 == 0)
+        assert td.row_count() == 4
+        assert [td.value(r, 0) for r in range(4)] == [0, 3, 6, 9]
+
+    def test_filter_then_sort(self):
+        td = eztk.TableData([[5, 2, 8, 1, 9], np.array([0.5, 0.2, 0.8, 0.1, 0.9])])
+        td.filter(0, lambda v: v > 1)
+        td.sort(1, reverse=True)
+        assert [td.value(r, 0) for r in range(td.row_count())] == [9, 8, 5, 2]
+
+    def test_clear_sort_and_filter(self):
+        td = eztk.TableData([[2, 1]])
+        td.sort(0)
+        td.filter(0, lambda v: v > 1)
+        td.sort(None)
+        td.filter(None, None)
+        assert td.index is None
+
+    def test_append_grows_numpy_buffer(self):
+        td = eztk.TableData([np.arange(3)])
+        for start in range(3, 3000, 100):
+            td.append_rows([[v] for v in range(start, start + 100)])
+            assert td.columns[0].base is td.buffers[0]
+        assert list(td.columns[0]) == list(range(3003))
+        assert len(td.buffers[0]) < 2 * 3003
+
+    def test_short_rows_padded_by_column_type(self):
+        td = eztk.TableData([["a"], np.array([1.5]), np.array([7])])
+        td.append_rows([["b"], []])
+        assert td.columns[0] == ["a", "b", ""]
+        assert np.isnan(td.columns[1][1:]).all()
+        assert list(td.columns[2]) == [7, 0, 0]
+
+    def test_append_while_sorted_and_filtered(self):
+        for column in ([5, 1, 3], np.array([5, 1, 3])):
+            td = eztk.TableData([column])
+            td.filter(0, lambda v: v > 1)
+            td.sort(0)
+            td.append_rows([[4], [0], [2]])
+            assert [td.value(r, 0) for r in range(td.row_count())] == [3, 5, 4, 2]
+            assert td.unsorted_rows == 2
+            td.resort()
+            assert [td.value(r, 0) for r in range(td.row_count())] == [2, 3, 4, 5]
+
+    def test_formats(self):
+        td = eztk.TableData([[1.23456], ["x"]], formats=["{:.2f}", None])
+        assert td.cell_text(0, 0) == "1.23"
+        assert td.cell_text(0, 1) == "x"
+
+
+class TestVirtualTableUpdateCells:
+    def test_only_changed_cells_are_configured(self):
+        vt = make_virtual_table(row_count=3)
+        vt.update_cells([[0, 0], [1, 1], [2, 2]])
+        vt.canvas.run_idle()
+        vt.refresh(force=True)
+        before = sum(l.configure_count for ls in vt.slot_labels for l in ls)
+        touched = vt.update_cells([[0, 0], [1, 99], [2, 2]])
+        assert touched == 1
+        vt.canvas.run_idle()
+        after = sum(l.configure_count for ls in vt.slot_labels for l in ls)
+        assert after - before == 1
+        assert vt.slot_labels[1][1].text == "99"
+
+    def test_updates_batched_into_one_idle_callback(self):
+        vt = make_virtual_table(row_count=2)
+        vt.refresh()
+        assert vt.update_cells(np.array([[1, 2], [3, 4]])) == 4
+        assert vt.update_cells(np.array([[1, 2], [3, 5]])) == 1
+        assert len(vt.canvas.idle_callbacks) == 1
+        vt.canvas.run_idle()
+        assert [l.text for l in vt.slot_labels[1]] == ["3", "5"]
+        assert vt.cells_touched == 5
+
+    def test_unchanged_snapshot_touches_nothing(self):
+        vt = make_virtual_table(row_count=2)
+        vt.refresh()
+        vt.update_cells([[1, 2], [3, 4]])
+        vt.canvas.run_idle()
+        assert vt.update_cells([[1, 2], [3, 4]]) == 0
+        assert vt.canvas.idle_callbacks == []
+
+    def test_narrower_snapshot_then_wider(self):
+        vt = make_virtual_table(row_count=1)
+        vt.refresh()
+        vt.update_cells([[1]])
+        vt.canvas.run_idle()
+        assert [l.text for l in vt.slot_labels[0]] == ["1", ""]
+        assert vt.col_count == 2
+        vt.update_cells([[1, 2, 3]])
+        vt.canvas.run_idle()
+        assert [l.text for l in vt.slot_labels[0]] == ["1", "2"]
+
+    def test_rejects_1d_array(self):
+        vt = make_virtual_table(row_count=1)
+        with pytest.raises(ValueError):
+            vt.update_cells(np.array([1, 2]))
+
+
+# ---------------------------------------------------------------------------
+# TableLoader tests
+# ---------------------------------------------------------------------------
+
+
+class TestTableLoader:
+    def test_loads_in_chunks(self):
+        vt = make_virtual_table(row_count=0)
+        progress = []
+        done = []
+        rows = ([r, r * 2] for r in range(25))
+        loader = eztk.TableLoader(
+            vt, rows, chunk_rows=10, on_progress=progress.append, on_done=done.append
+        )
+        loader.start()
+        assert vt.row_count == 0
+        vt.canvas.run_idle()
+        assert vt.row_count == 10
+        assert vt.canvas.options["scrollregion"] == (0, 0, 100, 200)
+        vt.canvas.run_idle()
+        vt.canvas.run_idle()
+        assert progress == [10, 20, 25]
+        assert done == [25]
+        assert not loader.is_loading
+        assert vt.data.value(24, 1) == 48
+
+    def test_csv_file_with_header(self, tmp_path):
+        path = tmp_path / "t.csv"
+        path.write_text("name,qty\na,1\nb,2\nc,3\n")
+        vt = make_virtual_table(row_count=0)
+        loader = eztk.TableLoader(vt, str(path), chunk_rows=2, header=True)
+        loader.start()
+        while vt.canvas.idle_callbacks:
+            vt.canvas.run_idle()
+        assert vt.data.names == ["name", "qty"]
+        assert [vt.data.value(r, 0) for r in range(3)] == ["a", "b", "c"]
+        assert loader.file is None
+
+    def test_header_only_file(self, tmp_path):
+        path = tmp_path / "t.csv"
+        path.write_text("name,qty\n")
+        vt = make_virtual_table(row_count=0)
+        done = []
+        loader = eztk.TableLoader(vt, str(path), header=True, on_done=done.append)
+        loader.start()
+        vt.canvas.run_idle()
+        assert vt.data.names == ["name", "qty"]
+        assert vt.data.col_count() == 2
+        assert done == [0]
+
+    def test_error_stops_loading(self, tmp_path):
+        def rows():
+            yield ["a"]
+            raise OSError("read failed")
+
+        vt = make_virtual_table(row_count=0)
+        loader = eztk.TableLoader(vt, rows())
+        loader.file = open(str(tmp_path / "t.csv"), "w")
+        file = loader.file
+        loader.start()
+        with pytest.raises(OSError):
+            vt.canvas.run_idle()
+        assert not loader.is_loading
+        assert file.closed
+
+    def test_columns_sized_from_header(self, monkeypatch):
+        monkeypatch.setattr(
+            eztk.VirtualTable, "_make_label", lambda self, f, s, c: FakeLabel()
+        )
+        monkeypatch.setattr(eztk.VirtualTable, "_measure_row", lambda self: None)
+        vt = make_virtual_table(row_count=0)
+        rows = [["a", "b", "c", "d"], ["1", "2", "3"]]
+        loader = eztk.TableLoader(vt, rows, header=True)
+        loader.start()
+        vt.canvas.run_idle()
+        assert vt.col_count == 4
+        assert vt.data.col_count() == 4
+        assert len(vt.slot_labels[0]) == len(vt.col_widths) == 4
+        assert [l.text for l in vt.slot_labels[0]] == ["1", "2", "3", ""]
+
+    def test_cancel(self):
+        vt = make_virtual_table(row_count=0)
+        cancelled = []
+        loader = eztk.TableLoader(
+            vt, ([r] for r in range(100)), chunk_rows=10, on_cancel=cancelled.append
+        )
+        loader.start()
+        vt.canvas.run_idle()
+        loader.cancel()
+        assert vt.canvas.idle_callbacks == []
+        assert cancelled == [10]
+        assert not loader.is_loading
+
+    def test_progress_false_cancels(self):
+        vt = make_virtual_table(row_count=0)
+        loader = eztk.TableLoader(
+            vt, ([r] for r in range(100)), chunk_rows=10, on_progress=lambda n: n < 20
+        )
+        loader.start()
+        for _ in range(5):
+            vt.canvas.run_idle()
+        assert loader.rows_loaded == 20
+        assert vt.row_count == 20
+
+
+# ---------------------------------------------------------------------------
+# Lazy import tests
+# ---------------------------------------------------------------------------
+
+
+class TestLazyImports:
+    def test_import_does_not_load_heavy_modules(self):
+        probe = (
+            "import sys; from eztk import eztk; "
+            "print([m for m in ('cv2', 'numpy', 'PIL', 'tkinter.filedialog', "
+            "'tkinter.scrolledtext') if m in sys.modules])"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", probe], check=True, capture_output=True, text=True
+        )
+        assert out.stdout.strip() == "[]"
+
+    def test_require_loads_image_libs(self):
+        eztk._require_image_libs("test")
+        assert eztk._HAS_IMAGE_LIBS is True
+        assert eztk.cv2 is not None
+        assert eztk.np is np
+
+
+# ---------------------------------------------------------------------------
+# ImageCache tests
+# ---------------------------------------------------------------------------
+
+
+class TestImageCache:
+    def _files(self, tmp_path, count):
+        paths = []
+        for ix in range(count):
+            path = tmp_path / "im{}.raw".format(ix)
+            path.write_bytes(b"x")
+            paths.append(str(path))
+        return paths
+
+    def _loader(self, fn):
+        self.loads += 1
+        return np.zeros((10, 10), dtype=np.uint8)  # 100 bytes
+
+    def test_hit_after_miss(self, tmp_path):
+        self.loads = 0
+        cache = eztk.ImageCache(max_bytes=1000)
+        (fn,) = self._files(tmp_path, 1)
+        first = cache.get(fn, self._loader)
+        assert cache.get(fn, self._loader) is first
+        assert self.loads == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_evicts_least_recently_used_by_bytes(self, tmp_path):
+        self.loads = 0
+        cache = eztk.ImageCache(max_bytes=250)
+        a, b, c = self._files(tmp_path, 3)
+        cache.get(a, self._loader)
+        cache.get(b, self._loader)
+        cache.get(a, self._loader)  # b is now least recently used
+        cache.get(c, self._loader)
+        assert cache.evictions == 1
+        assert cache.bytes == 200
+        cache.get(a, self._loader)
+        assert self.loads == 3
+        cache.get(b, self._loader)
+        assert self.loads == 4
+
+    def test_changed_file_is_reloaded(self, tmp_path):
+        self.loads = 0
+        cache = eztk.ImageCache()
+        (fn,) = self._files(tmp_path, 1)
+        cache.get(fn, self._loader)
+        with open(fn, "ab") as f:
+            f.write(b"more")
+        cache.get(fn, self._loader)
+        assert self.loads == 2
+
+    def test_missing_file(self, tmp_path):
+        cache = eztk.ImageCache()
+        assert cache.get(str(tmp_path / "nope.jpg"), self._loader) is None
+
+    def test_oversize_image_not_cached(self, tmp_path):
+        self.loads = 0
+        cache = eztk.ImageCache(max_bytes=50)
+        (fn,) = self._files(tmp_path, 1)
+        assert cache.get(fn, self._loader) is not None
+        assert cache.stats()["entries"] == 0
+
+
+# ---------------------------------------------------------------------------
+# update_image() preparation and update_image_async() tests
+# ---------------------------------------------------------------------------
+
+
+def make_image_widget(canvas_width=400):
+    """Create a TkWidgetDef with just the attributes used to prepare images."""
+    w = object.__new__(eztk.TkWidgetDef)
+    w.debug_this = None
+    w.canvas_width = canvas_width
+    w.image_request_id = 0
+    w.image_poll_id = None
+    w.thumbnail = None
+    w.thumbnails = []
+    w.thumbnails_id = None
+    w.tkm = eztk.TkWidgets
+    w.is_zoomable = False
+    w.zoom = 1.0
+    w.zoom_view = None
+    w.image_backend = None
+    w.image_fn = None
+    w.display_window = None
+    w.is_progressive = False
+    w.refine_id = None
+    w.is_coalescing = False
+    w.coalesce_id = None
+    w.coalesce_render = None
+    w.frames_dropped = 0
+    eztk._require_image_libs("test")
+    return w
+
+
+class TestPrepareImage:
+    def test_small_image_not_resized(self):
+        w = make_image_widget()
+        im = np.zeros((50, 100, 3), dtype=np.uint8)
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(None, im, None, None)
+        assert pil_im.size == (100, 50)
+        assert ratio is None
+
+    def test_bgr_converted_and_resized(self):
+        w = make_image_widget(canvas_width=100)
+        im = np.zeros((100, 400, 3), dtype=np.uint8)
+        im[:, :, 0] = 255  # blue in OpenCV BGR order
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(None, im, None, None)
+        assert rgb_im[0, 0].tolist() == [0, 0, 255]
+        assert pil_im.size == (100, 25)
+        assert ratio == 0.25
+
+    def test_unreadable_file(self, tmp_path):
+        w = make_image_widget()
+        fn = str(tmp_path / "missing.png")
+        assert w._prepare_image(None, None, fn, None) == (None, None, None, None)
+
+
+class TestPollImageFuture:
+    def _done_future(self, value):
+        future = concurrent.futures.Future()
+        future.set_result(value)
+        return future
+
+    def test_stale_result_dropped(self, monkeypatch):
+        shown = []
+        monkeypatch.setattr(
+            eztk.TkWidgetDef, "_show_image", lambda self, *a: shown.append(a)
+        )
+        w = make_image_widget()
+        w.image_request_id = 2
+        w._poll_image_future(self._done_future((1, 2, 3)), 1, shown.append, 10)
+        assert shown == []
+
+    def test_current_result_shown(self, monkeypatch):
+        shown = []
+        monkeypatch.setattr(
+            eztk.TkWidgetDef, "_show_image", lambda self, *a: shown.append(a) or True
+        )
+        done = []
+        w = make_image_widget()
+        w.image_request_id = 1
+        w._poll_image_future(self._done_future((1, 2, 3)), 1, done.append, 10)
+        assert shown == [(1, 2, 3)]
+        assert done == [True]
+
+    def test_worker_exception_reported(self, monkeypatch):
+        monkeypatch.setattr(eztk.TkWidgetDef, "_show_image", lambda self, *a: True)
+        future = concurrent.futures.Future()
+        future.set_exception(OSError("bad file"))
+        done = []
+        w = make_image_widget()
+        w.image_request_id = 1
+        w._poll_image_future(future, 1, done.append, 10)
+        assert done == [False]
+
+    def test_destroy_stops_polling(self, monkeypatch):
+        shown = []
+        monkeypatch.setattr(
+            eztk.TkWidgetDef, "_show_image", lambda self, *a: shown.append(a)
+        )
+        future = concurrent.futures.Future()
+
+        class FakeExecutor:
+            def submit(self, fn, *args):
+                return future
+
+        monkeypatch.setattr(eztk, "_get_image_executor", lambda: FakeExecutor())
+        w = make_image_widget()
+        w.tkw = FakeCanvas()
+        w.update_image_async(rgb_im=np.zeros((4, 4, 3), np.uint8))
+        assert w.image_poll_id is not None
+        for name in ("gallery", "parent", "thumbnail_of", "tkw_label", "tkd", "hbar"):
+            setattr(w, name, None)
+        w.vbar = None
+        w.build_id = None
+        w.children = []
+        w.tkw.destroy = lambda: None
+        w.destroy()
+        future.set_result((1, 2, 3))
+        w.tkw.run_idle()
+        assert shown == []
+
+
+class TestStreamingPaste:
+    def _photo(self, size):
+        from PIL import ImageTk
+
+        class FakePhoto(ImageTk.PhotoImage):
+            def __init__(self, size):
+                self.size = size
+                self.pasted = []
+
+            def __del__(self):
+                pass  # there is no tk image to delete
+
+            def width(self):
+                return self.size[0]
+
+            def height(self):
+                return self.size[1]
+
+            def paste(self, im):
+                self.pasted.append(im.size)
+
+        return FakePhoto(size)
+
+    def _widget(self, photo, streaming):
+        w = make_image_widget()
+        w.tkd = photo
+        w.is_streaming = streaming
+        w.thumbnail = None
+        return w
+
+    def test_same_size_frame_pasted(self, monkeypatch):
+        monkeypatch.setattr(eztk.TkWidgetDef, "_place_photo", lambda self: 1 / 0)
+        photo = self._photo((100, 50))
+        w = self._widget(photo, True)
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(
+            None, np.zeros((50, 100, 3), np.uint8), None, None
+        )
+        assert w._show_image(rgb_im, pil_im, ratio) is True
+        assert photo.pasted == [(100, 50)]
+        assert w.tkd is photo
+
+    def test_new_size_replaces_photo(self, monkeypatch):
+        placed = []
+        monkeypatch.setattr(
+            eztk.TkWidgetDef, "_place_photo", lambda self: placed.append(1) or True
+        )
+        photo = self._photo((100, 50))
+        w = self._widget(photo, True)
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(
+            None, np.zeros((60, 100, 3), np.uint8), None, None
+        )
+        w._show_image(rgb_im, pil_im, ratio)
+        assert photo.pasted == []
+        assert placed == [1]
+
+    def test_not_streaming_replaces_photo(self, monkeypatch):
+        placed = []
+        monkeypatch.setattr(
+            eztk.TkWidgetDef, "_place_photo", lambda self: placed.append(1) or True
+        )
+        photo = self._photo((100, 50))
+        w = self._widget(photo, False)
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(
+            None, np.zeros((50, 100, 3), np.uint8), None, None
+        )
+        w._show_image(rgb_im, pil_im, ratio)
+        assert placed == [1]
+
+
+class TestPhotoBackend:
+    def test_default_is_pillow_when_installed(self, monkeypatch):
+        eztk._require_image_libs("test")
+        assert eztk._photo_backend(None) == "pillow"
+        monkeypatch.setattr(eztk, "_HAS_PILLOW", False)
+        assert eztk._photo_backend(None) == "ppm"
+        assert eztk._photo_backend("pillow") == "pillow"
+        with pytest.raises(ValueError):
+            eztk._photo_backend("gif")
+
+    def test_pil_fn_requires_pillow(self, monkeypatch):
+        w = make_image_widget()
+        w.image_backend = "ppm"
+        monkeypatch.setattr(eztk, "_HAS_PILLOW", False)
+        with pytest.raises(ImportError):
+            w._prepare_image("x.png", None, None, None)
+
+    def test_ppm_display_image_is_numpy(self):
+        w = make_image_widget(canvas_width=100)
+        w.image_backend = "ppm"
+        im = np.zeros((100, 400, 3), dtype=np.uint8)
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(None, im, None, None)
+        assert isinstance(pil_im, np.ndarray)
+        assert pil_im.shape == (25, 100, 3)
+        assert eztk._image_size(pil_im) == (100, 25)
+        assert ratio == 0.25
+
+    def test_ppm_streaming_puts_frame(self, monkeypatch):
+        monkeypatch.setattr(eztk.TkWidgetDef, "_place_photo", lambda self: 1 / 0)
+
+        class FakePhoto(eztk.tkinter.PhotoImage):
+            def __init__(self):
+                pass
+
+            def __del__(self):
+                pass  # there is no tk image to delete
+
+            def width(self):
+                return 100
+
+            def height(self):
+                return 50
+
+            def __str__(self):
+                return "photo1"
+
+        w = make_image_widget()
+        w.image_backend = "ppm"
+        w.tkw = FakeTkWidget()
+        w.tkd = FakePhoto()
+        w.is_streaming = True
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(
+            None, np.zeros((50, 100, 3), np.uint8), None, None
+        )
+        assert w._show_image(rgb_im, pil_im, ratio) is True
+        ((name, op, data),) = w.tkw.tk.calls
+        assert (name, op) == ("photo1", "put")
+        assert data.startswith(b"P6 100 50 255\n")
+
+
+class TestShrinkBeforeConvert:
+    def test_rgb_im_is_display_size(self):
+        w = make_image_widget(canvas_width=200)
+        im = np.zeros((600, 800, 3), dtype=np.uint8)
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(None, im, None, None)
+        assert rgb_im.shape == (150, 200, 3)
+        assert pil_im.size == (200, 150)
+        assert ratio == 0.25
+
+    def test_rgb_im_is_full_size_when_zoomable(self):
+        w = make_image_widget(canvas_width=200)
+        w.is_zoomable = True
+        im = np.zeros((600, 800, 3), dtype=np.uint8)
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(None, im, None, None)
+        assert rgb_im.shape == (600, 800, 3)
+        assert pyramid.width == 800
+
+    def test_grayscale_source(self):
+        w = make_image_widget(canvas_width=50)
+        im = np.full((100, 100), 7, dtype=np.uint8)
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(None, im, None, None)
+        assert rgb_im.shape == (50, 50)  # not expanded to RGB
+        assert rgb_im[0, 0] == 7
+        assert pil_im.mode == "L"
+        assert ratio == 0.5
+
+
+class TestProgressive:
+    def _widget(self, monkeypatch, shown):
+        monkeypatch.setattr(
+            eztk.TkWidgetDef,
+            "_show_image",
+            lambda self, *a: shown.append(a[1][0, 0].tolist()) or True,
+        )
+        w = make_image_widget(canvas_width=2)
+        w.image_backend = "ppm"
+        w.is_progressive = True
+        w.tkw = FakeCanvas()
+        return w
+
+    def _image(self):
+        im = np.zeros((8, 8, 3), dtype=np.uint8)
+        im[::2, ::2] = 255  # nearest neighbour picks these, averaging doesn't
+        return im
+
+    def test_preview_then_refine(self, monkeypatch):
+        shown = []
+        w = self._widget(monkeypatch, shown)
+        assert w.update_image(rgb_im=self._image()) is True
+        assert shown == [[255, 255, 255]]
+        assert w.refine_id is not None
+        w.tkw.run_idle()
+        assert len(shown) == 2
+        assert shown[1] != [255, 255, 255]
+        assert w.refine_id is None
+
+    def test_new_update_cancels_refine(self, monkeypatch):
+        shown = []
+        w = self._widget(monkeypatch, shown)
+        w.update_image(rgb_im=self._image())
+        w.update_image(rgb_im=self._image())
+        w.tkw.run_idle()
+        assert len(shown) == 3  # two previews, one refinement
+
+    def test_no_refine_without_resize(self, monkeypatch):
+        shown = []
+        w = self._widget(monkeypatch, shown)
+        w.canvas_width = 100
+        w.update_image(rgb_im=self._image())
+        assert w.refine_id is None
+
+    def test_lanczos_large_reduction(self):
+        w = make_image_widget(canvas_width=10)
+        im = np.full((100, 100), 9, dtype=np.uint8)
+        small, ratio = w._shrink_to_canvas(im, eztk.cv2.INTER_LANCZOS4)
+        assert small.shape == (10, 10)
+        assert ratio == 0.1
+        assert small[5, 5] == 9
+
+
+class TestCoalesce:
+    def _widget(self, monkeypatch, rendered):
+        monkeypatch.setattr(
+            eztk.TkWidgetDef,
+            "_render_image",
+            lambda self, *a: rendered.append(a[3]) or True,
+        )
+        w = make_image_widget()
+        w.is_coalescing = True
+        w.tkw = FakeCanvas()
+        return w
+
+    def test_one_render_per_idle(self, monkeypatch):
+        rendered = []
+        w = self._widget(monkeypatch, rendered)
+        for frame in ("a", "b", "c"):
+            assert w.update_image(rgb_im=frame) is True
+        assert rendered == []
+        w.tkw.run_idle()
+        assert rendered == ["c"]
+        assert w.frames_dropped == 2
+        w.update_image(rgb_im="d")
+        w.tkw.run_idle()
+        assert rendered == ["c", "d"]
+        assert w.frames_dropped == 2
+
+    def test_thumbnail_update_deferred(self, monkeypatch):
+        updates = []
+        thumb = make_image_widget()
+        thumb.tkw = FakeCanvas()
+        monkeypatch.setattr(
+            eztk.TkWidgetDef,
+            "update_image",
+            lambda self, rgb_im: updates.append(rgb_im.shape) or True,
+        )
+        monkeypatch.setattr(eztk.TkWidgetDef, "_show_photo", lambda self: True)
+        w = make_image_widget()
+        w.tkw = FakeCanvas()
+        w.is_coalescing = True
+        w.thumbnails = [(thumb, 10)]
+        for count in range(3):
+            im = np.zeros((40, 40, 3), np.uint8)
+            w._show_image(im, im, None)
+        assert updates == []
+        w.tkw.run_idle()
+        assert updates == [(10, 10, 3)]
+        assert w.thumbnails_id is None
+
+    def test_destroy_cancels_thumbnail_update(self, monkeypatch):
+        w = make_image_widget()
+        w.tkw = FakeCanvas()
+        w.is_coalescing = True
+        w.thumbnails = [(make_image_widget(), 10)]
+        monkeypatch.setattr(eztk.TkWidgetDef, "_show_photo", lambda self: True)
+        im = np.zeros((40, 40, 3), np.uint8)
+        w._show_image(im, im, None)
+        assert len(w.tkw.idle_callbacks) == 1
+        for name in ("gallery", "parent", "thumbnail_of", "tkw_label", "tkd", "hbar"):
+            setattr(w, name, None)
+        w.vbar = None
+        w.build_id = None
+        w.children = []
+        w.tkw.destroy = lambda: None
+        w.destroy()
+        assert w.tkw.idle_callbacks == []
+
+
+class TestThumbnails:
+    def test_nearest_level(self):
+        levels = [np.zeros((1, w), np.uint8) for w in (800, 200, 50)]
+        assert eztk._nearest_level(levels, 100).shape[1] == 200
+        assert eztk._nearest_level(levels, 200).shape[1] == 200
+        assert eztk._nearest_level(levels, 1000).shape[1] == 800
+        assert eztk._nearest_level([], 100) is None
+
+    def test_levels_include_display_image_and_pyramid(self):
+        w = make_image_widget()
+        w.rgb_im = np.zeros((600, 800, 3), np.uint8)
+        w.pil_im = eztk.Image.new("RGB", (400, 300))
+        w.pyramid = eztk.ImagePyramid(w.rgb_im)
+        widths = sorted(im.shape[1] for im in w._thumbnail_levels())
+        assert widths[-2:] == [400, 800]
+        assert widths[0] < 400
+
+    def test_thumbnails_made_in_one_pass(self, monkeypatch):
+        updates = []
+        made_from = []
+        monkeypatch.setattr(
+            eztk.TkWidgetDef,
+            "update_image",
+            lambda self, rgb_im: updates.append((self, rgb_im.shape[1])) or True,
+        )
+        make_thumbnail = eztk.TkWidgetDef.make_thumbnail
+        monkeypatch.setattr(
+            eztk.TkWidgetDef,
+            "make_thumbnail",
+            lambda self, im, width, fn: made_from.append(im.shape[1])
+            or make_thumbnail(self, im, width, fn),
+        )
+        w = make_image_widget()
+        w.rgb_im = np.zeros((150, 200, 3), np.uint8)
+        w.pil_im = w.rgb_im
+        w.pyramid = None
+        small, large = make_image_widget(), make_image_widget()
+        w.thumbnails = [(small, 20), (large, 100)]
+        assert w._update_thumbnails() is True
+        assert updates == [(large, 100), (small, 20)]
+        assert made_from == [200, 100]  # the small one from the large one
+
+    def test_link_and_unlink(self, monkeypatch):
+        monkeypatch.setattr(eztk.TkWidgetDef, "update_image", lambda self, rgb_im: True)
+        w = make_image_widget()
+        w.rgb_im = np.zeros((150, 200, 3), np.uint8)
+        w.pil_im = None
+        w.pyramid = None
+        w.thumbnail_width = 0
+        a, b = make_image_widget(), make_image_widget()
+        w._link_thumbnail(a, 50)
+        w._link_thumbnail(b, 30)
+        assert (w.thumbnail, w.thumbnail_width) == (a, 50)
+        assert b.thumbnail_of is w
+        w._unlink_thumbnail(a)
+        assert (w.thumbnail, w.thumbnail_width) == (b, 30)
+        assert w.thumbnails == [(b, 30)]
+
+    def test_link_before_image_shown(self, monkeypatch):
+        updates = []
+        monkeypatch.setattr(
+            eztk.TkWidgetDef, "update_image", lambda self, rgb_im: updates.append(1)
+        )
+        w = make_image_widget()
+        w.rgb_im = None
+        w.pil_im = None
+        w.pyramid = None
+        assert w._link_thumbnail(make_image_widget(), 50) is True
+        assert updates == []
+
+
+class TestHighBitDepth:
+    def test_uint16_full_range(self):
+        eztk._require_image_libs("test")
+        im = np.array([[0, 32768, 65535]], dtype=np.uint16)
+        assert eztk._to_uint8(im).tolist() == [[0, 127, 255]]
+
+    def test_uint16_window_uses_cached_lut(self):
+        eztk._require_image_libs("test")
+        im = np.array([[0, 100, 1100, 5000]], dtype=np.uint16)
+        assert eztk._to_uint8(im, (100, 1100)).tolist() == [[0, 0, 255, 255]]
+        assert eztk._window_lut(100, 1100) is eztk._window_lut(100, 1100)
+
+    def test_float_and_auto(self):
+        eztk._require_image_libs("test")
+        im = np.array([[-1.0, 0.5, 2.0]], dtype=np.float32)
+        assert eztk._to_uint8(im).tolist() == [[0, 127, 255]]
+        im = np.array([[10.0, 20.0]], dtype=np.float32)
+        assert eztk._to_uint8(im, "auto").tolist() == [[0, 255]]
+
+    def test_uint8_unchanged(self):
+        eztk._require_image_libs("test")
+        im = np.zeros((2, 2), dtype=np.uint8)
+        assert eztk._to_uint8(im, (0, 10)) is im
+
+    def test_uint16_frame_displayed(self):
+        w = make_image_widget(canvas_width=50)
+        w.display_window = (0, 4095)  # 12 bit camera
+        im = np.full((100, 100), 4095, dtype=np.uint16)
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(None, im, None, None)
+        assert rgb_im.dtype == np.uint8
+        assert rgb_im.shape == (50, 50)
+        assert rgb_im[0, 0] == 255
+
+
+# ---------------------------------------------------------------------------
+# TiledImage tests
+# ---------------------------------------------------------------------------
+
+
+def make_tiled_image(monkeypatch, source, view=(200, 100), tile_size=64):
+    monkeypatch.setattr(eztk.TiledImage, "_make_photo", lambda self, im: im.shape)
+    eztk._require_image_libs("test")
+    canvas = FakeCanvas(width=view[0], height=view[1])
+    return eztk.TiledImage(canvas, source, tile_size=tile_size)
+
+
+class TestTiledImage:
+    def test_tile_range_clipped_to_image(self, monkeypatch):
+        ti = make_tiled_image(monkeypatch, np.zeros((300, 1000), np.uint8))
+        ti.view_width, ti.view_height = 200, 100
+        # 300 / 64 -> 5 tile rows, 1000 / 64 -> 16 tile cols
+        assert ti.tile_range(0, 0, 0) == (0, 0, 4, 2)
+        assert ti.tile_range(0, 0, 1) == (0, 0, 5, 3)
+        assert ti.tile_range(900, 250, 1) == (13, 2, 16, 5)
+
+    def test_only_visible_tiles_made(self, monkeypatch):
+        ti = make_tiled_image(monkeypatch, np.zeros((5000, 5000, 3), np.uint8))
+        ti.margin = 0
+        ti.refresh()
+        assert sorted(ti.tiles) == [(c, r) for c in range(4) for r in range(2)]
+        assert ti.tiles[(0, 0)][0] == (64, 64, 3)
+
+    def test_edge_tiles_are_partial(self, monkeypatch):
+        ti = make_tiled_image(monkeypatch, np.zeros((100, 100), np.uint8))
+        ti.refresh()
+        assert ti.tiles[(1, 1)][0] == (36, 36)
+
+    def test_far_tiles_evicted(self, monkeypatch):
+        ti = make_tiled_image(monkeypatch, np.zeros((5000, 5000), np.uint8))
+        ti.refresh()
+        ti.canvas.left = 3000
+        ti.canvas.top = 3000
+        ti.refresh()
+        assert all(c >= 46 - ti.keep and r >= 46 - ti.keep for c, r in ti.tiles)
+        assert len(ti.canvas.items) == len(ti.tiles)
+
+    def test_memory_mapped_source(self, monkeypatch, tmp_path):
+        fn = str(tmp_path / "big.npy")
+        np.save(fn, np.arange(256 * 256, dtype=np.uint16).reshape(256, 256) % 251)
+        source = eztk.open_image_source(fn)
+        assert isinstance(source, np.memmap)
+        ti = make_tiled_image(monkeypatch, source)
+        ti.refresh()
+        assert (0, 0) in ti.tiles
+
+    def test_uint16_tiles_mapped_to_uint8(self, monkeypatch):
+        tiles = []
+        source = np.full((100, 100), 1000, np.uint16)
+        source[0, 0] = 3000
+        ti = make_tiled_image(monkeypatch, source)
+        ti._make_photo = lambda im: tiles.append(im) or im.shape
+        ti.display_window = (1000, 2000)
+        ti.refresh()
+        assert all(im.dtype == np.uint8 for im in tiles)
+        assert (tiles[0][0, 0], tiles[0][0, 1]) == (255, 0)
+        auto = eztk.TiledImage(ti.canvas, source, display_window="auto")
+        assert auto.display_window == (1000.0, 3000.0)
+
+
+# ---------------------------------------------------------------------------
+# ImagePyramid tests
+# ---------------------------------------------------------------------------
+
+
+class TestImagePyramid:
+    def _pyramid(self, width=1024, height=512):
+        eztk._require_image_libs("test")
+        im = np.zeros((height, width, 3), dtype=np.uint8)
+        return eztk.ImagePyramid(im)
+
+    def test_levels_halve(self):
+        p = self._pyramid()
+        assert [l.shape[:2] for l in p.levels] == [
+            (512, 1024),
+            (256, 512),
+            (128, 256),
+            (64, 128),
+        ]
+        assert p.scales == [1.0, 0.5, 0.25, 0.125]
+
+    def test_level_for_zoom(self):
+        p = self._pyramid()
+        assert p.level_for(2.0) == 0
+        assert p.level_for(1.0) == 0
+        assert p.level_for(0.6) == 0
+        assert p.level_for(0.5) == 1
+        assert p.level_for(0.3) == 1
+        assert p.level_for(0.01) == 3
+
+    def test_view_crops_window(self):
+        p = self._pyramid()
+        im, x, y = p.view(0.5, 100, 50, 200, 100)
+        assert im.shape == (100, 200, 3)
+        assert (x, y) == (100, 50)
+
+    def test_view_clipped_at_image_edge(self):
+        p = self._pyramid()
+        # image is 512 x 256 at zoom 0.5
+        im, x, y = p.view(0.5, 400, 200, 200, 100)
+        assert im.shape == (56, 112, 3)
+        assert (x, y) == (400, 200)
+
+    def test_view_magnified(self):
+        p = self._pyramid()
+        im, x, y = p.view(4.0, 400, 400, 100, 100)
+        assert im.shape == (100, 100, 3)
+        assert (x, y) == (400, 400)
+
+    def test_view_outside_image(self):
+        p = self._pyramid()
+        assert p.view(1.0, 5000, 0, 100, 100) == (None, 0, 0)
+
+    def test_zoomable_prepare_builds_pyramid(self):
+        w = make_image_widget(canvas_width=100)
+        w.is_zoomable = True
+        im = np.zeros((300, 400, 3), dtype=np.uint8)
+        rgb_im, pil_im, ratio, pyramid = w._prepare_image(None, im, None, None)
+        assert pil_im is None
+        assert rgb_im.shape == (300, 400, 3)
+        assert pyramid.levels[0] is rgb_im
+
+
+class ZoomCanvas(FakeCanvas):
+    def __init__(self):
+        FakeCanvas.__init__(self, width=100)
+
+    def config(self, **options):
+        self.options.update(options)
+
+    def xview_moveto(self, fraction):
+        self.left = fraction * self.options["scrollregion"][2]
+
+    def yview_moveto(self, fraction):
+        self.top = fraction * self.options["scrollregion"][3]
+
+    def itemconfig(self, item, **options):
+        pass
+
+
+class FakeScrollbar:
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+class TestZoomTo:
+    def make(self, monkeypatch):
+        w = make_image_widget(canvas_width=100)
+        w.canvas_height = 100
+        w.tkw = ZoomCanvas()
+        w.scrollable_image = None
+        w.pyramid = eztk.ImagePyramid(np.zeros((256, 256, 3), np.uint8))
+        renders = []
+        monkeypatch.setattr(
+            eztk, "_photo_image", lambda im, backend, master: renders.append(im)
+        )
+        return w, renders
+
+    def test_clamped(self, monkeypatch):
+        w, renders = self.make(monkeypatch)
+        w.zoom_to(0)
+        assert w.zoom == eztk.ZOOM_LIMITS[0]
+        w.zoom_to(1e9)
+        assert w.zoom == eztk.ZOOM_LIMITS[1]
+
+    def test_scroll_callback_after_zoom_doesnt_render_again(self, monkeypatch):
+        w, renders = self.make(monkeypatch)
+        w.hbar = w.vbar = FakeScrollbar()
+        w.zoom_to(2.0)
+        assert len(renders) == 1
+        w._on_zoom_xscroll(0.0, 0.2)
+        w._on_zoom_yscroll(0.0, 0.2)
+        assert len(renders) == 1
+        w.tkw.left += 10
+        w._on_zoom_xscroll(0.1, 0.3)
+        assert len(renders) == 2
+
+
+class TestImageXY:
+    class Event:
+        x = 30
+        y = 40
+
+    def test_unscaled(self):
+        w = make_image_widget()
+        w.tkw = None
+        w.pil_resize_ratio = None
+        assert w.image_xy(self.Event()) == (30, 40)
+
+    def test_scaled(self):
+        w = make_image_widget()
+        w.tkw = None
+        w.pil_resize_ratio = 0.5
+        assert w.image_xy(self.Event()) == (60, 80)
+
+
+# ---------------------------------------------------------------------------
+# update_image_regions() tests
+# ---------------------------------------------------------------------------
+
+
+class FakeTk:
+    def __init__(self):
+        self.calls = []
+
+    def call(self, *args):
+        self.calls.append(args)
+
+
+class FakeTkWidget:
+    def __init__(self):
+        self.tk = FakeTk()
+
+
+class TestUpdateImageRegions:
+    def _widget(self, monkeypatch, photo_size, ratio=None, canvas_width=400):
+        from PIL import ImageTk
+
+        class FakePhoto(ImageTk.PhotoImage):
+            def __init__(self):
+                pass
+
+            def width(self):
+                return photo_size[0]
+
+            def height(self):
+                return photo_size[1]
+
+            def __str__(self):
+                return "photo1"
+
+        w = make_image_widget(canvas_width=canvas_width)
+        w.tkw = FakeTkWidget()
+        w.tkd = FakePhoto()
+        w.pil_resize_ratio = ratio
+        w.pyramid = None
+        w.tiled_image = None
+        return w
+
+    def test_ppm_data(self):
+        im = np.arange(12, dtype=np.uint8).reshape(2, 2, 3)
+        assert eztk._ppm_data(im) == b"P6 2 2 255\n" + im.tobytes()
+        gray = np.zeros((3, 4), dtype=np.uint8)
+        assert eztk._ppm_data(gray).startswith(b"P5 4 3 255\n")
+
+    def test_only_rects_are_put(self, monkeypatch):
+        w = self._widget(monkeypatch, (100, 50))
+        im = np.zeros((50, 100, 3), dtype=np.uint8)
+        im[10:20, 30:40] = (255, 0, 0)  # blue in BGR
+        assert w.update_image_regions([(30, 10, 10, 10)], source_im=im) is True
+        ((name, op, data, to, x, y),) = w.tkw.tk.calls
+        assert (name, op, to, x, y) == ("photo1", "put", "-to", 30, 10)
+        assert data[:12] == b"P6 10 10 255"
+        assert data[-3:] == b"\x00\x00\xff"  # converted to RGB
+
+    def test_rects_scaled_to_display(self, monkeypatch):
+        w = self._widget(monkeypatch, (100, 50), ratio=0.25, canvas_width=100)
+        rects = w._display_rects([(40, 40, 20, 20), (2000, 0, 10, 10)], 400, 200)
+        assert rects == [(40, 40, 60, 60, 10, 10, 15, 15)]
+
+    def test_size_change_falls_back_to_update_image(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(
+            eztk.TkWidgetDef,
+            "update_image",
+            lambda self, **kw: calls.append(kw["source_im"].shape) or True,
+        )
+        w = self._widget(monkeypatch, (100, 50))
+        im = np.zeros((60, 100, 3), dtype=np.uint8)
+        w.update_image_regions([(0, 0, 5, 5)], source_im=im)
+        assert calls == [(60, 100, 3)]
+        assert w.tkw.tk.calls == []
+
+    def test_pending_coalesced_frame_replaced(self, monkeypatch):
+        w = self._widget(monkeypatch, (100, 50))
+        w.tkw.after_idle = lambda callback: "idle#1"
+        w.is_coalescing = True
+        old = np.zeros((50, 100, 3), dtype=np.uint8)
+        new = np.ones((50, 100, 3), dtype=np.uint8)
+        w.update_image(source_im=old)
+        assert w.update_image_regions([(0, 0, 5, 5)], source_im=new) is True
+        assert w.coalesce_render[1][1] is new  # rendered when idle, not old
+        assert w.frames_dropped == 1
+        assert w.tkw.tk.calls == []
+
+
+# ---------------------------------------------------------------------------
+# CanvasOverlay tests
+# ---------------------------------------------------------------------------
+
+
+class FakeOverlayCanvas:
+    def __init__(self):
+        self.calls = []
+        self.next_item = 1
+
+    def _create(self, kind, coords, options):
+        item = self.next_item
+        self.next_item += 1
+        self.calls.append(("create", kind, item))
+        return item
+
+    def create_rectangle(self, *coords, **options):
+        return self._create("rectangle", coords, options)
+
+    def create_line(self, *coords, **options):
+        return self._create("line", coords, options)
+
+    def create_text(self, *coords, **options):
+        return self._create("text", coords, options)
+
+    def coords(self, item, *coords):
+        self.calls.append(("coords", item, coords))
+
+    def itemconfigure(self, item, **options):
+        self.calls.append(("itemconfigure", item, options))
+
+    def delete(self, item):
+        self.calls.append(("delete", item))
+
+    def tag_raise(self, tag):
+        pass
+
+
+def make_overlay(ratio=None):
+    frame = object.__new__(eztk.TkWidgetDef)
+    frame.tkw = FakeOverlayCanvas()
+    frame.pil_resize_ratio = ratio
+    return eztk.CanvasOverlay(frame)
+
+
+class TestCanvasOverlay:
+    def test_items_reused_between_frames(self):
+        ov = make_overlay()
+        ov.begin()
+        first = [ov.rectangle(0, 0, 10, 10), ov.rectangle(5, 5, 20, 20)]
+        ov.end()
+        ov.begin()
+        second = [ov.rectangle(1, 1, 11, 11), ov.rectangle(5, 5, 20, 20)]
+        ov.end()
+        assert first == second
+        creates = [c for c in ov.canvas.calls if c[0] == "create"]
+        assert len(creates) == 2
+
+    def test_only_changes_sent(self):
+        ov = make_overlay()
+        ov.begin()
+        item = ov.rectangle(0, 0, 10, 10, outline="green")
+        ov.end()
+        ov.canvas.calls = []
+        ov.begin()
+        ov.rectangle(0, 0, 10, 10, outline="green")
+        ov.end()
+        assert ov.canvas.calls == []
+        ov.begin()
+        ov.rectangle(0, 0, 10, 10, outline="blue")
+        ov.end()
+        assert ov.canvas.calls == [("itemconfigure", item, {"outline": "blue"})]
+
+    def test_dropped_option_remakes_item(self):
+        ov = make_overlay()
+        ov.begin()
+        item = ov.rectangle(0, 0, 10, 10, dash=(2, 2))
+        ov.end()
+        ov.canvas.calls = []
+        ov.begin()
+        remade = ov.rectangle(0, 0, 10, 10)
+        ov.end()
+        assert ov.canvas.calls[:2] == [("delete", item), ("create", "rectangle", 2)]
+        assert ov.pools["rectangle"] == [remade]
+        assert item not in ov.item_options
+
+    def test_unused_items_hidden_then_shown(self):
+        ov = make_overlay()
+        ov.begin()
+        ov.text(0, 0, "a")
+        item = ov.text(0, 10, "b")
+        ov.end()
+        ov.begin()
+        ov.text(0, 0, "a")
+        ov.end()
+        assert ("itemconfigure", item, {"state": "hidden"}) in ov.canvas.calls
+        ov.canvas.calls = []
+        ov.begin()
+        ov.text(0, 0, "a")
+        ov.text(0, 10, "b")
+        ov.end()
+        assert ov.canvas.calls == [("itemconfigure", item, {"state": "normal"})]
+
+    def test_coords_scaled_to_display(self):
+        ov = make_overlay(ratio=0.5)
+        ov.begin()
+        item = ov.polyline([(0, 0), (10, 20), (40, 40)])
+        ov.end()
+        assert ov.item_coords[item] == [0, 0, 5, 10, 20, 20]
+
+
+# ---------------------------------------------------------------------------
+# ThumbnailStore tests
+# ---------------------------------------------------------------------------
+
+
+class TestThumbnailStore:
+    def _source(self, tmp_path, name="a.png", shape=(200, 300, 3)):
+        fn = str(tmp_path / name)
+        eztk.cv2.imwrite(fn, np.full(shape, 50, np.uint8))
+        return fn
+
+    def test_round_trip_and_key(self, tmp_path):
+        store = eztk.ThumbnailStore(str(tmp_path / "store"))
+        fn = self._source(tmp_path)
+        im = np.arange(60, dtype=np.uint8).reshape(4, 5, 3)
+        assert store.get(fn, 5) is None
+        store.put(fn, 5, im)
+        assert store.get(fn, 5).tolist() == im.tolist()
+        assert store.get(fn, 6) is None  # another width
+        assert store.path(fn, 5) != store.path(fn, 5, 5)
+        self._source(tmp_path, shape=(20, 30, 3))  # the source changed
+        assert store.get(fn, 5) is None
+        assert store.hits == 1
+
+    def test_least_recently_used_pruned(self, tmp_path):
+        store = eztk.ThumbnailStore(str(tmp_path / "store"), max_bytes=0)
+        fns = [self._source(tmp_path, "{}.png".format(ix)) for ix in range(3)]
+        rng = np.random.default_rng(0)
+        im = rng.integers(0, 256, (20, 20, 3), dtype=np.uint8)
+        store.max_bytes = 10**9
+        for fn in fns:
+            store.put(fn, 20, im)
+        size = store.bytes // 3
+        os.utime(store.path(fns[0], 20), (1, 1))
+        os.utime(store.path(fns[1], 20), (2, 2))
+        store.max_bytes = size * 2
+        store.prune()
+        assert not os.path.exists(store.path(fns[0], 20))
+        assert os.path.exists(store.path(fns[1], 20))
+        assert store.evictions == 1
+
+    def test_make_thumbnail_uses_store(self, tmp_path, monkeypatch):
+        store = eztk.ThumbnailStore(str(tmp_path / "store"))
+        monkeypatch.setattr(eztk, "thumbnail_store", store)
+        fn = self._source(tmp_path)
+        w = make_image_widget()
+        t = w.make_thumbnail(None, 30, fn=fn)  # read from the file
+        assert t.shape == (20, 30, 3)
+        assert store.misses == 1
+        assert w.make_thumbnail(None, 30, fn=fn).tolist() == t.tolist()
+        assert store.hits == 1
+
+    def test_small_images_resized_directly(self, tmp_path, monkeypatch):
+        store = eztk.ThumbnailStore(str(tmp_path / "store"))
+        monkeypatch.setattr(eztk, "thumbnail_store", store)
+        fn = self._source(tmp_path)
+        w = make_image_widget()
+        im = np.zeros((200, 300, 3), np.uint8)
+        assert w.make_thumbnail(im, 30, fn=fn).shape == (20, 30, 3)
+        assert (store.hits, store.misses, store.bytes) == (0, 0, None)
+        store.min_pixels = 0
+        w.make_thumbnail(im, 30, fn=fn)
+        assert store.misses == 1
+
+    def test_stale_temporary_files_pruned(self, tmp_path):
+        store = eztk.ThumbnailStore(str(tmp_path / "store"))
+        stale = os.path.join(store.directory, "a.png.1.tmp")
+        fresh = os.path.join(store.directory, "b.png.2.tmp")
+        for path in (stale, fresh):
+            with open(path, "wb") as f:
+                f.write(b"x")
+        os.utime(stale, (1, 1))
+        store.prune()
+        assert not os.path.exists(stale)
+        assert os.path.exists(fresh)
+
+
+# ---------------------------------------------------------------------------
+# batch() tests
+# ---------------------------------------------------------------------------
+
+
+class FakeGridWidget:
+    def __init__(self, path, interp):
+        self.path = path
+        self.tk = interp
+        self.grid_calls = []
+        self.propagate = []  # flags set with grid_propagate()
+        self.propagating = True
+
+    def __str__(self):
+        return self.path
+
+    def grid(self, **options):
+        self.grid_calls.append(options)
+
+    def grid_propagate(self, flag=None):
+        if flag is None:
+            return self.propagating
+        self.propagate.append(flag)
+        self.propagating = flag
+
+
+def make_batch_container():
+    """A container whose tk is a Tcl interpreter recording grid commands."""
+    import tkinter
+
+    interp = tkinter.Tcl()
+    interp.eval("proc grid args {lappend ::calls $args}")
+    interp.eval("set ::destroyed {}")
+    interp.eval("proc winfo {cmd path} {expr {$path ni $::destroyed}}")
+    c = make_container()
+    c.tkw = FakeGridWidget(".c", interp)
+    c.children = []
+    c.grid_batch = None
+    c.tkm = eztk.TkWidgets
+    return c
+
+
+class TestBatch:
+    def test_grid_immediate_outside_batch(self):
+        c = make_batch_container()
+        w = FakeGridWidget(".c.w", c.tkw.tk)
+        c._grid(w, row=1, column=2)
+        assert w.grid_calls == [{"row": 1, "column": 2}]
+
+    def test_grid_queued_and_flushed_as_one_script(self):
+        c = make_batch_container()
+        a = FakeGridWidget(".c.a", c.tkw.tk)
+        b = FakeGridWidget(".c.b", c.tkw.tk)
+        with c.batch():
+            c._grid(a, column=0, row=0, sticky="w")
+            c._grid(b, column=1, row=0, sticky=("w", "e"))
+            assert c.tkw.tk.eval("info exists ::calls") == "0"
+            assert c.tkw.propagate == [False]
+        assert a.grid_calls == []
+        calls = c.tkw.tk.eval("set ::calls")
+        assert c.tkw.tk.splitlist(calls) == (
+            "configure .c.a -column 0 -row 0 -sticky w",
+            "configure .c.b -column 1 -row 0 -sticky {w e}",
+        )
+        assert c.tkw.propagate == [False, True]
+        assert c.grid_batch is None
+
+    def test_previous_propagation_restored(self):
+        c = make_batch_container()
+        c.tkw.propagating = False
+        with c.batch():
+            pass
+        assert c.tkw.propagate == [False, False]
+
+    def test_destroyed_widget_skipped(self):
+        c = make_batch_container()
+        a = FakeGridWidget(".c.a", c.tkw.tk)
+        b = FakeGridWidget(".c.b", c.tkw.tk)
+        with c.batch():
+            c._grid(a, row=0, column=0)
+            c._grid(b, row=1, column=0)
+            c.tkw.tk.eval("lappend ::destroyed .c.a")
+        calls = c.tkw.tk.splitlist(c.tkw.tk.eval("set ::calls"))
+        assert calls == ("configure .c.b -row 1 -column 0",)
+
+    def test_values_quoted(self):
+        c = make_batch_container()
+        a = FakeGridWidget(".c.a", c.tkw.tk)
+        odd = 'x {y} [z] $w "q" \\'
+        with c.batch():
+            c._grid(a, row=0, column=0, sticky=(odd, ""), padx=odd)
+        (call,) = c.tkw.tk.splitlist(c.tkw.tk.eval("set ::calls"))
+        words = c.tkw.tk.splitlist(call)
+        assert c.tkw.tk.splitlist(words[7]) == (odd, "")
+        assert words[9] == odd
+
+    def test_child_containers_join_batch(self):
+        c = make_batch_container()
+        child = make_batch_container()
+        child.tkw = FakeGridWidget(".c.f", c.tkw.tk)
+        leaf = FakeGridWidget(".c.f.x", c.tkw.tk)
+        with c.batch():
+            c.append_child(child)
+            child._grid(leaf, row=0, column=0)
+            with child.batch():  # nested batches flush with the outer one
+                pass
+            assert child.tkw.propagate == []
+        assert leaf.grid_calls == []
+        assert c.tkw.tk.eval("llength $::calls") == "1"
+        assert child.grid_batch is None
+
+
+# ---------------------------------------------------------------------------
+# ThumbnailGallery tests
+# ---------------------------------------------------------------------------
+
+
+class FakeTileLabel:
+    def __init__(self):
+        self.image = None
+        self.text = None
+
+    def configure(self, image=None, text=None):
+        if image is not None:
+            self.image = image
+        if text is not None:
+            self.text = text
+
+
+def paths_of(indexes):
+    return ["img{}.jpg".format(ix) for ix in indexes]
+
+
+def make_gallery(monkeypatch, count, height=300, thumb_size=100, columns=4):
+    """Create a ThumbnailGallery on a FakeCanvas with a recording executor."""
+    submitted = []
+
+    class FakeExecutor:
+        def submit(self, fn, *args):
+            future = concurrent.futures.Future()
+            future.args = args
+            submitted.append((args[0], future))
+            return future
+
+    def make_slot(self):
+        self.slot_frames.append(None)
+        self.slot_items.append(len(self.slot_items))
+        self.slot_labels.append([FakeTileLabel() for col in range(self.columns)])
+        self.slot_rows.append(None)
+        self.row_width = 400
+
+    monkeypatch.setattr(eztk, "_get_gallery_executor", lambda: FakeExecutor())
+    monkeypatch.setattr(eztk, "_photo_image", lambda im, backend, master: im.shape)
+    monkeypatch.setattr(eztk.ThumbnailGallery, "_make_slot", make_slot)
+    eztk._require_image_libs("test")
+    paths = paths_of(range(count))
+    g = eztk.ThumbnailGallery(
+        FakeCanvas(height=height),
+        paths,
+        thumb_size=thumb_size,
+        columns=columns,
+        visible_height=height,
+    )
+    g.set_paths(paths)
+    return g, submitted
+
+
+class TestThumbnailGallery:
+    def test_only_visible_rows_requested(self, monkeypatch):
+        g, submitted = make_gallery(monkeypatch, 10000)
+        # rows of 124 pixels: 3 visible in 300 pixels, plus 1 overscan
+        assert [fn for fn, future in submitted] == paths_of(range(16))
+        assert g.canvas.options["scrollregion"] == (0, 0, 400, 2500 * 124)
+        assert g.slot_labels[0][1].text == "img1.jpg"
+
+    def test_completed_thumbnails_shown(self, monkeypatch):
+        g, submitted = make_gallery(monkeypatch, 100)
+        submitted[5][1].set_result((np.zeros((60, 100, 3), np.uint8), None, 0))
+        g.canvas.run_idle()
+        assert g.thumbnails[5] == (60, 100, 3)
+        assert g.slot_labels[1][1].image == (60, 100, 3)
+        assert 5 not in g.futures
+        assert len(g.canvas.idle_callbacks) == 1  # still polling for the rest
+
+    def test_unreadable_file_keeps_placeholder(self, monkeypatch):
+        g, submitted = make_gallery(monkeypatch, 4)
+        g.placeholder = "blank"
+        submitted[0][1].set_result((None, None, 0))
+        g.canvas.run_idle()
+        assert g.thumbnails[0] is None
+        assert g.slot_labels[0][0].image == "blank"
+
+    def test_scroll_cancels_and_prunes(self, monkeypatch):
+        g, submitted = make_gallery(monkeypatch, 10000)
+        submitted[0][1].set_result((np.zeros((10, 10, 3), np.uint8), None, 0))
+        g.canvas.run_idle()
+        g.canvas.top = 124 * 1000
+        g.refresh()
+        assert 0 not in g.thumbnails
+        assert all(future.cancelled() for fn, future in submitted[1:16])
+        assert sorted(g.futures) == list(range(3996, 4016))
+        assert g.slot_rows[999 % g.pool_size()] == 999
+
+    def test_thumbnail_shown_after_view_shrinks(self, monkeypatch):
+        g, submitted = make_gallery(monkeypatch, 10000)
+        g.canvas.height = 100  # fewer slots needed, the extra ones stay
+        g.canvas.top = 124 * 6
+        g.refresh()
+        assert g.pool_size() < len(g.slot_rows)
+        future = dict(submitted)["img24.jpg"]
+        future.set_result((np.zeros((10, 10, 3), np.uint8), None, 0))
+        g.canvas.run_idle()
+        assert g.slot_labels[6 % g.pool_size()][0].image == (10, 10, 3)
+
+    def test_workers_spawned(self, monkeypatch):
+        made = []
+        monkeypatch.setattr(eztk, "_gallery_executor", None)
+        monkeypatch.setattr(
+            concurrent.futures, "ProcessPoolExecutor", lambda **kw: made.append(kw)
+        )
+        eztk._get_gallery_executor()
+        assert made[0]["mp_context"].get_start_method() == "spawn"
+
+    def test_gallery_thumbnail(self, tmp_path):
+        eztk._require_image_libs("test")
+        fn = str(tmp_path / "a.png")
+        eztk.cv2.imwrite(fn, np.zeros((200, 300, 3), np.uint8))
+        im, hit, nbytes = eztk._gallery_thumbnail(fn, 100)
+        assert (im.shape, hit, nbytes) == ((66, 100, 3), None, 0)
+        missing = str(tmp_path / "missing.png")
+        assert eztk._gallery_thumbnail(missing, 100) == (None, None, 0)
+
+    def test_store_kept_by_tk_process(self, monkeypatch, tmp_path):
+        store = eztk.ThumbnailStore(str(tmp_path / "store"))
+        monkeypatch.setattr(eztk, "thumbnail_store", store)
+        g, submitted = make_gallery(monkeypatch, 1)
+        fn = str(tmp_path / "a.png")
+        eztk.cv2.imwrite(fn, np.zeros((200, 300, 3), np.uint8))
+        g.paths = [fn]
+        g.thumbnails = {}
+        g.futures = {}
+        g._request_thumbnails(0, 1)
+        fn, size, store_path = submitted[-1][1].args
+        assert store_path == store.path(fn, 100, 100)  # no store in the task
+        made = eztk._gallery_thumbnail(fn, size, store_path)
+        assert made[1:] == (False, os.path.getsize(store_path))
+        submitted[-1][1].set_result(made)
+        g.canvas.run_idle()
+        assert (store.misses, store.bytes) == (1, made[2])
+        assert eztk._gallery_thumbnail(fn, size, store_path)[1:] == (True, 0)
+
+
+# ---------------------------------------------------------------------------
+# Headless backend tests
+# ---------------------------------------------------------------------------
+
+
+class TestHeadless:
+    def test_toplevel_timers_run_from_root(self):
+        app = eztk.EasyTk(headless=True)
+        popup = app.make_popup_window("Popup")
+        fired = []
+        popup.tkw.after(10, fired.append, "later")
+        popup.tkw.after_idle(fired.append, "idle")
+        app.tkw.mainloop()
+        assert fired == ["later", "idle"]
+
+    def test_notebook_insert_forms(self):
+        nb = eztk.HeadlessNotebook()
+        a, b, c = (eztk.HeadlessFrame() for ix in range(3))
+        nb.add(a, text="a")
+        nb.insert("end", b, text="b")
+        nb.insert(b, c, text="c")  # before b
+        assert nb.tabs() == [a, c, b]
+        nb.insert("end", a)  # moved
+        assert (nb.tabs(), nb.tab_texts) == ([c, b, a], ["c", "b", "a"])
+        nb.forget(b)
+        assert nb.tabs() == [c, a]
+
+    def test_destroy_frame_of_fields(self):
+        app = eztk.EasyTk(headless=True)
+        frame = app.add_frame()
+        frame.add_entry_field("Name")
+        frame.add_checkbox("On")
+        frame.destroy()
+        assert app.children == []
+        assert frame.children == []
+
+    def test_layout_recorded(self):
+        app = eztk.EasyTk(headless=True)
+        frame = app.add_frame()
+        name = frame.add_entry_field("Name", value="bob")
+        color = frame.add_dropdown("Color", ["red", "green"], selection="green")
+        assert app.tkm is eztk.HeadlessWidgets
+        assert frame.tkm is eztk.HeadlessWidgets
+        assert name.tkw_label.grid_info() == {"column": 0, "row": 0, "sticky": "w"}
+        assert name.tkw.grid_info()["column"] == 1
+        assert color.tkw.grid_info()["row"] == 1
+        assert frame.tkw.grid_slaves(row=1, column=1) == [color.tkw]
+        assert frame.tkw.master is app.tkw
+
+    def test_values(self):
+        app = eztk.EasyTk(headless=True)
+        color = app.add_dropdown("Color", ["red", "green"], selection="green")
+        check = app.add_checkbox("On", value=True)
+        files = app.add_listbox("Files", ["a", "b", "c"], selection="b")
+        size = app.add_slider_field("Size", value=5)
+        notes = app.add_scrolled_entry_field("Notes")
+        assert (color.value(), check.value(), files.value(), size.value()) == (
+            "green",
+            True,
+            "b",
+            5,
+        )
+        color.replace_choices(["blue"])
+        files.replace_value("c")
+        notes.replace_value("hello")
+        assert (color.value(), files.value(), notes.value()) == (
+            "blue",
+            "c",
+            "hello\n",
+        )
+
+    def test_scrolled_widget_colspan(self):
+        app = eztk.EasyTk(headless=True)
+        app.add_label("right", row=0, col=3)
+        frame = app._add_scrolled_widget(
+            app.tkm.Canvas, {}, row=1, col=0, colspan=eztk.COL_SPAN_ALL
+        )
+        assert frame.scroll_container.grid_info()["columnspan"] == 3
+        assert frame.col_span == 4
+        assert app.right_col == 3
+
+    def test_batch_and_after(self):
+        app = eztk.EasyTk(headless=True)
+        with app.batch():
+            entry = app.add_entry_field("Name")
+            assert entry.tkw.grid_info() == {}
+        assert entry.tkw.grid_info()["row"] == 0
+        calls = []
+        app.tkw.after_idle(calls.append, 1)
+        app.update()
+        assert calls == [1]
+
+
+# ---------------------------------------------------------------------------
+# Layout cache tests
+# ---------------------------------------------------------------------------
+
+
+def on_layout_go():
+    pass
+
+
+def build_layout_form(app):
+    frame = app.add_frame(colspan=eztk.COL_SPAN_ALL)
+    name = frame.add_entry_field("Name", value="bob")
+    name.parm_id = "name"
+    frame.add_dropdown("Color", ["red", "green"], row=eztk.SAME_ROW, col=eztk.NEXT_COL)
+    app.add_listbox("Files", ["a", "b"], rowspan=3)
+    app.add_button("Go", on_layout_go)
+    tab = app.add_notebook().add_tab("One")
+    tab.add_label("x")
+
+
+def layout_of(container):
+    return [
+        (
+            child.layout_call[0],
+            child.row,
+            child.col,
+            child.col_span,
+            child.tkw.grid_info(),
+            layout_of(child) if child.is_container else None,
+        )
+        for child in container.children
+    ]
+
+
+class TestLayoutCache:
+    def test_spec_replays_same_layout(self):
+        app = eztk.EasyTk(headless=True)
+        build_layout_form(app)
+        spec = json.loads(json.dumps(app.layout_spec()))
+        assert spec["children"][0]["children"][1]["args"]["col"] == 2
+        copy = eztk.EasyTk(headless=True)
+        copy.build_from_spec(spec, {"on_layout_go": on_layout_go})
+        assert layout_of(copy) == layout_of(app)
+        assert copy.find("name").value() == "bob"
+        assert copy.children[2].tkw.cget("command") is on_layout_go
+        # later widgets are positioned as if built by hand
+        assert copy.add_label("y").row == app.add_label("y").row == 6
+
+    def test_missing_command(self):
+        app = eztk.EasyTk(headless=True)
+        app.add_button("Go", on_layout_go)
+        with pytest.raises(ValueError):
+            eztk.EasyTk(headless=True).build_from_spec(app.layout_spec())
+
+    def test_unrecorded_widget(self):
+        app = eztk.EasyTk(headless=True)
+        app.append_child(eztk.TkWidgetDef("x", eztk.HeadlessLabel(app.tkw)))
+        with pytest.raises(ValueError):
+            app.layout_spec()
+
+    def test_overlay_and_check_overlap_replayed(self):
+        app = eztk.EasyTk(headless=True)
+        app.check_overlap = True
+        app.add_label("under", row=0, col=0)
+        app.add_label("over", row=eztk.OVERLAY_ROW)
+        spec = json.loads(json.dumps(app.layout_spec()))
+        assert spec["children"][1]["overlay"]
+        copy = eztk.EasyTk(headless=True)
+        copy.build_from_spec(spec)
+        assert copy.check_overlap
+        assert layout_of(copy) == layout_of(app)
+        assert copy.layout_spec() == app.layout_spec()
+        with pytest.raises(ValueError):
+            copy.add_label("x", row=0, col=0)
+
+    def test_bad_spec_builds_nothing(self):
+        app = eztk.EasyTk(headless=True)
+        app.add_label("x")
+        app.add_button("Go", on_layout_go)
+        copy = eztk.EasyTk(headless=True)
+        with pytest.raises(ValueError):
+            copy.build_from_spec(app.layout_spec())
+        assert copy.children == []
+
+    def test_commands_with_one_name(self):
+        app = eztk.EasyTk(headless=True)
+        app.add_button("A", on_layout_go)
+        app.add_button("B", on_layout_go)
+        assert app.layout_spec()["children"][1]["commands"] == {
+            "command": "on_layout_go"
+        }
+        for command in (lambda: 1, lambda: 2):
+            app.add_button("C", command)
+        with pytest.raises(ValueError):
+            app.layout_spec()
+
+    def test_build_layout_cache(self, tmp_path):
+        cache_fn = str(tmp_path / "form.json")
+        commands = {"on_layout_go": on_layout_go}
+        first = eztk.EasyTk(headless=True)
+        assert not first.build_layout(build_layout_form, cache_fn, commands)
+        second = eztk.EasyTk(headless=True)
+        assert second.build_layout(build_layout_form, cache_fn, commands)
+        assert layout_of(second) == layout_of(first)
+        # other building code doesn't use the cache
+        third = eztk.EasyTk(headless=True)
+        assert not third.build_layout(lambda app: app.add_label("z"), cache_fn)
+
+    def test_uncachable_layout_still_built(self, tmp_path):
+        cache_fn = str(tmp_path / "form.json")
+
+        def builder(app):
+            app.add_label("x")
+            app.append_child(eztk.TkWidgetDef("y", eztk.HeadlessLabel(app.tkw)))
+
+        app = eztk.EasyTk(headless=True)
+        assert not app.build_layout(builder, cache_fn)
+        assert len(app.children) == 2
+        assert not os.path.exists(cache_fn)
+
+    def test_replay_skips_builder_and_positioning(self, tmp_path, monkeypatch):
+        cache_fn = str(tmp_path / "form.json")
+        calls = {"builder": 0, "next_free": 0}
+        next_free = eztk.OccupancyGrid.next_free
+
+        def counted_next_free(grid, *args):
+            calls["next_free"] += 1
+            return next_free(grid, *args)
+
+        def builder(app):
+            calls["builder"] += 1
+            for ix in range(20):
+                app.add_label(str(ix), row=eztk.NEXT_FREE)
+
+        monkeypatch.setattr(eztk.OccupancyGrid, "next_free", counted_next_free)
+        first = eztk.EasyTk(headless=True)
+        first.build_layout(builder, cache_fn)
+        assert calls == {"builder": 1, "next_free": 20}
+        second = eztk.EasyTk(headless=True)
+        assert second.build_layout(builder, cache_fn)
+        assert calls == {"builder": 1, "next_free": 20}
+        assert layout_of(second) == layout_of(first)
+
+    def test_fingerprint(self):
+        assert eztk.layout_fingerprint(build_layout_form) == eztk.layout_fingerprint(
+            build_layout_form
+        )
+        assert eztk.layout_fingerprint(build_layout_form) != eztk.layout_fingerprint(
+            layout_of
+        )
+
+
+# ---------------------------------------------------------------------------
+# build_in_slices() tests
+# ---------------------------------------------------------------------------
+
+
+def build_rows(container, count):
+    for ix in range(count):
+        container.add_label(str(ix))
+        yield
+
+
+class TestBuildInSlices:
+    def test_slices_run_from_idle(self):
+        app = eztk.EasyTk(headless=True)
+        done = []
+        app.build_in_slices(build_rows(app, 3), slice_ms=0, on_done=done.append)
+        assert app.children == []  # nothing until tk is idle
+        app.update()
+        assert len(app.children) == 1  # each slice makes at least one step
+        app.tkw.mainloop()
+        assert [child.row for child in app.children] == [0, 1, 2]
+        assert done == [app]
+        assert app.build_id is None
+
+    def test_budget(self):
+        app = eztk.EasyTk(headless=True)
+        app.build_in_slices(build_rows(app, 50), slice_ms=10000)
+        app.update()
+        assert len(app.children) == 50
+
+    def test_destroy_stops_build(self):
+        app = eztk.EasyTk(headless=True)
+        frame = app.add_frame()
+        steps = build_rows(frame, 5)
+        frame.build_in_slices(steps, slice_ms=0)
+        app.update()
+        frame.destroy()
+        assert app.tkw.pending == []
+        assert len(list(steps)) == 4  # the rest was never built
+
+    def test_spec_steps_top_first(self):
+        app = eztk.EasyTk(headless=True)
+        app.add_label("b", row=2, col=0)
+        app.add_label("a", row=0, col=1)
+        spec = app.layout_spec()
+        copy = eztk.EasyTk(headless=True)
+        copy.build_in_slices(copy.spec_steps(spec), slice_ms=0)
+        copy.tkw.mainloop()
+        assert [(child.row, child.col) for child in copy.children] == [(0, 1), (2, 0)]
+        assert copy._layout_extent() == app._layout_extent()